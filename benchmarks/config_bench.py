@@ -0,0 +1,34 @@
+import json
+
+import pytest
+
+import toolforge
+
+
+@pytest.fixture
+def config(tmp_path):
+    path = tmp_path / "config.yaml"
+    settings = {f"key{i}": {"value": i, "items": list(range(10))} for i in range(50)}
+    path.write_text(json.dumps(settings))
+    path.chmod(0o600)
+    return path
+
+
+def test_assert_private_file(benchmark, config):
+    load = toolforge.assert_private_file(json.load)
+
+    def run():
+        with config.open() as f:
+            return load(f)
+
+    assert benchmark(run)["key1"]["value"] == 1
+
+
+def test_load_private_yaml(benchmark, config):
+    pytest.importorskip("yaml")
+
+    def run():
+        with config.open() as f:
+            return toolforge.load_private_yaml(f)
+
+    assert benchmark(run)["key1"]["value"] == 1
@@ -0,0 +1,110 @@
+"""Shared fixtures for the benchmark suite.
+
+Run with ``tox -e bench``. Database benchmarks need a MySQL/MariaDB server
+described by the ``TOOLFORGE_BENCH_MYSQL_HOST``, ``TOOLFORGE_BENCH_MYSQL_USER``
+and ``TOOLFORGE_BENCH_MYSQL_PASSWORD`` environment variables and are skipped
+otherwise.
+"""
+
+import copy
+import json
+import os
+import pathlib
+
+import pytest
+
+from toolforge import credentials
+from toolforge import sitematrix as sm
+
+FIXTURE = (
+    pathlib.Path(__file__).parent.parent / "tests" / "fixtures" / "sitematrix.json"
+)
+
+#: Roughly the number of language groups in the production site matrix.
+LANGUAGES = 340
+
+
+def scaled_sitematrix(languages=LANGUAGES):
+    """Recorded site matrix padded with synthetic languages to production size."""
+    data = json.loads(FIXTURE.read_text(encoding="utf-8"))
+    matrix = data["sitematrix"]
+    templates = [v for k, v in matrix.items() if k.isdigit()]
+    for i in range(len(templates), languages):
+        group = copy.deepcopy(templates[i % len(templates)])
+        code = f"x{i:03d}"
+        for site in group["site"]:
+            old = group["code"]
+            site["url"] = site["url"].replace(f"//{old}.", f"//{code}.", 1)
+            site["dbname"] = site["dbname"].replace(old, code, 1)
+        group["code"] = code
+        matrix[str(i)] = group
+    matrix["count"] = sum(len(v["site"]) for k, v in matrix.items() if k.isdigit())
+    matrix["count"] += len(matrix["specials"])
+    return data
+
+
+@pytest.fixture(autouse=True)
+def _credentials_provider(tmp_path, monkeypatch):
+    """Keep the ``~/replica.my.cnf`` of the account running the benchmarks out."""
+    monkeypatch.setattr(
+        credentials,
+        "_default",
+        credentials.CredentialProvider(str(tmp_path / "replica.my.cnf")),
+    )
+
+
+@pytest.fixture(scope="session")
+def sitematrix_data():
+    return scaled_sitematrix()
+
+
+@pytest.fixture
+def sitematrix(sitematrix_data, tmp_path, monkeypatch):
+    monkeypatch.setenv("TOOLFORGE_SITEMATRIX_CACHE", str(tmp_path / "sitematrix.json"))
+    monkeypatch.delenv("TOOLFORGE_SITEMATRIX_SNAPSHOT", raising=False)
+    monkeypatch.setattr(sm, "_fetch_sitematrix", lambda: sitematrix_data)
+    sm.clear_cache()
+    yield sm
+    sm.clear_cache()
+
+
+@pytest.fixture(scope="session")
+def mysql():
+    host = os.environ.get("TOOLFORGE_BENCH_MYSQL_HOST")
+    if not host:
+        pytest.skip("TOOLFORGE_BENCH_MYSQL_HOST is not set")
+    return {
+        "host": host,
+        "user": os.environ.get("TOOLFORGE_BENCH_MYSQL_USER", "root"),
+        "password": os.environ.get("TOOLFORGE_BENCH_MYSQL_PASSWORD", ""),
+    }
+
+
+@pytest.fixture(scope="session")
+def replica_db(tmp_path_factory):
+    """SQLite stand-in for the replicas, sized by ``TOOLFORGE_BENCH_PAGES``."""
+    from tests.replica import Replica
+
+    return Replica(
+        tmp_path_factory.mktemp("replica"),
+        pages=int(os.environ.get("TOOLFORGE_BENCH_PAGES", "10000")),
+        latency=float(os.environ.get("TOOLFORGE_BENCH_LATENCY", "0.001")),
+    )
+
+
+@pytest.fixture
+def replica(replica_db, monkeypatch):
+    """Route connections to :func:`replica_db` and resolve its section hosts."""
+    import socket
+
+    import pymysql
+
+    from toolforge import fanout
+
+    monkeypatch.setenv("TOOL_REPLICA_USER", "u123")
+    monkeypatch.setenv("TOOL_REPLICA_PASSWORD", "secret")
+    monkeypatch.setattr(pymysql, "connect", replica_db.connect)
+    monkeypatch.setattr(socket, "gethostbyname_ex", replica_db.gethostbyname_ex)
+    fanout._canonical_host.cache_clear()
+    yield replica_db
+    fanout._canonical_host.cache_clear()
@@ -0,0 +1,82 @@
+import pymysql
+import pytest
+
+import toolforge
+from toolforge.pool import ConnectionPool
+from toolforge.streaming import iter_rows
+
+
+@pytest.fixture
+def _credentials(monkeypatch):
+    monkeypatch.setenv("TOOL_REPLICA_USER", "u123")
+    monkeypatch.setenv("TOOL_REPLICA_PASSWORD", "secret")
+
+
+@pytest.mark.usefixtures("_credentials")
+def test_connect_args(benchmark):
+    kw = benchmark(toolforge._connect_args, "enwiki_p", "analytics")
+    assert kw["host"] == "enwiki.analytics.db.svc.wikimedia.cloud"
+
+
+def test_connect_args_read_default_file(benchmark, monkeypatch):
+    monkeypatch.delenv("TOOL_REPLICA_USER", raising=False)
+    kw = benchmark(toolforge._connect_args, "meta")
+    assert kw["host"] == "s7.web.db.svc.wikimedia.cloud"
+
+
+def test_toolsdb_args(benchmark):
+    kw = benchmark(toolforge._toolsdb_args, "s12345__foo")
+    assert kw["host"] == "tools.db.svc.wikimedia.cloud"
+
+
+def _query(conn):
+    with conn.cursor() as cur:
+        cur.execute("SELECT 1")
+        return cur.fetchone()
+
+
+def test_connection_setup(benchmark, mysql):
+    def setup():
+        conn = toolforge.toolsdb("", **mysql)
+        conn.close()
+
+    benchmark(setup)
+
+
+def test_query_unpooled(benchmark, mysql):
+    def run():
+        conn = toolforge.toolsdb("", **mysql)
+        try:
+            return _query(conn)
+        finally:
+            conn.close()
+
+    assert benchmark(run) == (1,)
+
+
+def test_query_pooled(benchmark, mysql):
+    pool = ConnectionPool()
+
+    def run():
+        with pool.toolsdb("", **mysql) as conn:
+            return _query(conn)
+
+    try:
+        assert benchmark(run) == (1,)
+    finally:
+        pool.close()
+
+
+def test_query_streaming(benchmark, mysql):
+    conn = toolforge.toolsdb("", streaming=True, **mysql)
+    query = "SELECT seq FROM seq_1_to_100000"
+    try:
+        with conn.cursor() as cur:
+            cur.execute("SELECT 1 FROM seq_1_to_1")
+    except pymysql.err.ProgrammingError:
+        pytest.skip("server has no SEQUENCE engine")
+
+    try:
+        assert benchmark(lambda: sum(1 for _ in iter_rows(conn, query))) == 100000
+    finally:
+        conn.close()
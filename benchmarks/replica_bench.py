@@ -0,0 +1,104 @@
+"""Load tests against the SQLite replica stand-in from ``tests/replica.py``.
+
+Every query waits ``TOOLFORGE_BENCH_LATENCY`` seconds (1ms by default) to model
+the network round-trip, so these compare how many round-trips and connections
+each approach needs rather than raw database speed.
+"""
+
+import pytest
+
+import toolforge
+from toolforge import fanout
+from toolforge import lookup
+from toolforge import scan
+from toolforge import streaming
+from toolforge.pool import ConnectionPool
+
+WIKIS = ["enwiki", "dewiki", "frwiki", "jawiki"]
+
+
+def _count(conn):
+    with conn.cursor() as cur:
+        cur.execute("SELECT COUNT(*) FROM page")
+        return cur.fetchone()[0]
+
+
+def test_query_unpooled(benchmark, replica):
+    def run():
+        conn = toolforge.connect("enwiki")
+        try:
+            return _count(conn)
+        finally:
+            conn.close()
+
+    assert benchmark(run) == replica.pages
+
+
+def test_query_pooled(benchmark, replica):
+    pool = ConnectionPool()
+
+    def run():
+        with pool.connect("enwiki") as conn:
+            return _count(conn)
+
+    try:
+        assert benchmark(run) == replica.pages
+    finally:
+        pool.close()
+
+
+def test_streaming(benchmark, replica):
+    def run():
+        conn = toolforge.connect("enwiki", streaming=True)
+        try:
+            return sum(1 for _ in streaming.iter_rows(conn, "SELECT * FROM revision"))
+        finally:
+            conn.close()
+
+    assert benchmark(run) == replica.pages * 3
+
+
+def test_fanout(benchmark, replica):
+    def run():
+        return sum(
+            count for _, (count,) in fanout.fanout(WIKIS, "SELECT COUNT(*) FROM page")
+        )
+
+    assert benchmark(run) == replica.pages * len(WIKIS)
+
+
+def test_scan(benchmark, replica):
+    def run():
+        return sum(1 for _ in scan.scan("enwiki", "page", "page_id", columns="page_id"))
+
+    assert benchmark(run) == replica.pages
+
+
+@pytest.mark.usefixtures("replica")
+def test_lookup_one_by_one(benchmark):
+    conn = toolforge.connect("enwiki")
+    ids = list(range(1, 201))
+
+    def run():
+        titles = {}
+        with conn.cursor() as cur:
+            for page_id in ids:
+                cur.execute(
+                    "SELECT page_title FROM page WHERE page_id = %s",
+                    (page_id,),
+                )
+                titles[page_id] = cur.fetchone()
+        return titles
+
+    assert len(benchmark(run)) == len(ids)
+
+
+@pytest.mark.usefixtures("replica")
+def test_lookup_batched(benchmark):
+    conn = toolforge.connect("enwiki")
+    ids = list(range(1, 201))
+
+    def run():
+        return lookup.lookup(conn, "page", "page_id", ids, columns="page_title")
+
+    assert len(benchmark(run)) == len(ids)
@@ -0,0 +1,50 @@
+import random
+
+import toolforge
+
+
+def test_dbname_warm(benchmark, sitematrix):
+    sitematrix.get_sitematrix()
+    assert benchmark(toolforge.dbname, "https://en.wikipedia.org/wiki/X") == "enwiki"
+
+
+def test_dbname_cold_from_disk_cache(benchmark, sitematrix):
+    sitematrix.get_sitematrix()
+
+    def cold():
+        sitematrix.clear_cache()
+        return toolforge.dbname("de.wikipedia.org")
+
+    assert benchmark(cold) == "dewiki"
+
+
+def test_build_index(benchmark, sitematrix, sitematrix_data):
+    matrix = benchmark(sitematrix.SiteMatrix.from_api, sitematrix_data)
+    assert len(matrix) == sitematrix_data["sitematrix"]["count"]
+
+
+def test_load_snapshot(benchmark, sitematrix, sitematrix_data, tmp_path):
+    path = str(tmp_path / "sitematrix.snapshot")
+    sitematrix.SiteMatrix.from_api(sitematrix_data).save_snapshot(path)
+    matrix = benchmark(sitematrix.SiteMatrix.load_snapshot, path)
+    assert len(matrix) == sitematrix_data["sitematrix"]["count"]
+
+
+def test_dbnames_bulk(benchmark, sitematrix, sitematrix_data):
+    urls = [
+        site["url"] + "/wiki/Page"
+        for key, group in sitematrix_data["sitematrix"].items()
+        if key.isdigit()
+        for site in group["site"]
+    ]
+    random.seed(0)
+    urls = random.choices(urls, k=10000)
+    sitematrix.get_sitematrix()
+    result = benchmark(toolforge.dbnames, urls)
+    assert len(result) == len(set(urls))
+
+
+def test_dbname_loop(benchmark, sitematrix, sitematrix_data):
+    urls = [s["url"] for s in sitematrix_data["sitematrix"]["specials"]] * 100
+    sitematrix.get_sitematrix()
+    benchmark(lambda: [toolforge.dbname(url) for url in urls])
@@ -15,31 +15,75 @@
 # along with this program.  If not, see <http://www.gnu.org/licenses/>.
 """
 Small library for common tasks on Wikimedia Toolforge
+
+Third party dependencies are only imported by the functions that need them,
+so that ``import toolforge`` stays cheap for short-lived jobs.
 """
 from __future__ import annotations  # PEP 563
 
 import functools
+import importlib.util
 import os
 import stat
 from typing import Any
 from typing import Callable
+from typing import Dict
 from typing import IO
+from typing import Iterable
+from typing import List
 from typing import NewType
 from typing import Optional
-from typing import cast
-
-import decorator
-import pymysql
-import requests
+from typing import TYPE_CHECKING
+from typing import Union
+from typing import overload
 
+from .exceptions import AdmissionTimeoutError  # noqa: F401
+from .exceptions import PoolExhaustedError  # noqa: F401
 from .exceptions import PrivateFileWorldReadableError
 from .exceptions import UnknownClusterError
-from .exceptions import UnknownDatabaseError
+from .exceptions import UnknownDatabaseError  # noqa: F401
+
+if TYPE_CHECKING:
+    from typing import Literal
+
+    import pymysql
+
+    load_private_yaml: Callable[[IO[Any]], Any]
+
+#: Submodules that used to be imported eagerly and are still available as
+#: attributes after a plain ``import toolforge``.
+_LAZY_MODULES = ("http", "instrumentation", "sitematrix")
 
 _Connection = NewType(
     "_Connection",
     "pymysql.connections.Connection[pymysql.cursors.Cursor]",
 )
+_StreamingConnection = NewType(
+    "_StreamingConnection",
+    "pymysql.connections.Connection[pymysql.cursors.SSCursor]",
+)
+
+
+@overload
+def connect(
+    dbname: str,
+    cluster: str = ...,
+    *,
+    extension: Optional[str] = ...,
+    streaming: Literal[False] = ...,
+    **kwargs: str,
+) -> _Connection: ...
+
+
+@overload
+def connect(
+    dbname: str,
+    cluster: str = ...,
+    *,
+    extension: Optional[str] = ...,
+    streaming: Literal[True],
+    **kwargs: str,
+) -> _StreamingConnection: ...
 
 
 def connect(
@@ -47,17 +91,44 @@ def connect(
     cluster: str = "web",
     *,
     extension: Optional[str] = None,
+    streaming: bool = False,
     **kwargs: str,
-) -> _Connection:
+) -> Union[_Connection, _StreamingConnection]:
     """
     Get a database connection for the specified wiki.
 
     :param dbname: Database name
     :param cluster: Database cluster (*analytics* or *web*)
+    :param streaming: Use unbuffered :class:`pymysql.cursors.SSCursor`
+        cursors, which fetch rows from the server as they are read
     :param `**kwargs`: For :meth:`pymysql.connect <pymysql.connections.Connection.__init__>`
     :return: :class:`pymysql.connections.Connection`
     :raise: :class:`toolforge.UnknownClusterError`: When **cluster** value is unknown
     """
+    return _connect(
+        **_connect_args(
+            dbname,
+            cluster,
+            extension=extension,
+            streaming=streaming,
+            **kwargs,
+        ),
+    )
+
+
+def _connect_args(
+    dbname: str,
+    cluster: str = "web",
+    *,
+    extension: Optional[str] = None,
+    streaming: bool = False,
+    **kwargs: Any,
+) -> Dict[str, Any]:
+    """Resolve the :func:`_connect` arguments for a :func:`connect` call."""
+    if streaming:
+        import pymysql.cursors
+
+        kwargs.setdefault("cursorclass", pymysql.cursors.SSCursor)
     if cluster not in ["analytics", "web"]:
         raise UnknownClusterError('"cluster" must be one of: "analytics", "web"')
 
@@ -74,96 +145,141 @@ def connect(
         host = f"{extension}.{host}"
     host = kwargs.pop("host", host)
 
-    try:
-        user = os.environ["TOOL_REPLICA_USER"]
-        password = os.environ["TOOL_REPLICA_PASSWORD"]
-    except KeyError:
-        kwargs.setdefault("read_default_file", os.path.expanduser("~/replica.my.cnf"))
-    else:
-        kwargs.setdefault("user", user)
-        kwargs.setdefault("password", password)
+    _set_credentials(kwargs, "TOOL_REPLICA")
 
-    return _connect(
-        database=dbname + "_p",
-        host=host,
+    return {
+        "database": dbname + "_p",
+        "host": host,
         **kwargs,
+    }
+
+
+def _set_credentials(kwargs: Dict[str, Any], prefix: str) -> None:
+    """Add the credentials resolved by the shared provider to **kwargs**."""
+    from . import credentials
+
+    provider = credentials.default_provider()
+    # Credentials given by the caller win, so the file is not even read.
+    # A missing user or password is still filled in from it, as by PyMySQL.
+    explicit = "user" in kwargs and "password" in kwargs
+    resolved = provider.resolve(
+        prefix,
+        use_file=not explicit and "read_default_file" not in kwargs,
     )
+    if resolved is None:
+        if not explicit:
+            kwargs.setdefault("read_default_file", provider.path)
+    else:
+        kwargs.setdefault("user", resolved.user)
+        kwargs.setdefault("password", resolved.password)
 
 
-def _connect(*args: str, **kwargs: str) -> _Connection:  # pragma: no cover
+def _connect(*args: str, **kwargs: str) -> _Connection:
     """Wraper for pymysql.connect to make testing easier."""
+    import pymysql
+
+    from . import admission
+    from . import instrumentation
+
     kw = {
         "charset": "utf8mb4",
     }
     kw.update(kwargs)
-    return pymysql.connect(*args, **kw)  # type: ignore
+    factory: Callable[..., Any] = pymysql.connect
+    if instrumentation._sinks:
+        factory = functools.partial(instrumentation.connect, factory)
+    if admission._controller is not None:
+        return admission._controller.connect(factory, *args, **kw)  # type: ignore
+    return factory(*args, **kw)  # type: ignore
+
+
+@overload
+def toolsdb(
+    dbname: str,
+    *,
+    streaming: Literal[False] = ...,
+    **kwargs: str,
+) -> _Connection: ...
+
+
+@overload
+def toolsdb(
+    dbname: str,
+    *,
+    streaming: Literal[True],
+    **kwargs: str,
+) -> _StreamingConnection: ...
 
 
-def toolsdb(dbname: str, **kwargs: str) -> _Connection:
+def toolsdb(
+    dbname: str,
+    *,
+    streaming: bool = False,
+    **kwargs: str,
+) -> Union[_Connection, _StreamingConnection]:
     """Connect to a database hosted on the ToolsDB service.
 
     :param dbname: Database name
+    :param streaming: Use unbuffered :class:`pymysql.cursors.SSCursor`
+        cursors, which fetch rows from the server as they are read
     :param `**kwargs`: For :meth:`pymysql.connect <pymysql.connections.Connection.__init__>`
     :return: :class:`pymysql.connections.Connection`
     """
-    try:
-        user = os.environ["TOOL_TOOLSDB_USER"]
-        password = os.environ["TOOL_TOOLSDB_PASSWORD"]
-    except KeyError:
-        kwargs.setdefault("read_default_file", os.path.expanduser("~/replica.my.cnf"))
-    else:
-        kwargs.setdefault("user", user)
-        kwargs.setdefault("password", password)
+    return _connect(**_toolsdb_args(dbname, streaming=streaming, **kwargs))
 
-    return _connect(
-        database=dbname,
-        host="tools.db.svc.wikimedia.cloud",
+
+def _toolsdb_args(
+    dbname: str,
+    *,
+    streaming: bool = False,
+    **kwargs: Any,
+) -> Dict[str, Any]:
+    """Resolve the :func:`_connect` arguments for a :func:`toolsdb` call."""
+    if streaming:
+        import pymysql.cursors
+
+        kwargs.setdefault("cursorclass", pymysql.cursors.SSCursor)
+    _set_credentials(kwargs, "TOOL_TOOLSDB")
+
+    return {
+        "database": dbname,
+        "host": "tools.db.svc.wikimedia.cloud",
         **kwargs,
-    )
+    }
 
 
 def dbname(domain: str) -> str:
     """
     Convert a domain/URL into its database name.
 
+    Lookups use the offline snapshot and the cached index described in
+    :func:`toolforge.sitematrix.dbname`.
+
     :param domain: DNS domain or URL to wiki
     :return: Wikimedia database name (like *enwiki*)
     :raises: :class:`toolforge.UnknownDatabaseError`: When dbname mapping for domain is unknown
     """
-    # First, lets normalize the name.
-    if domain.startswith(("http://", "https://")):
-        domain = domain.replace("http://", "", 1).replace("https://", "", 1)
-    if "/" in domain:
-        domain = domain.split("/", 1)[0]
-
-    domain = "https://" + domain
-    data = _fetch_sitematrix()["sitematrix"]
-    for num in data:
-        if num.isdigit():
-            for site in data[num]["site"]:
-                if site["url"] == domain:
-                    return cast(str, site["dbname"])
-        elif num == "specials":
-            for special in data[num]:
-                if special["url"] == domain:
-                    return cast(str, special["dbname"])
-
-    raise UnknownDatabaseError(f"Unable to find database name for {domain}")
-
-
-@functools.lru_cache()
-def _fetch_sitematrix() -> Any:
-    params = {"action": "sitematrix", "format": "json"}
-    headers = {
-        "User-agent": f"python-toolforge python-requests/{requests.__version__}",
-    }
-    r = requests.get(
-        "https://meta.wikimedia.org/w/api.php",
-        params=params,
-        headers=headers,
-    )
-    r.raise_for_status()
-    return r.json()
+    from . import sitematrix
+
+    return sitematrix.dbname(domain)
+
+
+def dbnames(domains: Iterable[str], *, strict: bool = True) -> Dict[str, str]:
+    """
+    Convert many domains/URLs into their database names.
+
+    Inputs are normalized and deduplicated once and resolved in a single
+    pass, which is much faster than calling :func:`dbname` in a loop.
+
+    :param domains: DNS domains or URLs to wikis
+    :param strict: Raise for unknown domains instead of leaving them out
+    :return: Mapping of each distinct input to its Wikimedia database name
+    :raises: :class:`toolforge.UnknownDatabaseError`: When **strict** is set
+        and any domain is unknown; the message lists all of them
+    """
+    from . import sitematrix
+
+    return sitematrix.dbnames(domains, strict=strict)
 
 
 def set_user_agent(
@@ -180,7 +296,14 @@ def set_user_agent(
     :param url: Optional URL
     :param email: Optional email
     :return: New User-agent value
+
+    Sessions from :mod:`toolforge.http`, including ones created before this
+    call, use the new value too unless their User-Agent header was changed.
     """
+    import requests
+
+    from . import http
+
     if url is None:
         url = f"https://{tool}.toolforge.org/"
     if email is None:
@@ -188,9 +311,36 @@ def set_user_agent(
 
     ua = f"{tool} ({url}; {email}) python-requests/{requests.__version__}"
     requests.utils.default_user_agent = lambda *args, **kwargs: ua  # noqa: U100
+    http._set_user_agent(ua)
     return ua
 
 
+def _atomic_write(path: str, data: bytes, *, prefix: str = ".tmp-") -> None:
+    """
+    Replace **path** with **data** through a temporary file and a rename,
+    so that readers never see a partially written file.
+
+    :param path: File to write; its directory is created if needed
+    :param data: New contents
+    :param prefix: Prefix of the temporary file in the same directory
+    """
+    import tempfile
+
+    directory = os.path.dirname(path) or "."
+    os.makedirs(directory, exist_ok=True)
+    fd, tmp = tempfile.mkstemp(dir=directory, prefix=prefix)
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(data)
+        os.replace(tmp, path)
+    except BaseException:
+        try:
+            os.unlink(tmp)
+        except OSError:
+            pass
+        raise
+
+
 def _assert_private_file(
     func: Callable[[IO[Any]], Any],
     *args: Any,
@@ -229,6 +379,8 @@ def assert_private_file(func: Callable[[IO[Any]], Any]) -> Callable[[IO[Any]], A
     :raise: :class:`toolforge.PrivateFileWorldReadableError`: When
             `func.args[0]` is a world readable file.
     """
+    import decorator
+
     decorated = decorator.decorate(func, _assert_private_file)
     decorated.__doc__ = (
         (decorated.__doc__ or "")
@@ -240,11 +392,33 @@ def assert_private_file(func: Callable[[IO[Any]], Any]) -> Callable[[IO[Any]], A
     return decorated
 
 
-try:
+def _load_private_yaml() -> Callable[[IO[Any]], Any]:
     import yaml
-except ModuleNotFoundError:
-    pass
-else:
-    load_private_yaml: Callable[[IO[Any]], Any] = assert_private_file(yaml.safe_load)
-    load_private_yaml.__name__ = "load_private_yaml"
-    load_private_yaml.__module__ = "toolforge"
+
+    load = assert_private_file(yaml.safe_load)
+    load.__name__ = "load_private_yaml"
+    load.__module__ = "toolforge"
+    return load
+
+
+def __getattr__(name: str) -> Any:
+    """Import submodules and the PyYAML based helpers on first access."""
+    if name in _LAZY_MODULES:
+        return importlib.import_module(f"{__name__}.{name}")
+    if name == "load_private_yaml":
+        try:
+            load = _load_private_yaml()
+        except ModuleNotFoundError as e:
+            if e.name != "yaml":
+                raise
+        else:
+            globals()[name] = load
+            return load
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
+def __dir__() -> List[str]:
+    names = list(globals()) + list(_LAZY_MODULES)
+    if importlib.util.find_spec("yaml") is not None:
+        names.append("load_private_yaml")
+    return sorted(set(names))
@@ -0,0 +1,419 @@
+# This file is part of Toolforge python helper library
+# Copyright (C) 2026 Kunal Mehta <legoktm@debian.org> and contributors
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+"""
+Stay within the connection quota of the tool account
+
+Tool accounts may only hold a limited number of connections to the Wiki
+Replicas and to ToolsDB, and connecting beyond that fails with a
+``max_user_connections`` error. After :func:`enable`, every connection
+created by :func:`toolforge.connect`, :func:`toolforge.toolsdb` and the
+helpers built on them first waits for a free slot, in the order the callers
+arrived, and gives the slot back when it is closed. While the quota is
+full, idle connections kept by a :class:`toolforge.pool.ConnectionPool` are
+closed to make room rather than holding on to their slots.
+
+With **lock_dir**, slots are lock files shared by all processes of the tool
+using the same directory, so several workers together stay within the
+quota. The locks are released by the operating system if a process dies.
+"""
+from __future__ import annotations  # PEP 563
+
+import collections
+import functools
+import os
+import threading
+import time
+from typing import Any
+from typing import Callable
+from typing import Deque
+from typing import Dict
+from typing import NamedTuple
+from typing import Optional
+from typing import TYPE_CHECKING
+import weakref
+
+from . import instrumentation
+from .exceptions import AdmissionTimeoutError
+
+if TYPE_CHECKING:
+    from .pool import ConnectionPool
+
+#: Seconds between attempts to take a lock file held by another process
+POLL_INTERVAL = 0.05
+
+
+def quota(host: str) -> str:
+    """
+    Name of the connection quota that connections to **host** count against.
+
+    :param host: Database host
+    :return: ``"replicas"`` for both Wiki Replica clusters, ``"toolsdb"``
+        for ToolsDB and the host name itself for any other host
+    """
+    cluster = instrumentation._cluster(host)
+    if cluster == "tools":
+        return "toolsdb"
+    if cluster is not None:
+        return "replicas"
+    return host
+
+
+class Stats(NamedTuple):
+    """Admission statistics of one quota."""
+
+    limit: int
+    #: Connections currently holding a slot
+    in_use: int
+    #: Callers currently waiting for a slot
+    waiting: int
+    #: Slots handed out so far
+    admitted: int
+    #: Callers that gave up waiting
+    timeouts: int
+    #: Seconds waited by all admitted callers together
+    wait_seconds: float
+    #: Longest wait of an admitted caller, in seconds
+    max_wait_seconds: float
+
+
+class _Queue:
+    """Slots and waiting callers of a single quota."""
+
+    __slots__ = (
+        "admitted",
+        "in_use",
+        "max_wait",
+        "timeouts",
+        "wait",
+        "waiters",
+    )
+
+    def __init__(self) -> None:
+        self.waiters: Deque[object] = collections.deque()
+        self.in_use = 0
+        self.admitted = 0
+        self.timeouts = 0
+        self.wait = 0.0
+        self.max_wait = 0.0
+
+
+class Slot:
+    """Permission to hold one connection, given back by :meth:`release`."""
+
+    def __init__(
+        self,
+        controller: AdmissionController,
+        name: str,
+        fd: Optional[int],
+    ) -> None:
+        self.controller = controller
+        #: Quota the slot belongs to
+        self.name = name
+        self._fd = fd
+        self._released = False
+
+    def release(self) -> None:
+        """Give the slot back. Calling this more than once has no effect."""
+        self.controller._release(self)
+
+
+class AdmissionController:
+    """
+    Limit the connections held at once per quota.
+
+    Callers of :meth:`acquire` are admitted first come, first served. A
+    caller that does not get a slot within **timeout** seconds gets a
+    :class:`toolforge.AdmissionTimeoutError` instead of a connection error
+    from the server.
+
+    .. code-block:: python
+
+        controller = AdmissionController(10, lock_dir=os.path.expanduser("~/.slots"))
+        slot = controller.acquire("replicas")
+        try:
+            ...
+        finally:
+            slot.release()
+
+    Usually the controller is installed with :func:`enable` instead, so that
+    connections acquire and release their slot themselves.
+    """
+
+    def __init__(
+        self,
+        limit: int = 10,
+        *,
+        limits: Optional[Dict[str, int]] = None,
+        timeout: Optional[float] = 30.0,
+        lock_dir: Optional[str] = None,
+    ) -> None:
+        """
+        :param limit: Connections allowed per quota
+        :param limits: Connections allowed for specific quotas, such as
+            ``{"toolsdb": 5}``, overriding **limit**
+        :param timeout: Seconds to wait for a slot, or ``None`` to wait
+            forever
+        :param lock_dir: Directory for lock files shared with other
+            processes, or ``None`` to only limit this process
+        """
+        for value in (limit, *(limits or {}).values()):
+            if value < 1:
+                raise ValueError("Limits must be at least 1")
+        self.limit = limit
+        self.limits = dict(limits or {})
+        self.timeout = timeout
+        self.lock_dir = lock_dir
+        if lock_dir is not None:
+            os.makedirs(lock_dir, mode=0o700, exist_ok=True)
+        self._queues: Dict[str, _Queue] = {}
+        self._cond = threading.Condition()
+
+    def limit_of(self, name: str) -> int:
+        """Connections allowed for the quota **name**."""
+        return self.limits.get(name, self.limit)
+
+    def acquire(self, name: str) -> Slot:
+        """
+        Wait for a slot of the quota **name**.
+
+        :param name: Quota name, see :func:`quota`
+        :return: Slot to release once the connection is closed
+        :raise: :class:`toolforge.AdmissionTimeoutError`: When no slot became
+            free within the controller's timeout
+        """
+        start = time.monotonic()
+        deadline = None if self.timeout is None else start + self.timeout
+        limit = self.limit_of(name)
+        ticket = object()
+        with self._cond:
+            queue = self._queues.setdefault(name, _Queue())
+            queue.waiters.append(ticket)
+        try:
+            fd = self._wait(name, queue, ticket, limit, deadline)
+        finally:
+            with self._cond:
+                queue.waiters.remove(ticket)
+                # The next caller in line may be admitted now.
+                self._cond.notify_all()
+        waited = time.monotonic() - start
+        with self._cond:
+            queue.admitted += 1
+            queue.wait += waited
+            queue.max_wait = max(queue.max_wait, waited)
+        return Slot(self, name, fd)
+
+    def _wait(
+        self,
+        name: str,
+        queue: _Queue,
+        ticket: object,
+        limit: int,
+        deadline: Optional[float],
+    ) -> Optional[int]:
+        """Wait until **ticket** is first in line and take a free slot."""
+        reclaim = True
+        while True:
+            with self._cond:
+                wait = None
+                first = queue.waiters[0] is ticket
+                if first and queue.in_use < limit:
+                    fd = None
+                    if self.lock_dir is not None:
+                        fd = self._lock_file(name, limit)
+                    if self.lock_dir is None or fd is not None:
+                        queue.in_use += 1
+                        return fd
+                    # Held by other processes, which cannot notify us.
+                    wait = POLL_INTERVAL
+                if not (first and reclaim):
+                    remaining = (
+                        None if deadline is None else deadline - time.monotonic()
+                    )
+                    if remaining is not None and remaining <= 0:
+                        queue.timeouts += 1
+                        raise AdmissionTimeoutError(
+                            f"No {name} connection slot free after "
+                            f"{self.timeout} seconds",
+                        )
+                    if remaining is not None:
+                        wait = remaining if wait is None else min(wait, remaining)
+                    self._cond.wait(wait)
+                    reclaim = True
+                    continue
+            # Closing a connection gives back its slot, which needs the lock.
+            reclaim = _close_idle(name)
+
+    def _lock_file(self, name: str, limit: int) -> Optional[int]:
+        """Lock the first free of **limit** slot files, if any."""
+        import fcntl
+
+        assert self.lock_dir is not None
+        for i in range(limit):
+            path = os.path.join(self.lock_dir, f"{name}.{i}.lock")
+            fd = os.open(path, os.O_RDWR | os.O_CREAT, 0o600)
+            try:
+                fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except BlockingIOError:
+                os.close(fd)
+                continue
+            return fd
+        return None
+
+    def _release(self, slot: Slot) -> None:
+        with self._cond:
+            if slot._released:
+                return
+            slot._released = True
+            if slot._fd is not None:
+                # Closing the file releases its lock.
+                os.close(slot._fd)
+            self._queues[slot.name].in_use -= 1
+            self._cond.notify_all()
+
+    def connect(
+        self,
+        factory: Callable[..., Any],
+        *args: Any,
+        **kwargs: Any,
+    ) -> Any:
+        """
+        Wait for a slot, then call **factory** to open a connection.
+
+        The slot is released when the connection is closed, or when it is
+        garbage collected without being closed.
+
+        :param factory: Usually :func:`pymysql.connect`
+        :param `*args`: Positional arguments for **factory**
+        :param `**kwargs`: Keyword arguments for **factory**
+        :return: **factory** result
+        :raise: :class:`toolforge.AdmissionTimeoutError`: When no slot became
+            free within the controller's timeout
+        """
+        host = kwargs.get("host", "localhost")
+        name = quota(host)
+        start = time.perf_counter()
+        error = None
+        try:
+            slot = self.acquire(name)
+        except AdmissionTimeoutError as e:
+            error = e
+            raise
+        finally:
+            if instrumentation._sinks:
+                instrumentation._emit(
+                    instrumentation.Event(
+                        kind="admission",
+                        cluster=instrumentation._cluster(host),
+                        host=host,
+                        dbname=kwargs.get("database"),
+                        duration=time.perf_counter() - start,
+                        error=error,
+                    ),
+                )
+        try:
+            conn = factory(*args, **kwargs)
+        except BaseException:
+            slot.release()
+            raise
+        # Referring to conn.close from the connection would keep it alive in
+        # a reference cycle, so a dropped connection would only give back its
+        # slot once the cyclic garbage collector runs.
+        conn.close = functools.partial(_close, weakref.ref(conn), slot)
+        weakref.finalize(conn, slot.release)
+        return conn
+
+    def stats(self) -> Dict[str, Stats]:
+        """
+        Current statistics, for example to export as metrics.
+
+        :return: Statistics by quota name
+        """
+        with self._cond:
+            return {
+                name: Stats(
+                    limit=self.limit_of(name),
+                    in_use=queue.in_use,
+                    waiting=len(queue.waiters),
+                    admitted=queue.admitted,
+                    timeouts=queue.timeouts,
+                    wait_seconds=queue.wait,
+                    max_wait_seconds=queue.max_wait,
+                )
+                for name, queue in self._queues.items()
+            }
+
+
+def _close(ref: weakref.ref[Any], slot: Slot) -> None:
+    conn = ref()
+    try:
+        if conn is not None:
+            type(conn).close(conn)
+    finally:
+        slot.release()
+
+
+def _close_idle(name: str) -> bool:
+    """Close an idle pooled connection counting against the quota **name**."""
+    return any(pool._close_idle(name) for pool in list(_pools))
+
+
+_controller: Optional[AdmissionController] = None
+#: Pools whose idle connections are closed when their quota is full
+_pools: weakref.WeakSet[ConnectionPool] = weakref.WeakSet()
+
+
+def enable(
+    limit: int = 10,
+    *,
+    limits: Optional[Dict[str, int]] = None,
+    timeout: Optional[float] = 30.0,
+    lock_dir: Optional[str] = None,
+) -> AdmissionController:
+    """
+    Make every new connection wait for a slot of its quota.
+
+    .. code-block:: python
+
+        from toolforge import admission
+
+        admission.enable(10, lock_dir=os.path.expanduser("~/.toolforge-slots"))
+
+    :param limit: Connections allowed per quota
+    :param limits: Connections allowed for specific quotas, overriding
+        **limit**
+    :param timeout: Seconds to wait for a slot, or ``None`` to wait forever
+    :param lock_dir: Directory for lock files shared with other processes,
+        or ``None`` to only limit this process
+    :return: The installed controller
+    """
+    global _controller
+    _controller = AdmissionController(
+        limit,
+        limits=limits,
+        timeout=timeout,
+        lock_dir=lock_dir,
+    )
+    return _controller
+
+
+def disable() -> None:
+    """
+    Stop limiting new connections.
+
+    Connections opened before keep releasing their slot when closed.
+    """
+    global _controller
+    _controller = None
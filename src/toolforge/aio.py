@@ -0,0 +1,256 @@
+# This file is part of Toolforge python helper library
+# Copyright (C) 2026 Kunal Mehta <legoktm@debian.org> and contributors
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+"""
+asyncio variants of :func:`toolforge.connect`, :func:`toolforge.toolsdb`
+and :func:`toolforge.dbname`
+
+This module needs the optional aiomysql_ and aiohttp_ libraries, which are
+installed with the ``toolforge[async]`` extra.
+
+.. _aiomysql: https://aiomysql.readthedocs.io/
+.. _aiohttp: https://docs.aiohttp.org/
+"""
+from __future__ import annotations  # PEP 563
+
+import asyncio
+from typing import Any
+from typing import Dict
+from typing import Optional
+from typing import Tuple
+import weakref
+
+import aiohttp
+import aiomysql
+
+import toolforge
+
+from . import http
+from . import sitematrix
+
+_sitematrix_locks: weakref.WeakKeyDictionary[
+    asyncio.AbstractEventLoop,
+    asyncio.Lock,
+] = weakref.WeakKeyDictionary()
+
+
+def _aio_args(kwargs: Dict[str, Any], streaming: bool) -> Dict[str, Any]:
+    """Translate :func:`toolforge._connect` arguments for aiomysql."""
+    kw = {"charset": "utf8mb4"}
+    kw.update(kwargs)
+    kw["db"] = kw.pop("database")
+    if streaming:
+        kw.setdefault("cursorclass", aiomysql.SSCursor)
+    return kw
+
+
+async def connect(
+    dbname: str,
+    cluster: str = "web",
+    *,
+    extension: Optional[str] = None,
+    streaming: bool = False,
+    **kwargs: Any,
+) -> aiomysql.Connection:
+    """
+    Get a database connection for the specified wiki.
+
+    Hosts and credentials are resolved as for :func:`toolforge.connect`.
+
+    :param dbname: Database name
+    :param cluster: Database cluster (*analytics* or *web*)
+    :param streaming: Use unbuffered :class:`aiomysql.SSCursor` cursors
+    :param `**kwargs`: For :func:`aiomysql.connect`
+    :return: :class:`aiomysql.Connection`
+    :raise: :class:`toolforge.UnknownClusterError`: When **cluster** value is unknown
+    """
+    kw = toolforge._connect_args(dbname, cluster, extension=extension, **kwargs)
+    return await aiomysql.connect(**_aio_args(kw, streaming))
+
+
+async def toolsdb(
+    dbname: str,
+    *,
+    streaming: bool = False,
+    **kwargs: Any,
+) -> aiomysql.Connection:
+    """
+    Connect to a database hosted on the ToolsDB service.
+
+    :param dbname: Database name
+    :param streaming: Use unbuffered :class:`aiomysql.SSCursor` cursors
+    :param `**kwargs`: For :func:`aiomysql.connect`
+    :return: :class:`aiomysql.Connection`
+    """
+    kw = toolforge._toolsdb_args(dbname, **kwargs)
+    return await aiomysql.connect(**_aio_args(kw, streaming))
+
+
+async def create_pool(
+    dbname: str,
+    cluster: str = "web",
+    *,
+    extension: Optional[str] = None,
+    streaming: bool = False,
+    minsize: int = 1,
+    maxsize: int = 10,
+    pool_recycle: float = 60,
+    **kwargs: Any,
+) -> aiomysql.Pool:
+    """
+    Create a connection pool for the specified wiki.
+
+    .. code-block:: python
+
+        pool = await toolforge.aio.create_pool("enwiki")
+        async with pool.acquire() as conn:
+            async with conn.cursor() as cur:
+                await cur.execute(query)
+
+    :param dbname: Database name
+    :param cluster: Database cluster (*analytics* or *web*)
+    :param streaming: Use unbuffered :class:`aiomysql.SSCursor` cursors
+    :param minsize: Connections opened up front
+    :param maxsize: Maximum number of connections
+    :param pool_recycle: Seconds after which idle connections are replaced
+    :param `**kwargs`: For :func:`aiomysql.connect`
+    :return: :class:`aiomysql.Pool`
+    :raise: :class:`toolforge.UnknownClusterError`: When **cluster** value is unknown
+    """
+    kw = toolforge._connect_args(dbname, cluster, extension=extension, **kwargs)
+    return await aiomysql.create_pool(
+        minsize=minsize,
+        maxsize=maxsize,
+        pool_recycle=pool_recycle,
+        **_aio_args(kw, streaming),
+    )
+
+
+async def create_toolsdb_pool(
+    dbname: str,
+    *,
+    streaming: bool = False,
+    minsize: int = 1,
+    maxsize: int = 10,
+    pool_recycle: float = 60,
+    **kwargs: Any,
+) -> aiomysql.Pool:
+    """
+    Create a connection pool for a database hosted on the ToolsDB service.
+
+    :param dbname: Database name
+    :param streaming: Use unbuffered :class:`aiomysql.SSCursor` cursors
+    :param minsize: Connections opened up front
+    :param maxsize: Maximum number of connections
+    :param pool_recycle: Seconds after which idle connections are replaced
+    :param `**kwargs`: For :func:`aiomysql.connect`
+    :return: :class:`aiomysql.Pool`
+    """
+    kw = toolforge._toolsdb_args(dbname, **kwargs)
+    return await aiomysql.create_pool(
+        minsize=minsize,
+        maxsize=maxsize,
+        pool_recycle=pool_recycle,
+        **_aio_args(kw, streaming),
+    )
+
+
+async def _fetch_sitematrix() -> Any:
+    params = {"action": "sitematrix", "format": "json"}
+    headers = {"User-Agent": http.user_agent()}
+    timeout = aiohttp.ClientTimeout(total=sitematrix.FETCH_TIMEOUT)
+    async with aiohttp.ClientSession(headers=headers, timeout=timeout) as session:
+        async with session.get(
+            "https://meta.wikimedia.org/w/api.php",
+            params=params,
+        ) as r:
+            r.raise_for_status()
+            return await r.json()
+
+
+def _cached_sitematrix(
+    ttl: float,
+) -> Tuple[Optional[sitematrix.SiteMatrix], Optional[sitematrix.SiteMatrix]]:
+    with sitematrix._lock:
+        current = sitematrix._usable(ttl)
+        if current is not None:
+            return current, None
+        return sitematrix._cached(ttl)
+
+
+def _fall_back(stale: sitematrix.SiteMatrix) -> sitematrix.SiteMatrix:
+    with sitematrix._lock:
+        return sitematrix._fall_back(stale)
+
+
+def _store_sitematrix(data: Dict[str, Any]) -> sitematrix.SiteMatrix:
+    matrix = sitematrix.SiteMatrix.from_api(data)
+    with sitematrix._lock:
+        return sitematrix._store(matrix)
+
+
+async def get_sitematrix(
+    ttl: float = sitematrix.CACHE_TTL,
+) -> sitematrix.SiteMatrix:
+    """
+    Get the current site matrix index without blocking the event loop.
+
+    Shares its in-memory and on-disk cache with
+    :func:`toolforge.sitematrix.get_sitematrix`. Reading and writing the
+    on-disk cache happens in the loop's default executor.
+
+    :param ttl: Maximum age in seconds of cached data
+    :return: Site matrix index
+    """
+    current = sitematrix._usable(ttl)
+    if current is not None:
+        return current
+    loop = asyncio.get_running_loop()
+    lock = _sitematrix_locks.get(loop)
+    if lock is None:
+        lock = _sitematrix_locks[loop] = asyncio.Lock()
+    async with lock:
+        fresh, stale = await loop.run_in_executor(None, _cached_sitematrix, ttl)
+        if fresh is not None:
+            return fresh
+        try:
+            data = await _fetch_sitematrix()
+        except (aiohttp.ClientError, asyncio.TimeoutError):
+            if stale is None:
+                raise
+            return await loop.run_in_executor(None, _fall_back, stale)
+        return await loop.run_in_executor(None, _store_sitematrix, data)
+
+
+async def dbname(domain: str) -> str:
+    """
+    Convert a domain/URL into its database name.
+
+    :param domain: DNS domain or URL to wiki
+    :return: Wikimedia database name (like *enwiki*)
+    :raises: :class:`toolforge.UnknownDatabaseError`: When dbname mapping for domain is unknown
+    """
+    path = sitematrix.snapshot_path()
+    loaded = sitematrix._snapshot_data
+    if path is None:
+        snapshot = None
+    elif loaded is not None and loaded[0] == path:
+        snapshot = loaded[1]
+    else:
+        loop = asyncio.get_running_loop()
+        snapshot = await loop.run_in_executor(None, sitematrix._snapshot)
+    if snapshot is not None and domain in snapshot:
+        return snapshot.dbname(domain)
+    return (await get_sitematrix()).dbname(domain)
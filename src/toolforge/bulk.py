@@ -0,0 +1,266 @@
+# This file is part of Toolforge python helper library
+# Copyright (C) 2026 Kunal Mehta <legoktm@debian.org> and contributors
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+"""
+Write many rows into ToolsDB efficiently
+"""
+from __future__ import annotations  # PEP 563
+
+import datetime
+import logging
+import os
+import tempfile
+import time
+from typing import Any
+from typing import Iterable
+from typing import List
+from typing import NamedTuple
+from typing import Optional
+from typing import Sequence
+from typing import Type
+
+import toolforge
+
+logger = logging.getLogger(__name__)
+
+#: Bytes kept free below ``max_allowed_packet`` for protocol overhead.
+PACKET_HEADROOM = 1024
+
+_MODIFIERS = {None: "", "ignore": " IGNORE", "replace": " REPLACE"}
+
+_TSV = {
+    ord("\\"): b"\\\\",
+    ord("\t"): b"\\t",
+    ord("\n"): b"\\n",
+    ord("\r"): b"\\r",
+    0: b"\\0",
+}
+
+
+def _quote(name: str) -> str:
+    """Quote a possibly database qualified identifier."""
+    return ".".join("`" + part.replace("`", "``") + "`" for part in name.split("."))
+
+
+def _tsv_value(value: Any) -> bytes:
+    """Encode **value** for ``LOAD DATA`` with the default field options."""
+    if value is None:
+        return b"\\N"
+    if isinstance(value, bool):
+        return b"1" if value else b"0"
+    if isinstance(value, (bytes, bytearray)):
+        raw = bytes(value)
+    elif isinstance(value, datetime.datetime):
+        raw = value.isoformat(" ").encode()
+    else:
+        raw = str(value).encode("utf-8")
+    if any(c in raw for c in b"\\\t\n\r\0"):
+        raw = b"".join(_TSV.get(c, bytes((c,))) for c in raw)
+    return raw
+
+
+class BulkStats(NamedTuple):
+    """Progress of a :class:`BulkWriter`."""
+
+    rows: int
+    statements: int
+    commits: int
+    #: Seconds since the writer was created
+    elapsed: float
+
+    @property
+    def rows_per_second(self) -> float:
+        return self.rows / self.elapsed if self.elapsed > 0 else 0.0
+
+
+class BulkWriter:
+    """
+    Insert rows into a table in as few statements as possible.
+
+    Rows are buffered and written as multi-row ``INSERT`` statements just
+    small enough to fit in the server's ``max_allowed_packet``, or with
+    ``LOAD DATA LOCAL INFILE`` when **load_data** is set. The transaction is
+    committed every **commit_every** rows and when the writer is closed.
+
+    .. code-block:: python
+
+        conn = toolforge.toolsdb("s12345__mytool", local_infile=True)
+        with BulkWriter(conn, "pages", ["id", "title"], load_data=True) as w:
+            w.add_many(rows)
+        print(w.stats.rows_per_second)
+
+    ``LOAD DATA LOCAL INFILE`` is usually much faster, but needs a connection
+    opened with ``local_infile=True``. PyMySQL can only send files, so each
+    batch is spooled through a private temporary file.
+    """
+
+    def __init__(
+        self,
+        conn: toolforge._Connection,
+        table: str,
+        columns: Sequence[str],
+        *,
+        on_duplicate: Optional[str] = None,
+        commit_every: int = 100_000,
+        max_packet: Optional[int] = None,
+        load_data: bool = False,
+        load_data_bytes: int = 64 << 20,
+    ) -> None:
+        """
+        :param conn: Database connection, usually from :func:`toolforge.toolsdb`
+        :param table: Table name
+        :param columns: Column names, in the order values are given
+        :param on_duplicate: ``"ignore"`` or ``"replace"`` rows with duplicate
+            keys, or ``None`` to fail
+        :param commit_every: Rows written between commits
+        :param max_packet: Maximum statement size in bytes, defaults to the
+            server's ``max_allowed_packet``
+        :param load_data: Use ``LOAD DATA LOCAL INFILE`` instead of ``INSERT``
+        :param load_data_bytes: Maximum size of each ``LOAD DATA`` batch
+        :raise: :class:`ValueError`: When **on_duplicate** is unknown
+        """
+        if on_duplicate not in _MODIFIERS:
+            raise ValueError(f"Unknown on_duplicate value {on_duplicate!r}")
+        self.conn = conn
+        self.commit_every = commit_every
+        self.load_data = load_data
+        modifier = _MODIFIERS[on_duplicate]
+        cols = ", ".join(_quote(c) for c in columns)
+        self._width = len(columns)
+        if load_data:
+            self._limit = load_data_bytes
+            self._prefix = (
+                f"LOAD DATA LOCAL INFILE %s{modifier} INTO TABLE {_quote(table)}"
+                f" CHARACTER SET utf8mb4 ({cols})"
+            )
+        else:
+            if max_packet is None:
+                max_packet = self._max_allowed_packet()
+            self._prefix = f"INSERT{modifier} INTO {_quote(table)} ({cols}) VALUES "
+            self._limit = max_packet - PACKET_HEADROOM - len(self._prefix.encode())
+        self._buffer: List[bytes] = []
+        self._size = 0
+        self._pending = 0
+        self._uncommitted = 0
+        self._rows = 0
+        self._statements = 0
+        self._commits = 0
+        self._start = time.monotonic()
+
+    def _max_allowed_packet(self) -> int:
+        with self.conn.cursor() as cur:
+            cur.execute("SELECT @@max_allowed_packet")
+            row = cur.fetchone()
+        return int(row[0])  # type: ignore[index]
+
+    def _encode(self, row: Sequence[Any]) -> bytes:
+        if len(row) != self._width:
+            raise ValueError(f"Expected {self._width} values, got {len(row)}")
+        if self.load_data:
+            return b"\t".join(_tsv_value(v) for v in row) + b"\n"
+        return self.conn.escape(tuple(row)).encode("utf-8")
+
+    def add(self, row: Sequence[Any]) -> None:
+        """
+        Queue a row, writing the buffered rows first if it would not fit.
+
+        :param row: Column values
+        """
+        data = self._encode(row)
+        separator = 0 if self.load_data else 1
+        if self._buffer and self._size + separator + len(data) > self._limit:
+            self.flush()
+        self._buffer.append(data)
+        self._size += len(data) + (separator if len(self._buffer) > 1 else 0)
+        self._pending += 1
+
+    def add_many(self, rows: Iterable[Sequence[Any]]) -> None:
+        """
+        Queue many rows.
+
+        :param rows: Rows of column values
+        """
+        for row in rows:
+            self.add(row)
+
+    def flush(self) -> None:
+        """Write all buffered rows, committing if **commit_every** is reached."""
+        if not self._buffer:
+            return
+        with self.conn.cursor() as cur:
+            if self.load_data:
+                self._load(cur)
+            else:
+                prefix = self._prefix.encode("utf-8")
+                cur.execute(prefix + b",".join(self._buffer))  # type: ignore[call-overload]
+        self._statements += 1
+        self._rows += self._pending
+        self._uncommitted += self._pending
+        self._buffer = []
+        self._size = 0
+        self._pending = 0
+        if self._uncommitted >= self.commit_every:
+            self.commit()
+
+    def _load(self, cur: Any) -> None:
+        fd, path = tempfile.mkstemp(prefix="toolforge-bulk-", suffix=".tsv")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                f.writelines(self._buffer)
+            cur.execute(self._prefix, (path,))
+        finally:
+            os.unlink(path)
+
+    def commit(self) -> None:
+        """Commit the rows written so far."""
+        self.conn.commit()
+        self._uncommitted = 0
+        self._commits += 1
+        stats = self.stats
+        logger.info(
+            "Wrote %d rows in %.1fs (%.0f rows/s)",
+            stats.rows,
+            stats.elapsed,
+            stats.rows_per_second,
+        )
+
+    def close(self) -> None:
+        """Write the remaining rows and commit."""
+        self.flush()
+        if self._uncommitted:
+            self.commit()
+
+    @property
+    def stats(self) -> BulkStats:
+        """Rows written, statements run, commits and elapsed time."""
+        return BulkStats(
+            rows=self._rows,
+            statements=self._statements,
+            commits=self._commits,
+            elapsed=time.monotonic() - self._start,
+        )
+
+    def __enter__(self) -> BulkWriter:
+        return self
+
+    def __exit__(
+        self,
+        exc_type: Optional[Type[BaseException]],
+        *exc: Any,  # noqa: U100
+    ) -> None:
+        if exc_type is None:
+            self.close()
+        else:
+            self.conn.rollback()
@@ -0,0 +1,422 @@
+# This file is part of Toolforge python helper library
+# Copyright (C) 2026 Kunal Mehta <legoktm@debian.org> and contributors
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+"""
+Cache the results of read-only queries
+"""
+from __future__ import annotations  # PEP 563
+
+import abc
+import base64
+import collections
+import datetime
+import decimal
+import hashlib
+import json
+import os
+import re
+import threading
+import time
+from typing import Any
+from typing import Dict
+from typing import List
+from typing import Optional
+from typing import Tuple
+
+import toolforge
+
+from .instrumentation import _database
+
+#: Default number of seconds results are cached for.
+DEFAULT_TTL = 60.0
+
+_TOKENS = re.compile(r"""('(?:[^'\\]|\\.)*'|"(?:[^"\\]|\\.)*"|`[^`]*`)|\s+""")
+
+
+class Backend(abc.ABC):
+    """Storage for encoded query results."""
+
+    @abc.abstractmethod
+    def get(self, key: str) -> Optional[bytes]:  # noqa: U100
+        """Stored value for **key**, or ``None`` if missing or expired."""
+
+    @abc.abstractmethod
+    def set(self, key: str, value: bytes, ttl: float) -> None:  # noqa: U100
+        """Store **value** under **key** for **ttl** seconds."""
+
+    @abc.abstractmethod
+    def delete(self, key: str) -> None:  # noqa: U100
+        """Remove **key** if it is stored."""
+
+    @abc.abstractmethod
+    def clear(self) -> None:
+        """Remove all stored values."""
+
+
+def normalize_query(query: str) -> str:
+    """
+    Normalize insignificant differences in SQL text.
+
+    Runs of whitespace outside of quoted strings and identifiers are
+    collapsed, and surrounding whitespace and a trailing semicolon removed.
+
+    :param query: SQL query
+    :return: Normalized query
+    """
+    return _TOKENS.sub(lambda m: m.group(1) or " ", query).strip().rstrip(";")
+
+
+def _default(o: Any) -> Any:
+    if isinstance(o, (bytes, bytearray)):
+        return {"$t": "bytes", "v": base64.b64encode(o).decode("ascii")}
+    if isinstance(o, datetime.datetime):
+        return {"$t": "datetime", "v": o.isoformat()}
+    if isinstance(o, datetime.date):
+        return {"$t": "date", "v": o.isoformat()}
+    if isinstance(o, datetime.time):
+        return {"$t": "time", "v": o.isoformat()}
+    if isinstance(o, datetime.timedelta):
+        return {"$t": "timedelta", "v": [o.days, o.seconds, o.microseconds]}
+    if isinstance(o, decimal.Decimal):
+        return {"$t": "decimal", "v": str(o)}
+    if isinstance(o, (set, frozenset)):
+        return {"$t": "set", "v": sorted(o)}
+    raise TypeError(f"Cannot cache values of type {type(o).__name__}")
+
+
+def _object_hook(o: Dict[str, Any]) -> Any:
+    kind = o.get("$t")
+    if kind is None:
+        return o
+    value = o["v"]
+    if kind == "bytes":
+        return base64.b64decode(value)
+    if kind == "datetime":
+        return datetime.datetime.fromisoformat(value)
+    if kind == "date":
+        return datetime.date.fromisoformat(value)
+    if kind == "time":
+        return datetime.time.fromisoformat(value)
+    if kind == "timedelta":
+        return datetime.timedelta(*value)
+    if kind == "decimal":
+        return decimal.Decimal(value)
+    if kind == "set":
+        return set(value)
+    raise ValueError(f"Unknown cached type {kind!r}")
+
+
+def _encode(value: Any) -> bytes:
+    return json.dumps(
+        value,
+        default=_default,
+        separators=(",", ":"),
+        sort_keys=True,
+    ).encode("utf-8")
+
+
+def _decode_rows(data: bytes) -> List[Any]:
+    rows = json.loads(data, object_hook=_object_hook)
+    return [tuple(row) if isinstance(row, list) else row for row in rows]
+
+
+class MemoryBackend(Backend):
+    """
+    Per-process LRU cache.
+
+    The least recently used results are evicted once more than
+    **max_entries** results or **max_bytes** of encoded data are stored.
+    """
+
+    def __init__(self, max_entries: int = 1024, max_bytes: int = 64 << 20) -> None:
+        """
+        :param max_entries: Maximum number of cached results
+        :param max_bytes: Maximum total size of encoded results
+        """
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._data: collections.OrderedDict[str, Tuple[float, bytes]] = (
+            collections.OrderedDict()
+        )
+        self._size = 0
+
+    def get(self, key: str) -> Optional[bytes]:
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                return None
+            if entry[0] <= time.monotonic():
+                self._remove(key)
+                return None
+            self._data.move_to_end(key)
+            return entry[1]
+
+    def set(self, key: str, value: bytes, ttl: float) -> None:
+        if len(value) > self.max_bytes:
+            return
+        with self._lock:
+            self._remove(key)
+            self._data[key] = (time.monotonic() + ttl, value)
+            self._size += len(value)
+            while len(self._data) > self.max_entries or self._size > self.max_bytes:
+                self._remove(next(iter(self._data)))
+
+    def delete(self, key: str) -> None:
+        with self._lock:
+            self._remove(key)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._data.clear()
+            self._size = 0
+
+    def _remove(self, key: str) -> None:
+        entry = self._data.pop(key, None)
+        if entry is not None:
+            self._size -= len(entry[1])
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+
+def default_directory() -> str:
+    """
+    Default location of :class:`FileBackend` caches.
+
+    :return: ``toolforge/queries`` below ``$XDG_CACHE_HOME`` (``~/.cache``
+        by default)
+    """
+    base = os.environ.get("XDG_CACHE_HOME") or os.path.expanduser("~/.cache")
+    return os.path.join(base, "toolforge", "queries")
+
+
+class FileBackend(Backend):
+    """
+    On-disk cache shared by all processes using the same directory.
+
+    Each result is stored in its own file, readable only by the tool
+    account. Once the files take up more than **max_bytes**, the least
+    recently used ones are removed.
+    """
+
+    def __init__(
+        self,
+        directory: Optional[str] = None,
+        *,
+        max_bytes: int = 256 << 20,
+    ) -> None:
+        """
+        :param directory: Cache directory, defaults to :func:`default_directory`
+        :param max_bytes: Maximum total size of cached results
+        """
+        self.directory = directory or default_directory()
+        self.max_bytes = max_bytes
+        self._size: Optional[int] = None
+        os.makedirs(self.directory, mode=0o700, exist_ok=True)
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.directory, key)
+
+    def get(self, key: str) -> Optional[bytes]:
+        path = self._path(key)
+        try:
+            with open(path, "rb") as f:
+                expires, _, value = f.read().partition(b"\n")
+        except FileNotFoundError:
+            return None
+        try:
+            expired = float(expires) <= time.time()
+        except ValueError:
+            # Truncated or otherwise corrupt, treat it as a miss.
+            expired = True
+        if expired:
+            self.delete(key)
+            return None
+        try:
+            os.utime(path)
+        except FileNotFoundError:
+            pass
+        return value
+
+    def set(self, key: str, value: bytes, ttl: float) -> None:
+        data = b"%r\n%s" % (time.time() + ttl, value)
+        toolforge._atomic_write(self._path(key), data)
+        if self._size is not None:
+            self._size += len(data)
+        if self._size is None or self._size > self.max_bytes:
+            self._evict()
+
+    def delete(self, key: str) -> None:
+        try:
+            os.unlink(self._path(key))
+        except FileNotFoundError:
+            pass
+
+    def clear(self) -> None:
+        for entry in os.scandir(self.directory):
+            if not entry.name.startswith("."):
+                self.delete(entry.name)
+        self._size = 0
+
+    def _evict(self) -> None:
+        """Remove expired and least recently used files over the limit."""
+        files = []
+        for entry in os.scandir(self.directory):
+            if entry.name.startswith("."):
+                continue
+            try:
+                st = entry.stat()
+            except FileNotFoundError:
+                continue
+            files.append((st.st_mtime, st.st_size, entry.name))
+        files.sort()
+        size = sum(f[1] for f in files)
+        for _, file_size, name in files:
+            if size <= self.max_bytes:
+                break
+            self.delete(name)
+            size -= file_size
+        self._size = size
+
+
+class RedisBackend(Backend):
+    """
+    Cache stored in Redis, shared by all workers of a tool.
+
+    **client** can be any client with the redis-py_ ``get``, ``set``,
+    ``delete`` and ``scan_iter`` methods. Expiry and eviction are left to
+    the server.
+
+    The Toolforge Redis service is shared by all tools, so use a hard to
+    guess **prefix**. Results are stored as JSON, so entries written by
+    someone else can at worst return wrong rows, never run code.
+
+    .. _redis-py: https://redis.readthedocs.io/
+    """
+
+    def __init__(self, client: Any, *, prefix: str = "toolforge:query:") -> None:
+        """
+        :param client: Redis client
+        :param prefix: Prefix for all keys
+        """
+        self.client = client
+        self.prefix = prefix
+
+    def get(self, key: str) -> Optional[bytes]:
+        return self.client.get(self.prefix + key)  # type: ignore[no-any-return]
+
+    def set(self, key: str, value: bytes, ttl: float) -> None:
+        self.client.set(self.prefix + key, value, px=max(1, int(ttl * 1000)))
+
+    def delete(self, key: str) -> None:
+        self.client.delete(self.prefix + key)
+
+    def clear(self) -> None:
+        for key in self.client.scan_iter(match=self.prefix + "*"):
+            self.client.delete(key)
+
+
+class QueryCache:
+    """
+    Cache query results for connections from :func:`toolforge.connect` and
+    :func:`toolforge.toolsdb`.
+
+    .. code-block:: python
+
+        cache = QueryCache(FileBackend(), ttl=300)
+        conn = toolforge.connect("enwiki")
+        rows = cache.query(conn, "SELECT page_id FROM page LIMIT %s", (10,))
+
+    Results are keyed by the connection's host and database, the
+    :func:`normalized <normalize_query>` query and its parameters. Only use
+    it for read-only queries whose results may be up to **ttl** seconds out
+    of date. Databases switched to with ``USE`` or
+    :meth:`~pymysql.connections.Connection.select_db` are not tracked.
+    """
+
+    def __init__(
+        self,
+        backend: Optional[Backend] = None,
+        *,
+        ttl: float = DEFAULT_TTL,
+    ) -> None:
+        """
+        :param backend: Where results are stored, defaults to a new
+            :class:`MemoryBackend`
+        :param ttl: Default number of seconds results are cached for
+        """
+        self.backend: Backend = backend if backend is not None else MemoryBackend()
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+
+    def key(self, conn: Any, query: str, args: Any = None) -> str:
+        """
+        Cache key of a query.
+
+        :param conn: Database connection
+        :param query: SQL query
+        :param args: Query parameters
+        :return: Hex digest
+        """
+        data = _encode([conn.host, _database(conn), normalize_query(query), args])
+        return hashlib.sha256(data).hexdigest()
+
+    def query(
+        self,
+        conn: Any,
+        query: str,
+        args: Any = None,
+        *,
+        ttl: Optional[float] = None,
+    ) -> List[Any]:
+        """
+        Run **query**, or return its cached rows.
+
+        :param conn: Database connection
+        :param query: SQL query
+        :param args: Query parameters, as for :meth:`pymysql.cursors.Cursor.execute`
+        :param ttl: Seconds to cache the result for, instead of the default;
+            ``0`` to bypass the cache
+        :return: Rows, as returned by ``fetchall()``
+        """
+        if ttl is None:
+            ttl = self.ttl
+        if ttl <= 0:
+            return self._execute(conn, query, args)
+        key = self.key(conn, query, args)
+        data = self.backend.get(key)
+        if data is not None:
+            self.hits += 1
+            return _decode_rows(data)
+        self.misses += 1
+        rows = self._execute(conn, query, args)
+        self.backend.set(key, _encode(rows), ttl)
+        return rows
+
+    def invalidate(self, conn: Any, query: str, args: Any = None) -> None:
+        """Remove the cached result of a query."""
+        self.backend.delete(self.key(conn, query, args))
+
+    def clear(self) -> None:
+        """Remove all cached results."""
+        self.backend.clear()
+
+    @staticmethod
+    def _execute(conn: Any, query: str, args: Any) -> List[Any]:
+        with conn.cursor() as cur:
+            cur.execute(query, args)
+            return list(cur.fetchall())
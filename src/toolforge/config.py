@@ -0,0 +1,200 @@
+# This file is part of Toolforge python helper library
+# Copyright (C) 2026 Kunal Mehta <legoktm@debian.org> and contributors
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+"""
+Load private configuration files once and reuse them until they change
+"""
+from __future__ import annotations  # PEP 563
+
+import json
+import os
+import stat
+import sys
+import threading
+import time
+from typing import Any
+from typing import BinaryIO
+from typing import Callable
+from typing import Dict
+from typing import NamedTuple
+from typing import Optional
+from typing import Tuple
+
+from .exceptions import PrivateFileWorldReadableError
+
+_FileKey = Tuple[int, int, int]
+
+
+def _load_yaml(f: BinaryIO) -> Any:
+    import yaml
+
+    # The libyaml based loader is many times faster, when it was compiled in.
+    loader = getattr(yaml, "CSafeLoader", yaml.SafeLoader)
+    return yaml.load(f, Loader=loader)
+
+
+def _load_toml(f: BinaryIO) -> Any:
+    if sys.version_info >= (3, 11):
+        import tomllib
+    else:
+        import tomli as tomllib
+    return tomllib.load(f)
+
+
+#: Parse functions by file name extension.
+FORMATS: Dict[str, Callable[[BinaryIO], Any]] = {
+    ".json": json.load,
+    ".toml": _load_toml,
+    ".yaml": _load_yaml,
+    ".yml": _load_yaml,
+}
+
+
+class _Entry(NamedTuple):
+    key: _FileKey
+    checked: float
+    data: Any
+
+
+class ConfigLoader:
+    """
+    Parsed contents of private YAML, JSON or TOML configuration files.
+
+    Each file is parsed once and only read again after its modification
+    time, size or inode change, so replacing it with ``mv`` or editing it
+    in place are both noticed. At most once every **check_interval**
+    seconds the file is checked for changes, so calling :meth:`load` for
+    every request of a webservice is a dictionary lookup most of the time.
+
+    Like :func:`toolforge.load_private_yaml`, a
+    :class:`toolforge.PrivateFileWorldReadableError` is raised for files
+    other users can read.
+
+    The same object is returned until the file changes, so callers should
+    not modify it.
+    """
+
+    def __init__(self, *, check_interval: float = 1.0) -> None:
+        """
+        :param check_interval: Seconds between checks for file changes
+        """
+        self.check_interval = check_interval
+        self._lock = threading.Lock()
+        self._entries: Dict[str, _Entry] = {}
+
+    def load(self, path: str, *, format: Optional[str] = None) -> Any:
+        """
+        Parsed contents of **path**.
+
+        :param path: Configuration file
+        :param format: Parser to use (``"yaml"``, ``"json"`` or ``"toml"``),
+            defaults to guessing from the file name extension
+        :return: Parsed configuration
+        :raise: :class:`ValueError`: When the format is unknown
+        :raise: :class:`toolforge.PrivateFileWorldReadableError`: When the
+            file is world-readable
+        """
+        path = os.path.abspath(os.path.expanduser(path))
+        if format is None:
+            ext = os.path.splitext(path)[1].lower()
+        else:
+            ext = "." + format.lower()
+        try:
+            parse = FORMATS[ext]
+        except KeyError:
+            raise ValueError(f"Unknown configuration format for {path}") from None
+
+        now = time.monotonic()
+        entry = self._entries.get(path)
+        if entry is not None and now - entry.checked < self.check_interval:
+            return entry.data
+        try:
+            st = os.stat(path)
+        except FileNotFoundError:
+            with self._lock:
+                self._entries.pop(path, None)
+            raise
+        key = (st.st_mtime_ns, st.st_size, st.st_ino)
+        # Permission changes do not alter the key, so check them every time.
+        if entry is not None and entry.key == key and not stat.S_IROTH & st.st_mode:
+            data = entry.data
+        else:
+            with open(path, "rb") as f:
+                st = os.fstat(f.fileno())
+                if stat.S_IROTH & st.st_mode:
+                    with self._lock:
+                        self._entries.pop(path, None)
+                    raise PrivateFileWorldReadableError(f)
+                key = (st.st_mtime_ns, st.st_size, st.st_ino)
+                data = parse(f)
+        with self._lock:
+            self._entries[path] = _Entry(key, now, data)
+        return data
+
+    def clear(self, path: Optional[str] = None) -> None:
+        """
+        Forget cached file contents.
+
+        :param path: File to forget, or ``None`` for all of them
+        """
+        with self._lock:
+            if path is None:
+                self._entries.clear()
+            else:
+                self._entries.pop(os.path.abspath(os.path.expanduser(path)), None)
+
+
+_default: Optional[ConfigLoader] = None
+_default_lock = threading.Lock()
+
+
+def default_loader() -> ConfigLoader:
+    """
+    Loader shared by :func:`load`.
+
+    :return: Process wide loader
+    """
+    global _default
+    if _default is not None:
+        return _default
+    with _default_lock:
+        if _default is None:
+            _default = ConfigLoader()
+        return _default
+
+
+def load(path: str, *, format: Optional[str] = None) -> Any:
+    """
+    Parsed contents of a private configuration file, cached until it changes.
+
+    .. code-block:: python
+
+        from toolforge import config
+
+
+        @app.route("/")
+        def index():
+            settings = config.load("~/www/python/src/config.yaml")
+            ...
+
+    :param path: Configuration file
+    :param format: Parser to use (``"yaml"``, ``"json"`` or ``"toml"``),
+        defaults to guessing from the file name extension
+    :return: Parsed configuration
+    :raise: :class:`ValueError`: When the format is unknown
+    :raise: :class:`toolforge.PrivateFileWorldReadableError`: When the file
+        is world-readable
+    """
+    return default_loader().load(path, format=format)
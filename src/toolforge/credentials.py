@@ -0,0 +1,163 @@
+# This file is part of Toolforge python helper library
+# Copyright (C) 2026 Kunal Mehta <legoktm@debian.org> and contributors
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+"""
+Resolve database credentials once instead of on every connection
+"""
+from __future__ import annotations  # PEP 563
+
+import configparser
+import os
+import stat
+import threading
+import time
+from typing import NamedTuple
+from typing import Optional
+from typing import Tuple
+
+from .exceptions import PrivateFileWorldReadableError
+
+#: Credentials file created for every tool account.
+DEFAULT_PATH = "~/replica.my.cnf"
+
+_FileKey = Tuple[int, int, int]
+
+
+class Credentials(NamedTuple):
+    user: str
+    password: str
+
+
+def _unquote(value: str) -> str:
+    if len(value) >= 2 and value[0] == value[-1] and value[0] in "'\"":
+        return value[1:-1]
+    return value
+
+
+class CredentialProvider:
+    """
+    Database credentials from environment variables or a MySQL options file.
+
+    The ``<prefix>_USER`` and ``<prefix>_PASSWORD`` environment variables
+    take precedence. Otherwise the ``[client]`` section of **path** is used,
+    which is parsed once and only read again after its modification time,
+    size or inode change, or when it became world-readable. At most once every **check_interval** seconds the
+    file is checked for changes, so opening many connections does not touch
+    the filesystem each time.
+    """
+
+    def __init__(
+        self,
+        path: str = DEFAULT_PATH,
+        *,
+        check_interval: float = 1.0,
+    ) -> None:
+        """
+        :param path: MySQL options file
+        :param check_interval: Seconds between checks for file changes
+        """
+        self.path = os.path.expanduser(path)
+        self.check_interval = check_interval
+        self._lock = threading.Lock()
+        self._checked: Optional[float] = None
+        self._key: Optional[_FileKey] = None
+        self._credentials: Optional[Credentials] = None
+
+    def resolve(self, prefix: str, *, use_file: bool = True) -> Optional[Credentials]:
+        """
+        Credentials for **prefix** (``TOOL_REPLICA`` or ``TOOL_TOOLSDB``).
+
+        :param prefix: Environment variable prefix
+        :param use_file: Fall back to the options file
+        :return: Credentials, or ``None`` if none were found
+        :raise: :class:`toolforge.PrivateFileWorldReadableError`: When the
+            options file is world-readable
+        """
+        user = os.environ.get(f"{prefix}_USER")
+        password = os.environ.get(f"{prefix}_PASSWORD")
+        if user is not None and password is not None:
+            return Credentials(user, password)
+        if not use_file:
+            return None
+        return self.from_file()
+
+    def from_file(self) -> Optional[Credentials]:
+        """
+        Credentials from the options file.
+
+        :return: Credentials, or ``None`` if the file or its ``[client]``
+            user and password are missing
+        :raise: :class:`toolforge.PrivateFileWorldReadableError`: When the
+            options file is world-readable
+        """
+        now = time.monotonic()
+        with self._lock:
+            if self._checked is not None and now - self._checked < self.check_interval:
+                return self._credentials
+            try:
+                st = os.stat(self.path)
+            except FileNotFoundError:
+                self._key = self._credentials = None
+            else:
+                key = (st.st_mtime_ns, st.st_size, st.st_ino)
+                # Permission changes do not alter the key, so check them
+                # every time.
+                if key != self._key or stat.S_IROTH & st.st_mode:
+                    self._checked = self._key = self._credentials = None
+                    self._credentials = self._read()
+                    self._key = key
+            self._checked = now
+            return self._credentials
+
+    def _read(self) -> Optional[Credentials]:
+        parser = configparser.ConfigParser(
+            allow_no_value=True,
+            interpolation=None,
+            strict=False,
+        )
+        with open(self.path) as f:
+            if stat.S_IROTH & os.fstat(f.fileno()).st_mode:
+                raise PrivateFileWorldReadableError(f)
+            parser.read_file(f)
+        user = parser.get("client", "user", fallback=None)
+        password = parser.get("client", "password", fallback=None)
+        if user is None or password is None:
+            return None
+        return Credentials(_unquote(user), _unquote(password))
+
+    def clear(self) -> None:
+        """Forget the cached file contents."""
+        with self._lock:
+            self._checked = self._key = self._credentials = None
+
+
+_default: Optional[CredentialProvider] = None
+_default_lock = threading.Lock()
+
+
+def default_provider() -> CredentialProvider:
+    """
+    Provider shared by :func:`toolforge.connect`, :func:`toolforge.toolsdb`
+    and the helpers built on them.
+
+    :return: Provider reading :data:`DEFAULT_PATH`
+    """
+    global _default
+    if _default is not None:
+        return _default
+    with _default_lock:
+        if _default is None:
+            _default = CredentialProvider()
+        return _default
@@ -22,6 +22,16 @@ from typing import Any
 from typing import IO
 
 
+class AdmissionTimeoutError(RuntimeError):
+    """
+    Raised when a connection gets no slot from the
+    :class:`toolforge.admission.AdmissionController` before its timeout
+    expires.
+    """
+
+    # pass
+
+
 class UnknownClusterError(ValueError):
     """Raised when an unknown "cluster" value is encountered."""
 
@@ -45,3 +55,12 @@ class PrivateFileWorldReadableError(ValueError):
             f"{getattr(f, 'name', 'config file')} should be private, "
             "but is currently world-readable!",
         )
+
+
+class PoolExhaustedError(RuntimeError):
+    """
+    Raised when a :class:`toolforge.pool.ConnectionPool` has no connection
+    available before the checkout timeout expires.
+    """
+
+    # pass
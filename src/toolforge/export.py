@@ -0,0 +1,346 @@
+# This file is part of Toolforge python helper library
+# Copyright (C) 2026 Kunal Mehta <legoktm@debian.org> and contributors
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+"""
+Export query results column by column to Arrow, Parquet or NumPy
+
+Rows are streamed from the server in batches and each batch is converted to
+columns before the next one is fetched, so only one batch of Python tuples
+exists at a time. The Arrow and Parquet functions need the optional pyarrow_
+library and :func:`to_numpy` needs NumPy_; both are installed with the
+``toolforge[export]`` extra.
+
+.. _pyarrow: https://arrow.apache.org/docs/python/
+.. _NumPy: https://numpy.org/
+"""
+from __future__ import annotations  # PEP 563
+
+from typing import Any
+from typing import Dict
+from typing import Generator
+from typing import Iterator
+from typing import List
+from typing import Optional
+from typing import Sequence
+from typing import TYPE_CHECKING
+from typing import Tuple
+
+import pymysql
+from pymysql.constants import FIELD_TYPE
+
+if TYPE_CHECKING:
+    import numpy
+    import pyarrow
+
+_Row = Tuple[Any, ...]
+_Description = Sequence[Tuple[Any, ...]]
+
+_INTEGERS = frozenset(
+    (
+        FIELD_TYPE.TINY,
+        FIELD_TYPE.SHORT,
+        FIELD_TYPE.LONG,
+        FIELD_TYPE.INT24,
+        FIELD_TYPE.LONGLONG,
+        FIELD_TYPE.YEAR,
+    ),
+)
+_FLOATS = frozenset((FIELD_TYPE.FLOAT, FIELD_TYPE.DOUBLE))
+_DECIMALS = frozenset((FIELD_TYPE.DECIMAL, FIELD_TYPE.NEWDECIMAL))
+_DATES = frozenset((FIELD_TYPE.DATE, FIELD_TYPE.NEWDATE))
+_TIMESTAMPS = frozenset((FIELD_TYPE.DATETIME, FIELD_TYPE.TIMESTAMP))
+
+
+def _execute(
+    conn: pymysql.connections.Connection[Any],
+    query: str,
+    args: Any,
+    batch_size: int,
+) -> Generator[Any, None, None]:
+    """Yield the result description, then lists of up to **batch_size** rows."""
+    if batch_size < 1:
+        raise ValueError("batch_size must be at least 1")
+    with conn.cursor(pymysql.cursors.SSCursor) as cur:
+        cur.execute(query, args)
+        yield cur.description or ()
+        while True:
+            batch = cur.fetchmany(batch_size)
+            if not batch:
+                return
+            yield list(batch)
+
+
+def _sample(batch: List[_Row], index: int) -> Any:
+    """First non-NULL value of column **index**."""
+    for row in batch:
+        if row[index] is not None:
+            return row[index]
+    return None
+
+
+def _arrow_type(
+    pa: Any,
+    column: Tuple[Any, ...],
+    sample: Any,
+    binary_as_string: bool,
+) -> Any:
+    type_code = column[1]
+    if type_code in _INTEGERS:
+        return pa.int64()
+    if type_code in _FLOATS:
+        return pa.float64()
+    if type_code in _DECIMALS:
+        precision, scale = column[4] or 0, column[5] or 0
+        if precision > 38:
+            return pa.decimal256(76, scale)
+        return pa.decimal128(38, scale)
+    if type_code in _DATES:
+        return pa.date32()
+    if type_code in _TIMESTAMPS:
+        return pa.timestamp("us")
+    if type_code == FIELD_TYPE.TIME:
+        return pa.duration("us")
+    if type_code == FIELD_TYPE.NULL:
+        return pa.null()
+    if isinstance(sample, str) or binary_as_string:
+        return pa.string()
+    return pa.binary()
+
+
+def arrow_schema(
+    description: _Description,
+    batch: Optional[List[_Row]] = None,
+    *,
+    binary_as_string: bool = False,
+) -> pyarrow.Schema:
+    """
+    Arrow schema for a result with the given cursor description.
+
+    Numeric and temporal types follow from the MySQL column types. Text and
+    binary columns are reported alike by the server, so they are strings if
+    **batch** contains a :class:`str` value for them or **binary_as_string**
+    is set, and binary otherwise.
+
+    :param description: :attr:`pymysql.cursors.Cursor.description`
+    :param batch: Rows to look at for text columns
+    :param binary_as_string: Decode binary columns as UTF-8 strings
+    :return: Schema
+    """
+    import pyarrow as pa
+
+    rows = batch or []
+    return pa.schema(
+        [
+            pa.field(
+                column[0],
+                _arrow_type(pa, column, _sample(rows, i), binary_as_string),
+            )
+            for i, column in enumerate(description)
+        ],
+    )
+
+
+def _record_batch(
+    pa: Any,
+    schema: pyarrow.Schema,
+    batch: List[_Row],
+) -> pyarrow.RecordBatch:
+    columns = list(zip(*batch))
+    return pa.RecordBatch.from_arrays(
+        [pa.array(values, type=field.type) for values, field in zip(columns, schema)],
+        schema=schema,
+    )
+
+
+def _arrow(
+    conn: pymysql.connections.Connection[Any],
+    query: str,
+    args: Any,
+    batch_size: int,
+    binary_as_string: bool,
+) -> Tuple[pyarrow.Schema, Iterator[pyarrow.RecordBatch]]:
+    import pyarrow as pa
+
+    results = _execute(conn, query, args, batch_size)
+    description = next(results)
+    first = next(results, None)
+    schema = arrow_schema(description, first, binary_as_string=binary_as_string)
+
+    def batches() -> Iterator[pyarrow.RecordBatch]:
+        if first is None:
+            return
+        try:
+            yield _record_batch(pa, schema, first)
+            for batch in results:
+                yield _record_batch(pa, schema, batch)
+        finally:
+            results.close()
+
+    return schema, batches()
+
+
+def record_batches(
+    conn: pymysql.connections.Connection[Any],
+    query: str,
+    args: Any = None,
+    *,
+    batch_size: int = 10_000,
+    binary_as_string: bool = False,
+) -> Iterator[pyarrow.RecordBatch]:
+    """
+    Run **query** and yield its rows as Arrow record batches.
+
+    All batches share the schema described in :func:`arrow_schema`, which
+    is determined from the first batch. Most text columns of the Wiki
+    Replicas are ``VARBINARY``, so pass ``binary_as_string=True`` to get
+    titles and other text as strings.
+
+    As with :func:`toolforge.streaming.iter_batches`, no other query can be
+    run on **conn** until the iterator is exhausted or closed.
+
+    :param conn: Database connection
+    :param query: SQL query
+    :param args: Query parameters, as for :meth:`pymysql.cursors.Cursor.execute`
+    :param batch_size: Maximum number of rows per batch
+    :param binary_as_string: Decode binary columns as UTF-8 strings
+    :return: Iterator of :class:`pyarrow.RecordBatch`
+    """
+    _, batches = _arrow(conn, query, args, batch_size, binary_as_string)
+    return batches
+
+
+def to_table(
+    conn: pymysql.connections.Connection[Any],
+    query: str,
+    args: Any = None,
+    *,
+    batch_size: int = 10_000,
+    binary_as_string: bool = False,
+) -> pyarrow.Table:
+    """
+    Run **query** and collect its rows in an Arrow table.
+
+    Call :meth:`pyarrow.Table.to_pandas` on the result to get a pandas
+    data frame without ever holding all rows as Python tuples.
+
+    :param conn: Database connection
+    :param query: SQL query
+    :param args: Query parameters, as for :meth:`pymysql.cursors.Cursor.execute`
+    :param batch_size: Number of rows fetched and converted at a time
+    :param binary_as_string: Decode binary columns as UTF-8 strings
+    :return: Table
+    """
+    import pyarrow as pa
+
+    schema, batches = _arrow(conn, query, args, batch_size, binary_as_string)
+    return pa.Table.from_batches(batches, schema=schema)
+
+
+def to_parquet(
+    conn: pymysql.connections.Connection[Any],
+    query: str,
+    path: str,
+    args: Any = None,
+    *,
+    batch_size: int = 10_000,
+    binary_as_string: bool = False,
+    compression: str = "zstd",
+) -> int:
+    """
+    Run **query** and write its rows to a Parquet file, one batch at a time.
+
+    :param conn: Database connection
+    :param query: SQL query
+    :param path: Parquet file to write
+    :param args: Query parameters, as for :meth:`pymysql.cursors.Cursor.execute`
+    :param batch_size: Number of rows fetched and written at a time
+    :param binary_as_string: Decode binary columns as UTF-8 strings
+    :param compression: Parquet compression codec
+    :return: Number of rows written
+    """
+    import pyarrow.parquet as pq
+
+    schema, batches = _arrow(conn, query, args, batch_size, binary_as_string)
+    rows = 0
+    with pq.ParquetWriter(path, schema, compression=compression) as writer:
+        for batch in batches:
+            writer.write_batch(batch)
+            rows += batch.num_rows
+    return rows
+
+
+def _numpy_dtype(type_code: int, values: Sequence[Any]) -> Any:
+    if type_code in _INTEGERS:
+        return "float64" if None in values else "int64"
+    if type_code in _FLOATS:
+        return "float64"
+    if type_code in _DATES:
+        return "datetime64[D]"
+    if type_code in _TIMESTAMPS:
+        return "datetime64[us]"
+    if type_code == FIELD_TYPE.TIME:
+        return "timedelta64[us]"
+    return object
+
+
+def to_numpy(
+    conn: pymysql.connections.Connection[Any],
+    query: str,
+    args: Any = None,
+    *,
+    batch_size: int = 10_000,
+    binary_as_string: bool = False,
+) -> Dict[str, numpy.ndarray[Any, Any]]:
+    """
+    Run **query** and collect each column of its rows in a NumPy array.
+
+    Integer columns become ``int64`` arrays, or ``float64`` with ``NaN`` for
+    ``NULL`` if they contain any, floating point columns ``float64`` and
+    temporal columns ``datetime64`` or ``timedelta64``. All other columns,
+    including decimals, text and binary, are object arrays.
+
+    :param conn: Database connection
+    :param query: SQL query
+    :param args: Query parameters, as for :meth:`pymysql.cursors.Cursor.execute`
+    :param batch_size: Number of rows fetched and converted at a time
+    :param binary_as_string: Decode binary columns as UTF-8 strings
+    :return: Arrays by column name
+    """
+    import numpy as np
+
+    results = _execute(conn, query, args, batch_size)
+    description = next(results)
+    chunks: List[List[numpy.ndarray[Any, Any]]] = [[] for _ in description]
+    for batch in results:
+        for i, values in enumerate(zip(*batch)):
+            dtype = _numpy_dtype(description[i][1], values)
+            if dtype is object:
+                if binary_as_string:
+                    values = tuple(
+                        v.decode("utf-8") if isinstance(v, bytes) else v for v in values
+                    )
+                # Avoid NumPy treating sequence values as another dimension.
+                array = np.empty(len(values), dtype=object)
+                array[:] = values
+            else:
+                array = np.array(values, dtype=dtype)
+            chunks[i].append(array)
+    columns = {}
+    for column, arrays in zip(description, chunks):
+        if arrays:
+            columns[column[0]] = np.concatenate(arrays)
+        else:
+            columns[column[0]] = np.empty(0, dtype=_numpy_dtype(column[1], ()))
+    return columns
@@ -0,0 +1,189 @@
+# This file is part of Toolforge python helper library
+# Copyright (C) 2026 Kunal Mehta <legoktm@debian.org> and contributors
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+"""
+Run one query against many wikis
+"""
+from __future__ import annotations  # PEP 563
+
+import concurrent.futures
+import functools
+import queue
+import socket
+import threading
+from typing import Any
+from typing import Dict
+from typing import Iterable
+from typing import Iterator
+from typing import List
+from typing import Optional
+from typing import Tuple
+
+import pymysql.cursors
+
+import toolforge
+
+_DONE = object()
+
+
+@functools.lru_cache(maxsize=None)
+def _canonical_host(host: str) -> str:
+    try:
+        return socket.gethostbyname_ex(host)[0]
+    except OSError:
+        return host
+
+
+def _database(dbname: str) -> str:
+    """Replica database of a wiki, as used by :func:`toolforge.connect`."""
+    return dbname if dbname.endswith("_p") else f"{dbname}_p"
+
+
+def section_host(dbname: str, cluster: str = "web") -> str:
+    """
+    Find the section host serving a wiki.
+
+    The per-wiki replica hostnames are DNS aliases of their section's host
+    (for example *enwiki.web.db.svc.wikimedia.cloud* points at
+    *s1.web.db.svc.wikimedia.cloud*). Names that cannot be resolved are
+    returned unchanged.
+
+    :param dbname: Database name
+    :param cluster: Database cluster (*analytics* or *web*)
+    :return: Hostname
+    :raise: :class:`toolforge.UnknownClusterError`: When **cluster** value is unknown
+    """
+    return _canonical_host(toolforge._connect_args(dbname, cluster)["host"])
+
+
+def group_by_section(
+    dbnames: Iterable[str],
+    cluster: str = "web",
+) -> Dict[str, List[str]]:
+    """
+    Group wikis by the section host serving them.
+
+    :param dbnames: Database names
+    :param cluster: Database cluster (*analytics* or *web*)
+    :return: Section hostname to database names mapping, in input order
+    """
+    sections: Dict[str, List[str]] = {}
+    for dbname in dbnames:
+        sections.setdefault(section_host(dbname, cluster), []).append(dbname)
+    return sections
+
+
+def fanout(
+    dbnames: Iterable[str],
+    query: str,
+    args: Any = None,
+    *,
+    cluster: str = "web",
+    max_workers: int = 4,
+    buffer_size: int = 1000,
+    **kwargs: Any,
+) -> Iterator[Tuple[str, Tuple[Any, ...]]]:
+    """
+    Run **query** against every wiki in **dbnames**.
+
+    Wikis are grouped by section host and each section is queried over a
+    single connection, switching databases between wikis. Up to
+    **max_workers** sections are queried concurrently and rows are streamed
+    from the server with :class:`pymysql.cursors.SSCursor` (unless another
+    ``cursorclass`` is given) and yielded as soon as they arrive, tagged
+    with the wiki they came from. Row order is preserved within a wiki but
+    not between wikis. Leaving the loop early closes the connections without
+    reading the rest of their result sets.
+
+    .. code-block:: python
+
+        for dbname, (count,) in fanout(dbnames, "SELECT COUNT(*) FROM page"):
+            print(dbname, count)
+
+    :param dbnames: Database names
+    :param query: SQL query
+    :param args: Query parameters, as for :meth:`pymysql.cursors.Cursor.execute`
+    :param cluster: Database cluster (*analytics* or *web*)
+    :param max_workers: Maximum number of sections queried at once
+    :param buffer_size: Maximum number of rows held before workers wait
+        for the consumer
+    :param `**kwargs`: For :meth:`pymysql.connect <pymysql.connections.Connection.__init__>`
+    :return: Iterator of ``(dbname, row)`` tuples
+    :raise: :class:`toolforge.UnknownClusterError`: When **cluster** value is unknown
+    """
+    sections = group_by_section(dbnames, cluster)
+    if not sections:
+        return
+    results: queue.Queue[Any] = queue.Queue(maxsize=buffer_size)
+    stop = threading.Event()
+
+    def put(item: Any) -> bool:
+        while not stop.is_set():
+            try:
+                results.put(item, timeout=0.1)
+            except queue.Full:
+                continue
+            return True
+        return False
+
+    def run(host: str, wikis: List[str]) -> None:
+        conn: Optional[toolforge._Connection] = None
+        try:
+            kw = toolforge._connect_args(wikis[0], cluster, **kwargs)
+            kw["host"] = host
+            kw.setdefault("cursorclass", pymysql.cursors.SSCursor)
+            conn = toolforge._connect(**kw)
+            for dbname in wikis:
+                if stop.is_set():
+                    return
+                database = _database(dbname)
+                conn.select_db(database)
+                # PyMySQL does not track the database selected after
+                # connecting, but instrumentation and caches report conn.db.
+                conn.db = database
+                cur = conn.cursor()
+                try:
+                    cur.execute(query, args)
+                    for row in cur:
+                        if not put((dbname, row)):
+                            return
+                    cur.close()
+                finally:
+                    # Closing an SSCursor reads the rest of its result set
+                    # from the server; when stopping early, closing the
+                    # connection drops it instead.
+                    cur.connection = None  # type: ignore[assignment]
+        except Exception as e:
+            put(e)
+        finally:
+            if conn is not None:
+                conn.close()
+            put(_DONE)
+
+    with concurrent.futures.ThreadPoolExecutor(max_workers=max_workers) as pool:
+        for host, wikis in sections.items():
+            pool.submit(run, host, wikis)
+        try:
+            pending = len(sections)
+            while pending:
+                item = results.get()
+                if item is _DONE:
+                    pending -= 1
+                elif isinstance(item, BaseException):
+                    raise item
+                else:
+                    yield item
+        finally:
+            stop.set()
@@ -0,0 +1,124 @@
+# This file is part of Toolforge python helper library
+# Copyright (C) 2026 Kunal Mehta <legoktm@debian.org> and contributors
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+"""
+Managed HTTP sessions for talking to Wikimedia APIs
+"""
+from __future__ import annotations  # PEP 563
+
+import threading
+from typing import Collection
+from typing import Optional
+import weakref
+
+import requests
+import requests.adapters
+import urllib3.util
+
+#: HTTP status codes that are retried with backoff.
+RETRY_STATUSES = (429, 503)
+
+_lock = threading.RLock()
+_user_agent: Optional[str] = None
+_session: Optional[requests.Session] = None
+#: Sessions created by make_session(), to update on set_user_agent()
+_sessions: weakref.WeakSet[requests.Session] = weakref.WeakSet()
+
+
+def user_agent() -> str:
+    """
+    User-Agent sent by managed sessions.
+
+    :return: The value configured by :func:`toolforge.set_user_agent`, or a
+        generic python-toolforge one if it has not been called
+    """
+    if _user_agent is not None:
+        return _user_agent
+    return f"python-toolforge python-requests/{requests.__version__}"
+
+
+def make_session(
+    *,
+    pool_maxsize: int = 10,
+    retries: int = 3,
+    backoff_factor: float = 0.5,
+    retry_statuses: Collection[int] = RETRY_STATUSES,
+) -> requests.Session:
+    """
+    Create a :class:`requests.Session` suitable for Wikimedia APIs.
+
+    The session sends the policy compliant :func:`user_agent`, also after it
+    is changed by :func:`toolforge.set_user_agent`, keeps up to
+    **pool_maxsize** connections per host alive for reuse, and retries
+    idempotent requests that fail to connect or receive one of the
+    **retry_statuses**, waiting ``backoff_factor * 2 ** attempt`` seconds (or
+    as long as the server's *Retry-After* header asks) between attempts.
+    Responses are requested gzip compressed, as with any :mod:`requests`
+    session.
+
+    :param pool_maxsize: Connections kept open per host
+    :param retries: Maximum number of retries per request
+    :param backoff_factor: Base delay in seconds between retries
+    :param retry_statuses: HTTP status codes to retry
+    :return: New session
+    """
+    retry = urllib3.util.Retry(
+        total=retries,
+        backoff_factor=backoff_factor,
+        status_forcelist=retry_statuses,
+        respect_retry_after_header=True,
+        raise_on_status=False,
+    )
+    adapter = requests.adapters.HTTPAdapter(
+        pool_maxsize=pool_maxsize,
+        max_retries=retry,
+    )
+    session = requests.Session()
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    with _lock:
+        session.headers["User-Agent"] = user_agent()
+        _sessions.add(session)
+    return session
+
+
+def get_session() -> requests.Session:
+    """
+    Get the process wide session created with :func:`make_session`.
+
+    This session is used for the library's own requests and can be shared by
+    tools to reuse its connections.
+
+    :return: Shared session
+    """
+    global _session
+    with _lock:
+        if _session is None:
+            _session = make_session()
+        return _session
+
+
+def _set_user_agent(ua: str) -> None:
+    """
+    Use **ua** for new managed sessions and the existing ones that still send
+    the previous value.
+    """
+    global _user_agent
+    with _lock:
+        previous = user_agent()
+        _user_agent = ua
+        for session in list(_sessions):
+            if session.headers.get("User-Agent") == previous:
+                session.headers["User-Agent"] = ua
@@ -0,0 +1,323 @@
+# This file is part of Toolforge python helper library
+# Copyright (C) 2026 Kunal Mehta <legoktm@debian.org> and contributors
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+"""
+Opt-in timing and metrics for database connections
+
+Instrumentation is enabled by registering at least one sink with
+:func:`add_sink`. Every connection created afterwards by
+:func:`toolforge.connect`, :func:`toolforge.toolsdb` and the helpers built on
+them reports its connect latency, and every query run through its cursors
+reports its duration, row count and error. While no sink is registered
+connections are created exactly as before.
+"""
+from __future__ import annotations  # PEP 563
+
+import functools
+import logging
+import threading
+import time
+from typing import Any
+from typing import Callable
+from typing import Dict
+from typing import List
+from typing import NamedTuple
+from typing import Optional
+from typing import Tuple
+from typing import Type
+
+import pymysql
+
+logger = logging.getLogger(__name__)
+
+
+class Event(NamedTuple):
+    """A single instrumented operation."""
+
+    #: ``"connect"``, ``"query"`` or ``"admission"``
+    kind: str
+    #: *web*, *analytics*, *tools* or ``None`` for other hosts
+    cluster: Optional[str]
+    host: str
+    dbname: Optional[str]
+    #: Seconds the operation took
+    duration: float
+    #: Rows returned or affected, if known
+    rows: Optional[int] = None
+    #: SQL before parameter substitution
+    query: Optional[str] = None
+    error: Optional[BaseException] = None
+
+
+Sink = Callable[[Event], None]
+
+_sinks: List[Sink] = []
+
+
+def add_sink(sink: Sink) -> None:
+    """
+    Start reporting events to **sink**.
+
+    Any callable accepting an :class:`Event` can be used as a sink, such as
+    :class:`LoggingSink` or :class:`MetricsRegistry`.
+    """
+    _sinks.append(sink)
+
+
+def remove_sink(sink: Sink) -> None:
+    """Stop reporting events to **sink**."""
+    _sinks.remove(sink)
+
+
+def _cluster(host: str) -> Optional[str]:
+    if host == "tools.db.svc.wikimedia.cloud":
+        return "tools"
+    for cluster in ("web", "analytics"):
+        if host.endswith(f".{cluster}.db.svc.wikimedia.cloud"):
+            return cluster
+    return None
+
+
+def _database(conn: Any) -> Optional[str]:
+    """Current database of **conn**, which PyMySQL encodes on connect."""
+    db = conn.db
+    if isinstance(db, bytes):
+        return db.decode(conn.encoding)
+    return db  # type: ignore[no-any-return]
+
+
+def _emit(event: Event) -> None:
+    for sink in list(_sinks):
+        try:
+            sink(event)
+        except Exception:
+            logger.exception("Instrumentation sink %r failed", sink)
+
+
+@functools.lru_cache(maxsize=None)
+def instrumented(cursorclass: Type[Any]) -> Type[Any]:
+    """
+    Subclass **cursorclass** so that calls to ``execute`` are reported.
+
+    :param cursorclass: PyMySQL cursor class
+    :return: Instrumented subclass
+    """
+    streaming = issubclass(cursorclass, pymysql.cursors.SSCursor)
+
+    class Instrumented(cursorclass):  # type: ignore[misc]
+        def execute(self, query: str, args: Any = None) -> Any:
+            start = time.perf_counter()
+            error = None
+            try:
+                return super().execute(query, args)
+            except BaseException as e:
+                error = e
+                raise
+            finally:
+                if _sinks:
+                    conn = self.connection
+                    _emit(
+                        Event(
+                            kind="query",
+                            cluster=_cluster(conn.host),
+                            host=conn.host,
+                            dbname=_database(conn),
+                            duration=time.perf_counter() - start,
+                            rows=None if streaming or error else self.rowcount,
+                            query=query,
+                            error=error,
+                        ),
+                    )
+
+    Instrumented.__name__ = f"Instrumented{cursorclass.__name__}"
+    Instrumented.__qualname__ = Instrumented.__name__
+    return Instrumented
+
+
+def connect(
+    factory: Callable[..., Any],
+    *args: Any,
+    **kwargs: Any,
+) -> Any:
+    """
+    Call **factory** to open a connection with instrumented cursors.
+
+    :param factory: Usually :func:`pymysql.connect`
+    :param `*args`: Positional arguments for **factory**
+    :param `**kwargs`: Keyword arguments for **factory**
+    :return: **factory** result
+    """
+    kwargs["cursorclass"] = instrumented(
+        kwargs.get("cursorclass", pymysql.cursors.Cursor),
+    )
+    host = kwargs.get("host", "localhost")
+    start = time.perf_counter()
+    error = None
+    try:
+        return factory(*args, **kwargs)
+    except BaseException as e:
+        error = e
+        raise
+    finally:
+        _emit(
+            Event(
+                kind="connect",
+                cluster=_cluster(host),
+                host=host,
+                dbname=kwargs.get("database"),
+                duration=time.perf_counter() - start,
+                error=error,
+            ),
+        )
+
+
+class LoggingSink:
+    """
+    Log events to a :class:`logging.Logger`.
+
+    Events are logged at *DEBUG* level, failures at *ERROR* level, and
+    queries taking at least **slow_query_threshold** seconds at *WARNING*
+    level.
+    """
+
+    def __init__(
+        self,
+        logger: Optional[logging.Logger] = None,
+        *,
+        slow_query_threshold: Optional[float] = 1.0,
+    ) -> None:
+        """
+        :param logger: Logger to use, defaults to ``toolforge.instrumentation``
+        :param slow_query_threshold: Seconds, or ``None`` to never warn
+        """
+        self.logger = logger or logging.getLogger(__name__)
+        self.slow_query_threshold = slow_query_threshold
+
+    def __call__(self, event: Event) -> None:
+        if event.error is not None:
+            level = logging.ERROR
+        elif (
+            event.kind == "query"
+            and self.slow_query_threshold is not None
+            and event.duration >= self.slow_query_threshold
+        ):
+            level = logging.WARNING
+        else:
+            level = logging.DEBUG
+        if not self.logger.isEnabledFor(level):
+            return
+        self.logger.log(
+            level,
+            "%s %s/%s took %.3fs%s%s: %s",
+            event.kind,
+            event.host,
+            event.dbname,
+            event.duration,
+            "" if event.rows is None else f" ({event.rows} rows)",
+            "" if event.error is None else f" and failed with {event.error!r}",
+            event.query or "",
+        )
+
+
+_Labels = Tuple[Tuple[str, str], ...]
+
+
+class MetricsRegistry:
+    """
+    Aggregate events into Prometheus style metrics.
+
+    :meth:`render` returns the metrics in the Prometheus text exposition
+    format, ready to be served from a ``/metrics`` endpoint:
+
+    - ``toolforge_db_connect_seconds`` (summary)
+    - ``toolforge_db_query_seconds`` (summary)
+    - ``toolforge_db_query_rows_total`` (counter)
+    - ``toolforge_db_errors_total`` (counter)
+    - ``toolforge_db_admission_seconds`` (summary), when
+      :mod:`toolforge.admission` is enabled
+    """
+
+    _HELP = {
+        "toolforge_db_connect_seconds": ("summary", "Connection setup time"),
+        "toolforge_db_query_seconds": ("summary", "Query execution time"),
+        "toolforge_db_query_rows_total": ("counter", "Rows returned or affected"),
+        "toolforge_db_errors_total": ("counter", "Failed connections and queries"),
+        "toolforge_db_admission_seconds": (
+            "summary",
+            "Time waited for a connection slot",
+        ),
+    }
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._values: Dict[str, Dict[_Labels, List[float]]] = {
+            name: {} for name in self._HELP
+        }
+
+    def __call__(self, event: Event) -> None:
+        labels: _Labels = (
+            ("cluster", event.cluster or ""),
+            ("host", event.host),
+            ("dbname", event.dbname or ""),
+        )
+        with self._lock:
+            self._add(f"toolforge_db_{event.kind}_seconds", labels, event.duration)
+            if event.rows is not None:
+                self._add("toolforge_db_query_rows_total", labels, event.rows)
+            if event.error is not None:
+                self._add(
+                    "toolforge_db_errors_total",
+                    labels + (("kind", event.kind),),
+                    1,
+                )
+
+    def _add(self, name: str, labels: _Labels, value: float) -> None:
+        series = self._values[name].setdefault(labels, [0, 0.0])
+        series[0] += 1
+        series[1] += value
+
+    def get(self, name: str, **labels: str) -> float:
+        """
+        Current value of a metric, summed over all series matching **labels**.
+
+        Summaries return their total (``_sum``).
+        """
+        with self._lock:
+            return sum(
+                value[1]
+                for key, value in self._values[name].items()
+                if all(dict(key).get(k) == v for k, v in labels.items())
+            )
+
+    def render(self) -> str:
+        """Metrics in the Prometheus text exposition format."""
+        lines = []
+        with self._lock:
+            for name, (kind, text) in self._HELP.items():
+                lines.append(f"# HELP {name} {text}")
+                lines.append(f"# TYPE {name} {kind}")
+                for labels, (count, total) in sorted(self._values[name].items()):
+                    label = ",".join(f'{k}="{_escape(v)}"' for k, v in labels)
+                    if kind == "summary":
+                        lines.append(f"{name}_count{{{label}}} {int(count)}")
+                        lines.append(f"{name}_sum{{{label}}} {total!r}")
+                    else:
+                        # Counters count rows and errors, so they are whole
+                        lines.append(f"{name}{{{label}}} {int(total)}")
+        return "\n".join(lines) + "\n"
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
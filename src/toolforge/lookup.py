@@ -0,0 +1,194 @@
+# This file is part of Toolforge python helper library
+# Copyright (C) 2026 Kunal Mehta <legoktm@debian.org> and contributors
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+"""
+Look up many keys with a few ``IN (...)`` queries instead of one query each
+"""
+from __future__ import annotations  # PEP 563
+
+from typing import Any
+from typing import Dict
+from typing import Hashable
+from typing import Iterable
+from typing import Iterator
+from typing import List
+from typing import Sequence
+from typing import Tuple
+from typing import Union
+
+import toolforge
+
+from .bulk import _quote
+
+_Row = Tuple[Any, ...]
+
+
+def _normalize(value: Any) -> Any:
+    """Make keys returned by the server comparable to the requested ones."""
+    if isinstance(value, (bytes, bytearray)):
+        return bytes(value).decode("utf-8", "surrogateescape")
+    if isinstance(value, (tuple, list)):
+        return tuple(_normalize(v) for v in value)
+    return value
+
+
+def chunks(
+    conn: toolforge._Connection,
+    keys: Iterable[Hashable],
+    *,
+    chunk_size: int = 1000,
+    max_bytes: int = 1 << 20,
+) -> Iterator[List[Hashable]]:
+    """
+    Split distinct **keys** into lists small enough for one ``IN`` query.
+
+    :param conn: Connection used to escape the keys
+    :param keys: Keys, duplicates are dropped
+    :param chunk_size: Maximum keys per list
+    :param max_bytes: Maximum size of the escaped keys of a list
+    :return: Iterator of key lists
+    """
+    if chunk_size < 1:
+        raise ValueError("chunk_size must be at least 1")
+    chunk: List[Hashable] = []
+    size = 0
+    for key in dict.fromkeys(keys):
+        length = len(conn.escape(key)) + 1
+        if chunk and (len(chunk) >= chunk_size or size + length > max_bytes):
+            yield chunk
+            chunk = []
+            size = 0
+        chunk.append(key)
+        size += length
+    if chunk:
+        yield chunk
+
+
+def lookup_all(
+    conn: toolforge._Connection,
+    table: str,
+    key: Union[str, Sequence[str]],
+    keys: Iterable[Hashable],
+    *,
+    columns: str = "*",
+    where: str = "",
+    args: Sequence[Any] = (),
+    chunk_size: int = 1000,
+    max_bytes: int = 1 << 20,
+) -> Dict[Hashable, List[_Row]]:
+    """
+    Fetch the rows matching each of **keys**.
+
+    Instead of one ``SELECT ... WHERE key = %s`` per key, the distinct keys
+    are sent in chunks of up to **chunk_size** with ``WHERE key IN (...)``,
+    keeping each query well below ``max_allowed_packet`` and short enough
+    for the query killer.
+
+    .. code-block:: python
+
+        pages = lookup_all(
+            conn,
+            "page",
+            ("page_namespace", "page_title"),
+            [(0, "Main_Page"), (4, "About")],
+            columns="page_id",
+        )
+
+    **key** may name several columns, in which case every key is a tuple of
+    their values. Binary column values are decoded as UTF-8 before they are
+    matched to the keys, so titles can be given as :class:`str`.
+
+    :param conn: Database connection
+    :param table: Table name
+    :param key: Column, or columns, to match the keys against
+    :param keys: Keys to look up
+    :param columns: SQL select list of the returned rows
+    :param where: Additional SQL condition
+    :param args: Parameters for **where**
+    :param chunk_size: Maximum keys per query
+    :param max_bytes: Maximum size of the escaped keys of a query
+    :return: Rows by key; keys without rows are left out
+    """
+    key_columns = [key] if isinstance(key, str) else list(key)
+    width = len(key_columns)
+    select = ", ".join(_quote(c) for c in key_columns)
+    if width > 1:
+        match = f"({select})"
+    else:
+        match = select
+    query = f"SELECT {select}, {columns} FROM {_quote(table)} WHERE {match} IN %s"
+    if where:
+        query += f" AND ({where})"
+
+    results: Dict[Hashable, List[_Row]] = {}
+    for chunk in chunks(conn, keys, chunk_size=chunk_size, max_bytes=max_bytes):
+        requested = {_normalize(k): k for k in chunk}
+        with conn.cursor() as cur:
+            cur.execute(query, (tuple(chunk), *args))
+            for row in cur.fetchall():
+                found = row[0] if width == 1 else row[:width]
+                original = requested.get(_normalize(found), found)
+                results.setdefault(original, []).append(tuple(row[width:]))
+    return results
+
+
+def lookup(
+    conn: toolforge._Connection,
+    table: str,
+    key: Union[str, Sequence[str]],
+    keys: Iterable[Hashable],
+    *,
+    columns: str = "*",
+    where: str = "",
+    args: Sequence[Any] = (),
+    chunk_size: int = 1000,
+    max_bytes: int = 1 << 20,
+) -> Dict[Hashable, _Row]:
+    """
+    Fetch the row matching each of **keys**, for unique keys.
+
+    Like :func:`lookup_all`, but returns a single row per key. If several
+    rows match a key, the last one is used.
+
+    .. code-block:: python
+
+        rows = lookup(conn, "page", "page_id", page_ids, columns="page_title")
+        titles = {page_id: row[0] for page_id, row in rows.items()}
+
+    :param conn: Database connection
+    :param table: Table name
+    :param key: Column, or columns, to match the keys against
+    :param keys: Keys to look up
+    :param columns: SQL select list of the returned rows
+    :param where: Additional SQL condition
+    :param args: Parameters for **where**
+    :param chunk_size: Maximum keys per query
+    :param max_bytes: Maximum size of the escaped keys of a query
+    :return: Row by key; keys without a row are left out
+    """
+    return {
+        k: rows[-1]
+        for k, rows in lookup_all(
+            conn,
+            table,
+            key,
+            keys,
+            columns=columns,
+            where=where,
+            args=args,
+            chunk_size=chunk_size,
+            max_bytes=max_bytes,
+        ).items()
+    }
@@ -0,0 +1,277 @@
+# This file is part of Toolforge python helper library
+# Copyright (C) 2026 Kunal Mehta <legoktm@debian.org> and contributors
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+"""
+Thread-safe pooling of database connections
+"""
+from __future__ import annotations  # PEP 563
+
+import collections
+import contextlib
+import threading
+import time
+from typing import Any
+from typing import Deque
+from typing import Dict
+from typing import Hashable
+from typing import Iterator
+from typing import List
+from typing import Optional
+from typing import Tuple
+
+import pymysql
+
+import toolforge
+
+from . import admission
+from .exceptions import PoolExhaustedError
+
+_Key = Tuple[Hashable, ...]
+
+
+class _Bucket:
+    """Connections sharing a single pool key."""
+
+    __slots__ = ("idle", "size")
+
+    def __init__(self) -> None:
+        self.idle: Deque[Tuple[toolforge._Connection, float]] = collections.deque()
+        self.size = 0
+
+
+def _key(kwargs: Dict[str, Any]) -> _Key:
+    """Pool key: host, database and user followed by any other options."""
+    user = kwargs.get("user", kwargs.get("read_default_file"))
+    rest = sorted(
+        (k, repr(v))
+        for k, v in kwargs.items()
+        if k not in ("host", "database", "user", "password")
+    )
+    return (kwargs.get("host"), kwargs.get("database"), user, *rest)
+
+
+def _close_quietly(conn: toolforge._Connection) -> None:
+    try:
+        conn.close()
+    except Exception:
+        pass
+
+
+class ConnectionPool:
+    """
+    Reuse connections created by :func:`toolforge.connect` and
+    :func:`toolforge.toolsdb`.
+
+    Connections are keyed by host, database and user. Checked in connections
+    are kept idle for up to **idle_timeout** seconds and pinged before being
+    handed out again, so dropped connections are replaced transparently.
+
+    .. code-block:: python
+
+        pool = ConnectionPool(max_size=4)
+        with pool.connect("enwiki") as conn:
+            with conn.cursor() as cur:
+                cur.execute(query)
+    """
+
+    def __init__(
+        self,
+        max_size: int = 5,
+        *,
+        idle_timeout: float = 60.0,
+        timeout: Optional[float] = 30.0,
+    ) -> None:
+        """
+        :param max_size: Maximum open connections per key
+        :param idle_timeout: Seconds an idle connection may be kept
+        :param timeout: Seconds to wait for a free connection, or ``None``
+            to wait forever
+        """
+        if max_size < 1:
+            raise ValueError("max_size must be at least 1")
+        self.max_size = max_size
+        self.idle_timeout = idle_timeout
+        self.timeout = timeout
+        self._buckets: Dict[_Key, _Bucket] = {}
+        self._cond = threading.Condition()
+        admission._pools.add(self)
+
+    @contextlib.contextmanager
+    def connect(
+        self,
+        dbname: str,
+        cluster: str = "web",
+        *,
+        extension: Optional[str] = None,
+        **kwargs: Any,
+    ) -> Iterator[toolforge._Connection]:
+        """
+        Check out a Wiki Replicas connection.
+
+        Takes the same arguments as :func:`toolforge.connect`.
+
+        :raise: :class:`toolforge.PoolExhaustedError`: When no connection
+            became available within the pool's timeout
+        """
+        kw = toolforge._connect_args(dbname, cluster, extension=extension, **kwargs)
+        with self._checkout(kw) as conn:
+            yield conn
+
+    @contextlib.contextmanager
+    def toolsdb(self, dbname: str, **kwargs: Any) -> Iterator[toolforge._Connection]:
+        """
+        Check out a ToolsDB connection.
+
+        Takes the same arguments as :func:`toolforge.toolsdb`.
+
+        :raise: :class:`toolforge.PoolExhaustedError`: When no connection
+            became available within the pool's timeout
+        """
+        with self._checkout(toolforge._toolsdb_args(dbname, **kwargs)) as conn:
+            yield conn
+
+    @contextlib.contextmanager
+    def _checkout(self, kwargs: Dict[str, Any]) -> Iterator[toolforge._Connection]:
+        key = _key(kwargs)
+        conn = self._acquire(key, kwargs)
+        try:
+            yield conn
+        except (pymysql.err.OperationalError, pymysql.err.InterfaceError):
+            self._discard(key, conn)
+            raise
+        except BaseException:
+            self._release(key, conn)
+            raise
+        else:
+            self._release(key, conn)
+
+    def _acquire(self, key: _Key, kwargs: Dict[str, Any]) -> toolforge._Connection:
+        deadline = None if self.timeout is None else time.monotonic() + self.timeout
+        conn = None
+        stale: List[toolforge._Connection] = []
+        try:
+            with self._cond:
+                bucket = self._buckets.setdefault(key, _Bucket())
+                while True:
+                    stale += self._expire()
+                    if bucket.idle:
+                        conn = bucket.idle.pop()[0]
+                        break
+                    if bucket.size < self.max_size:
+                        bucket.size += 1
+                        break
+                    remaining = (
+                        None if deadline is None else deadline - time.monotonic()
+                    )
+                    if remaining is not None and remaining <= 0:
+                        raise PoolExhaustedError(
+                            f"No connection to {kwargs.get('host')} available "
+                            f"after {self.timeout} seconds",
+                        )
+                    self._cond.wait(remaining)
+        finally:
+            for old in stale:
+                _close_quietly(old)
+
+        if conn is not None:
+            if self._alive(conn):
+                return conn
+            _close_quietly(conn)
+        try:
+            return toolforge._connect(**kwargs)
+        except BaseException:
+            with self._cond:
+                bucket.size -= 1
+                self._cond.notify()
+            raise
+
+    def _expire(self) -> List[toolforge._Connection]:
+        """
+        Take idle connections older than the idle timeout out of all buckets,
+        for the caller to close once it no longer holds the lock.
+        """
+        cutoff = time.monotonic() - self.idle_timeout
+        stale = []
+        for bucket in self._buckets.values():
+            while bucket.idle and bucket.idle[0][1] < cutoff:
+                stale.append(bucket.idle.popleft()[0])
+                bucket.size -= 1
+                self._cond.notify()
+        return stale
+
+    def _close_idle(self, name: str) -> bool:
+        """
+        Close the least recently used idle connection counting against the
+        admission quota **name**, so a caller waiting for its slot gets it.
+        """
+        with self._cond:
+            buckets = [
+                bucket
+                for key, bucket in self._buckets.items()
+                if bucket.idle and admission.quota(str(key[0])) == name
+            ]
+            if not buckets:
+                return False
+            bucket = min(buckets, key=lambda b: b.idle[0][1])
+            conn, _ = bucket.idle.popleft()
+            bucket.size -= 1
+            self._cond.notify()
+        _close_quietly(conn)
+        return True
+
+    @staticmethod
+    def _alive(conn: toolforge._Connection) -> bool:
+        try:
+            conn.ping(reconnect=False)
+        except pymysql.err.Error:
+            return False
+        return True
+
+    def _release(self, key: _Key, conn: toolforge._Connection) -> None:
+        try:
+            conn.rollback()
+        except pymysql.err.Error:
+            self._discard(key, conn)
+            return
+        with self._cond:
+            self._buckets[key].idle.append((conn, time.monotonic()))
+            self._cond.notify()
+            stale = self._expire()
+        for old in stale:
+            _close_quietly(old)
+
+    def _discard(self, key: _Key, conn: toolforge._Connection) -> None:
+        _close_quietly(conn)
+        with self._cond:
+            self._buckets[key].size -= 1
+            self._cond.notify()
+
+    def close(self) -> None:
+        """Close all idle connections."""
+        idle = []
+        with self._cond:
+            for bucket in self._buckets.values():
+                while bucket.idle:
+                    idle.append(bucket.idle.popleft()[0])
+                    bucket.size -= 1
+            self._cond.notify_all()
+        for conn in idle:
+            _close_quietly(conn)
+
+    def __enter__(self) -> ConnectionPool:
+        return self
+
+    def __exit__(self, *exc: Any) -> None:  # noqa: U100
+        self.close()
@@ -0,0 +1,258 @@
+# This file is part of Toolforge python helper library
+# Copyright (C) 2026 Kunal Mehta <legoktm@debian.org> and contributors
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+"""
+Reconnect and retry reads when database connections are lost
+"""
+from __future__ import annotations  # PEP 563
+
+import logging
+import random
+import time
+from typing import Any
+from typing import Callable
+from typing import Dict
+from typing import List
+from typing import NamedTuple
+from typing import Optional
+from typing import Tuple
+from typing import TypeVar
+
+import pymysql
+
+import toolforge
+
+logger = logging.getLogger(__name__)
+
+_T = TypeVar("_T")
+
+#: MySQL error codes after which the connection is reopened and the work is
+#: tried again: server shutdown (1053), query or connection killed (1317,
+#: 1927), can't connect (2003), server has gone away (2006) and lost
+#: connection during query (2013).
+RETRYABLE_ERRORS = frozenset((1053, 1317, 1927, 2003, 2006, 2013))
+
+
+class Retry(NamedTuple):
+    """A failed attempt that is about to be retried."""
+
+    #: Number of the retry, starting at 1
+    attempt: int
+    error: pymysql.err.Error
+    #: Seconds waited before the retry
+    delay: float
+
+
+def retryable(error: BaseException) -> bool:
+    """
+    Whether **error** means the connection was lost rather than the query
+    being wrong.
+
+    :param error: Exception raised by PyMySQL
+    :return: ``True`` if the work should be retried on a new connection
+    """
+    if isinstance(error, pymysql.err.InterfaceError):
+        # Raised for any use of a connection that was already closed.
+        return True
+    if isinstance(error, (pymysql.err.OperationalError, pymysql.err.InternalError)):
+        return bool(error.args) and error.args[0] in RETRYABLE_ERRORS
+    return False
+
+
+class ResilientConnection:
+    """
+    Database connection that is reopened when it is lost.
+
+    Work passed to :meth:`run` or :meth:`execute` is retried up to
+    **retries** times on a new connection when the server goes away or the
+    query is killed, waiting a random time of up to **backoff** seconds,
+    doubling after every attempt up to **max_backoff**. The new connection
+    uses the host, database and credentials resolved when the wrapper was
+    created.
+
+    Only idempotent work, such as reads, should be retried: a statement
+    interrupted by a lost connection may or may not have been committed.
+
+    .. code-block:: python
+
+        from toolforge import retry
+
+        with retry.connect("enwiki", "analytics") as conn:
+            rows = conn.execute("SELECT page_id FROM page WHERE page_len > %s", 10)
+    """
+
+    def __init__(
+        self,
+        connect_args: Dict[str, Any],
+        *,
+        retries: int = 5,
+        backoff: float = 1.0,
+        max_backoff: float = 60.0,
+        on_retry: Optional[Callable[[Retry], None]] = None,
+    ) -> None:
+        """
+        :param connect_args: Resolved connection arguments
+        :param retries: Retries of each piece of work before giving up
+        :param backoff: Upper bound of the first delay, in seconds
+        :param max_backoff: Upper bound of every delay, in seconds
+        :param on_retry: Called before every retry
+        """
+        self.connect_args = connect_args
+        self.retries = retries
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.on_retry = on_retry
+        #: Total number of retries so far
+        self.retry_count = 0
+        self._conn: Optional[toolforge._Connection] = None
+
+    def run(self, work: Callable[[toolforge._Connection], _T]) -> _T:
+        """
+        Call **work** with the connection, retrying when the connection is
+        lost.
+
+        :param work: Idempotent function of the connection
+        :return: Result of **work**
+        :raise: :class:`pymysql.err.Error`: When the work fails for another
+            reason or keeps failing after all retries
+        """
+        attempt = 0
+        while True:
+            try:
+                if self._conn is None:
+                    self._conn = toolforge._connect(**self.connect_args)
+                return work(self._conn)
+            except pymysql.err.Error as e:
+                if attempt >= self.retries or not retryable(e):
+                    raise
+                attempt += 1
+                self._drop()
+                delay = random.uniform(
+                    0,
+                    min(self.max_backoff, self.backoff * 2 ** (attempt - 1)),
+                )
+                self.retry_count += 1
+                logger.warning(
+                    "Lost connection to %s (%s), retry %d in %.1fs",
+                    self.connect_args.get("host"),
+                    e,
+                    attempt,
+                    delay,
+                )
+                if self.on_retry is not None:
+                    self.on_retry(Retry(attempt, e, delay))
+                time.sleep(delay)
+
+    def execute(self, query: str, args: Any = None) -> List[Tuple[Any, ...]]:
+        """
+        Run a read query and fetch all its rows, retrying when the
+        connection is lost.
+
+        :param query: SQL query
+        :param args: Query parameters
+        :return: Result rows
+        """
+
+        def work(conn: toolforge._Connection) -> List[Tuple[Any, ...]]:
+            with conn.cursor() as cur:
+                cur.execute(query, args)
+                return list(cur.fetchall())
+
+        return self.run(work)
+
+    @property
+    def connection(self) -> toolforge._Connection:
+        """Underlying connection, opened again if it was lost."""
+        return self.run(lambda conn: conn)
+
+    def _drop(self) -> None:
+        if self._conn is not None:
+            try:
+                self._conn.close()
+            except Exception:
+                pass
+            self._conn = None
+
+    def close(self) -> None:
+        """Close the connection."""
+        self._drop()
+
+    def __enter__(self) -> ResilientConnection:
+        return self
+
+    def __exit__(self, *exc: Any) -> None:  # noqa: U100
+        self.close()
+
+
+def connect(
+    dbname: str,
+    cluster: str = "web",
+    *,
+    retries: int = 5,
+    backoff: float = 1.0,
+    max_backoff: float = 60.0,
+    on_retry: Optional[Callable[[Retry], None]] = None,
+    **kwargs: Any,
+) -> ResilientConnection:
+    """
+    Connect to a Wiki Replica database, reconnecting when the connection is
+    lost.
+
+    :param dbname: Database name
+    :param cluster: Database cluster (*analytics* or *web*)
+    :param retries: Retries of each piece of work before giving up
+    :param backoff: Upper bound of the first delay, in seconds
+    :param max_backoff: Upper bound of every delay, in seconds
+    :param on_retry: Called before every retry
+    :param `**kwargs`: For :func:`toolforge.connect`
+    :return: Resilient connection
+    :raise: :class:`toolforge.UnknownClusterError`: When **cluster** value is unknown
+    """
+    return ResilientConnection(
+        toolforge._connect_args(dbname, cluster, **kwargs),
+        retries=retries,
+        backoff=backoff,
+        max_backoff=max_backoff,
+        on_retry=on_retry,
+    )
+
+
+def toolsdb(
+    dbname: str,
+    *,
+    retries: int = 5,
+    backoff: float = 1.0,
+    max_backoff: float = 60.0,
+    on_retry: Optional[Callable[[Retry], None]] = None,
+    **kwargs: Any,
+) -> ResilientConnection:
+    """
+    Connect to a ToolsDB database, reconnecting when the connection is lost.
+
+    :param dbname: Database name
+    :param retries: Retries of each piece of work before giving up
+    :param backoff: Upper bound of the first delay, in seconds
+    :param max_backoff: Upper bound of every delay, in seconds
+    :param on_retry: Called before every retry
+    :param `**kwargs`: For :func:`toolforge.toolsdb`
+    :return: Resilient connection
+    """
+    return ResilientConnection(
+        toolforge._toolsdb_args(dbname, **kwargs),
+        retries=retries,
+        backoff=backoff,
+        max_backoff=max_backoff,
+        on_retry=on_retry,
+    )
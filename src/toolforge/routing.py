@@ -0,0 +1,223 @@
+# This file is part of Toolforge python helper library
+# Copyright (C) 2026 Kunal Mehta <legoktm@debian.org> and contributors
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+"""
+Pick the replica cluster for a query from its workload and replica health
+"""
+from __future__ import annotations  # PEP 563
+
+import logging
+import math
+import threading
+import time
+from typing import Any
+from typing import Dict
+from typing import NamedTuple
+from typing import Optional
+from typing import Tuple
+
+import pymysql
+
+import toolforge
+
+from .fanout import section_host
+
+logger = logging.getLogger(__name__)
+
+#: Short queries serving a user, preferably run on the *web* cluster.
+INTERACTIVE = "interactive"
+#: Long running queries, preferably run on the *analytics* cluster.
+BATCH = "batch"
+
+_PREFERENCE = {
+    INTERACTIVE: ("web", "analytics"),
+    BATCH: ("analytics", "web"),
+}
+
+
+class Measurement(NamedTuple):
+    """Health of a section host."""
+
+    #: Replication lag in seconds, ``math.inf`` if it could not be measured
+    lag: float
+    #: Seconds taken to connect and read the lag
+    response_time: float
+    #: :func:`time.monotonic` timestamp of the measurement
+    measured: float
+
+
+class Route(NamedTuple):
+    """Where a query was routed to."""
+
+    dbname: str
+    workload: str
+    cluster: str
+    #: Section host serving **dbname** on **cluster**
+    host: str
+    measurement: Measurement
+
+
+class Router:
+    """
+    Route connections to the *web* or *analytics* cluster.
+
+    Interactive queries go to *web* unless its section host is unreachable,
+    lagging by more than **max_lag** seconds or taking longer than
+    **max_response_time** seconds to respond, and *analytics* is doing
+    better. Batch queries go to *analytics*, and since *web* kills long
+    queries they only move there when *analytics* is unreachable.
+
+    Lag is read from ``heartbeat_p.heartbeat`` and cached per section host
+    for **ttl** seconds, so most routing decisions cost nothing.
+
+    .. code-block:: python
+
+        router = Router()
+        conn, route = router.connect("enwiki", BATCH)
+        print(f"Running on {route.cluster}")
+    """
+
+    def __init__(
+        self,
+        *,
+        max_lag: float = 60.0,
+        max_response_time: float = 1.0,
+        ttl: float = 30.0,
+    ) -> None:
+        """
+        :param max_lag: Lag in seconds tolerated on the preferred cluster
+        :param max_response_time: Seconds after which the preferred cluster
+            counts as slow
+        :param ttl: Seconds measurements are reused for
+        """
+        self.max_lag = max_lag
+        self.max_response_time = max_response_time
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._measurements: Dict[str, Measurement] = {}
+
+    def measure(self, dbname: str, cluster: str) -> Tuple[str, Measurement]:
+        """
+        Measure the section host serving **dbname** on **cluster**.
+
+        :param dbname: Database name
+        :param cluster: Database cluster (*analytics* or *web*)
+        :return: Section hostname and its, possibly cached, measurement
+        :raise: :class:`toolforge.UnknownClusterError`: When **cluster** value is unknown
+        """
+        host = section_host(dbname, cluster)
+        now = time.monotonic()
+        with self._lock:
+            cached = self._measurements.get(host)
+        if cached is not None and now - cached.measured < self.ttl:
+            return host, cached
+        measurement = self._probe(dbname, cluster, host)
+        with self._lock:
+            self._measurements[host] = measurement
+        return host, measurement
+
+    def _probe(self, dbname: str, cluster: str, host: str) -> Measurement:
+        shard = host.split(".", 1)[0]
+        start = time.monotonic()
+        try:
+            conn = toolforge._connect(
+                **toolforge._connect_args(dbname, cluster, host=host),
+            )
+            try:
+                with conn.cursor() as cur:
+                    if shard.startswith("s") and shard[1:].isdigit():
+                        cur.execute(
+                            "SELECT lag FROM heartbeat_p.heartbeat WHERE shard = %s",
+                            (shard,),
+                        )
+                    else:
+                        cur.execute("SELECT MAX(lag) FROM heartbeat_p.heartbeat")
+                    row = cur.fetchone()
+            finally:
+                conn.close()
+        except pymysql.err.Error as e:
+            logger.warning("Could not measure replication lag on %s: %s", host, e)
+            lag = math.inf
+        else:
+            lag = math.inf if row is None or row[0] is None else float(row[0])
+        end = time.monotonic()
+        return Measurement(lag=lag, response_time=end - start, measured=end)
+
+    def _unhealthy(self, measurement: Measurement, workload: str) -> bool:
+        if workload == BATCH:
+            return measurement.lag == math.inf
+        return (
+            measurement.lag > self.max_lag
+            or measurement.response_time > self.max_response_time
+        )
+
+    def _better(self, preferred: Measurement, other: Measurement) -> bool:
+        """Whether **other** should be used instead of unhealthy **preferred**."""
+        if other.lag == math.inf:
+            return False
+        if preferred.lag > self.max_lag:
+            return other.lag < preferred.lag
+        return (
+            other.response_time < preferred.response_time and other.lag <= self.max_lag
+        )
+
+    def route(self, dbname: str, workload: str = INTERACTIVE) -> Route:
+        """
+        Choose the cluster for a query.
+
+        :param dbname: Database name
+        :param workload: :data:`INTERACTIVE` or :data:`BATCH`
+        :return: Chosen route
+        :raise: :class:`ValueError`: When **workload** is unknown
+        """
+        try:
+            preferred, fallback = _PREFERENCE[workload]
+        except KeyError:
+            raise ValueError(f"Unknown workload {workload!r}") from None
+        host, measurement = self.measure(dbname, preferred)
+        if self._unhealthy(measurement, workload):
+            other_host, other = self.measure(dbname, fallback)
+            if self._better(measurement, other):
+                return Route(dbname, workload, fallback, other_host, other)
+        return Route(dbname, workload, preferred, host, measurement)
+
+    def connect(
+        self,
+        dbname: str,
+        workload: str = INTERACTIVE,
+        **kwargs: Any,
+    ) -> Tuple[toolforge._Connection, Route]:
+        """
+        Connect to the cluster chosen by :meth:`route`.
+
+        :param dbname: Database name
+        :param workload: :data:`INTERACTIVE` or :data:`BATCH`
+        :param `**kwargs`: For :func:`toolforge.connect`
+        :return: Connection and the route it was opened on
+        """
+        route = self.route(dbname, workload)
+        return toolforge.connect(dbname, route.cluster, **kwargs), route
+
+    def forget(self, host: Optional[str] = None) -> None:
+        """
+        Drop cached measurements.
+
+        :param host: Section host to forget, or ``None`` for all of them
+        """
+        with self._lock:
+            if host is None:
+                self._measurements.clear()
+            else:
+                self._measurements.pop(host, None)
@@ -0,0 +1,241 @@
+# This file is part of Toolforge python helper library
+# Copyright (C) 2026 Kunal Mehta <legoktm@debian.org> and contributors
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+"""
+Scan big tables in parallel, resumable primary key ranges
+"""
+from __future__ import annotations  # PEP 563
+
+import collections
+import concurrent.futures
+import json
+import os
+from typing import Any
+from typing import Deque
+from typing import Dict
+from typing import Iterator
+from typing import List
+from typing import NamedTuple
+from typing import Optional
+from typing import Sequence
+from typing import Tuple
+
+import toolforge
+
+from .bulk import _quote
+from .pool import ConnectionPool
+
+_Row = Tuple[Any, ...]
+
+
+class Chunk(NamedTuple):
+    """Half-open primary key range ``start <= key < stop``."""
+
+    start: int
+    stop: int
+
+
+def chunks(start: int, end: int, size: int) -> Iterator[Chunk]:
+    """
+    Split the key range from **start** to **end** (inclusive) into chunks.
+
+    :param start: Lowest key
+    :param end: Highest key
+    :param size: Keys per chunk
+    :return: Iterator of chunks, in key order
+    """
+    if size < 1:
+        raise ValueError("chunk_size must be at least 1")
+    for lo in range(start, end + 1, size):
+        yield Chunk(lo, min(lo + size, end + 1))
+
+
+class Checkpoint:
+    """
+    JSON file recording how far a :func:`scan` got.
+
+    The file stores the first key of the next chunk together with a
+    description of the scan, so that it cannot be resumed by a different
+    one by accident.
+    """
+
+    def __init__(self, path: str, scan: Dict[str, Any]) -> None:
+        """
+        :param path: Checkpoint file
+        :param scan: Description of the scan
+        """
+        self.path = path
+        self.scan = scan
+
+    def load(self) -> Optional[int]:
+        """
+        First key that has not been scanned yet.
+
+        :return: Key, or ``None`` if there is no checkpoint
+        :raise: :class:`ValueError`: When the checkpoint is for another scan
+        """
+        try:
+            with open(self.path) as f:
+                data = json.load(f)
+        except FileNotFoundError:
+            return None
+        if data["scan"] != self.scan:
+            raise ValueError(f"{self.path} is a checkpoint of a different scan")
+        return int(data["next"])
+
+    def save(self, next_key: int) -> None:
+        """Record that all keys below **next_key** have been scanned."""
+        toolforge._atomic_write(
+            self.path,
+            json.dumps({"scan": self.scan, "next": next_key}).encode("utf-8"),
+            prefix=".checkpoint-",
+        )
+
+    def remove(self) -> None:
+        """Delete the checkpoint once the scan is complete."""
+        try:
+            os.unlink(self.path)
+        except FileNotFoundError:
+            pass
+
+
+def scan(
+    dbname: str,
+    table: str,
+    key: str,
+    *,
+    columns: str = "*",
+    where: Optional[str] = None,
+    args: Sequence[Any] = (),
+    cluster: str = "analytics",
+    chunk_size: int = 10_000,
+    max_workers: int = 4,
+    checkpoint: Optional[str] = None,
+    pool: Optional[ConnectionPool] = None,
+    **kwargs: Any,
+) -> Iterator[_Row]:
+    """
+    Read a whole table in primary key order, in parallel chunks.
+
+    The range between the lowest and highest value of the integer column
+    **key** is split into chunks of **chunk_size** keys, which up to
+    **max_workers** threads query concurrently over pooled connections.
+    Each query is short enough to stay clear of the query killer, and rows
+    are yielded in key order as soon as the chunks before them are done.
+
+    .. code-block:: python
+
+        for rev_id, rev_actor in scan(
+            "enwiki",
+            "revision",
+            "rev_id",
+            columns="rev_id, rev_actor",
+            checkpoint="revision.checkpoint",
+        ):
+            ...
+
+    With **checkpoint**, the first key of the next chunk is saved to that
+    file whenever all rows of a chunk have been consumed, and a scan started
+    with the same arguments resumes from there. The file is removed once
+    the scan completes.
+
+    :param dbname: Database name
+    :param table: Table name
+    :param key: Integer primary key column
+    :param columns: SQL select list
+    :param where: Additional SQL condition
+    :param args: Parameters for **where**
+    :param cluster: Database cluster (*analytics* or *web*)
+    :param chunk_size: Keys per chunk
+    :param max_workers: Chunks queried at once
+    :param checkpoint: Checkpoint file to resume from and save progress to
+    :param pool: Pool to take connections from, instead of a new one
+    :param `**kwargs`: For :func:`toolforge.connect`
+    :return: Iterator of rows
+    """
+    query = (
+        f"SELECT {columns} FROM {_quote(table)}"
+        f" WHERE {_quote(key)} >= %s AND {_quote(key)} < %s"
+    )
+    if where:
+        query += f" AND ({where})"
+    query += f" ORDER BY {_quote(key)}"
+    state = None
+    if checkpoint is not None:
+        state = Checkpoint(
+            checkpoint,
+            {
+                "dbname": dbname,
+                "table": table,
+                "key": key,
+                "columns": columns,
+                "where": where,
+                "args": list(args),
+            },
+        )
+
+    connections = pool if pool is not None else ConnectionPool(max_size=max_workers)
+    try:
+        with connections.connect(dbname, cluster, **kwargs) as conn:
+            with conn.cursor() as cur:
+                cur.execute(
+                    f"SELECT MIN({_quote(key)}), MAX({_quote(key)})"
+                    f" FROM {_quote(table)}",
+                )
+                lowest, highest = cur.fetchone()  # type: ignore[misc]
+        if lowest is None:
+            if state is not None:
+                state.remove()
+            return
+        if state is not None:
+            resume = state.load()
+            if resume is not None:
+                lowest = max(lowest, resume)
+
+        def fetch(chunk: Chunk) -> List[_Row]:
+            with connections.connect(dbname, cluster, **kwargs) as conn:
+                with conn.cursor() as cur:
+                    cur.execute(query, (chunk.start, chunk.stop, *args))
+                    return list(cur.fetchall())
+
+        todo = chunks(lowest, highest, chunk_size)
+        pending: Deque[Tuple[Chunk, concurrent.futures.Future[List[_Row]]]] = (
+            collections.deque()
+        )
+        with concurrent.futures.ThreadPoolExecutor(max_workers) as executor:
+
+            def submit() -> None:
+                chunk = next(todo, None)
+                if chunk is not None:
+                    pending.append((chunk, executor.submit(fetch, chunk)))
+
+            try:
+                for _ in range(max_workers * 2):
+                    submit()
+                while pending:
+                    chunk, future = pending.popleft()
+                    rows = future.result()
+                    submit()
+                    yield from rows
+                    if state is not None:
+                        state.save(chunk.stop)
+            finally:
+                for _, future in pending:
+                    future.cancel()
+        if state is not None:
+            state.remove()
+    finally:
+        if pool is None:
+            connections.close()
@@ -0,0 +1,703 @@
+# This file is part of Toolforge python helper library
+# Copyright (C) 2026 Kunal Mehta <legoktm@debian.org> and contributors
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+"""
+Indexed, disk cached view of the Wikimedia site matrix
+"""
+from __future__ import annotations  # PEP 563
+
+import argparse
+import functools
+import gc
+import gzip
+import io
+import json
+import os
+import sys
+import threading
+import time
+from typing import Any
+from typing import Dict
+from typing import Iterable
+from typing import Iterator
+from typing import List
+from typing import Mapping
+from typing import NamedTuple
+from typing import Optional
+from typing import Sequence
+from typing import Tuple
+from typing import Union
+
+import requests
+
+import toolforge
+
+from . import http
+from .exceptions import UnknownDatabaseError
+
+#: Seconds before a cached site matrix is considered stale.
+CACHE_TTL = 24 * 60 * 60
+
+#: Seconds a stale site matrix keeps being served after a failed fetch,
+#: before fetching is tried again.
+RETRY_AFTER = 5 * 60
+
+#: Seconds to wait for the site matrix API before using a stale copy.
+FETCH_TIMEOUT = 10
+
+_CACHE_VERSION = 2
+
+_SNAPSHOT_MAGIC = "toolforge-sitematrix-snapshot"
+
+_lock = threading.Lock()
+_current: Optional[SiteMatrix] = None
+#: :func:`time.monotonic` value before which no new fetch is attempted
+_retry_after = 0.0
+_snapshot_data: Optional[Tuple[str, Optional[SiteMatrix]]] = None
+
+
+def normalize_host(domain: str) -> str:
+    """
+    Reduce a domain or URL to the bare hostname used as an index key.
+
+    :param domain: DNS domain or URL to wiki
+    :return: Lower-cased hostname without scheme or path
+    """
+    if domain.startswith(("http://", "https://")):
+        domain = domain.split("://", 1)[1]
+    if "/" in domain:
+        domain = domain.split("/", 1)[0]
+    return domain.lower()
+
+
+def cache_path() -> str:
+    """
+    Location of the on-disk site matrix cache.
+
+    The path can be overridden with the ``TOOLFORGE_SITEMATRIX_CACHE``
+    environment variable, otherwise it lives below ``$XDG_CACHE_HOME``
+    (``~/.cache`` by default).
+
+    :return: Absolute path to the cache file
+    """
+    path = os.environ.get("TOOLFORGE_SITEMATRIX_CACHE")
+    if path:
+        return path
+    base = os.environ.get("XDG_CACHE_HOME") or os.path.expanduser("~/.cache")
+    return os.path.join(base, "toolforge", "sitematrix.json")
+
+
+_CLOSED = 1
+_PRIVATE = 2
+_FISHBOWL = 4
+
+
+class Site(NamedTuple):
+    """A single wiki in the site matrix."""
+
+    #: Normalized hostname, like *en.wikipedia.org*
+    host: str
+    dbname: str
+    #: Project code, like *wiki* or *wikisource*
+    code: str
+    #: Language code, or the project code for special wikis
+    lang: str
+    closed: bool = False
+    private: bool = False
+    fishbowl: bool = False
+
+    @property
+    def url(self) -> str:
+        return f"https://{self.host}"
+
+
+def _site_fields(site: Site) -> Tuple[str, str, str, str, int]:
+    """Serialize **site** as ``host, dbname, code, lang, flags``."""
+    flags = (
+        (_CLOSED if site.closed else 0)
+        | (_PRIVATE if site.private else 0)
+        | (_FISHBOWL if site.fishbowl else 0)
+    )
+    return (site.host, site.dbname, site.code, site.lang, flags)
+
+
+def _site_from_fields(fields: Sequence[Any]) -> Site:
+    """Build a record from the fields returned by :func:`_site_fields`."""
+    host, db, code, lang, flags = fields
+    flags = int(flags)
+    return Site(
+        host,
+        db,
+        sys.intern(code),
+        sys.intern(lang),
+        bool(flags & _CLOSED),
+        bool(flags & _PRIVATE),
+        bool(flags & _FISHBOWL),
+    )
+
+
+_Index = Tuple[Dict[str, Site], Dict[str, List[Site]], Dict[str, List[Site]]]
+
+#: Project names accepted in place of their site matrix codes.
+_FAMILIES = {"wikipedia": "wiki"}
+
+
+class SiteMatrix:
+    """
+    Index of wikis by hostname.
+
+    Only the fields needed for lookups are kept, as :class:`Site` records
+    with interned project and language codes, so an index of all Wikimedia
+    wikis takes up little memory. See :func:`preload` for sharing it between
+    forked worker processes.
+    """
+
+    def __init__(
+        self,
+        sites: Union[Mapping[str, str], Iterable[Site]],
+        fetched: Optional[float] = None,
+    ):
+        """
+        :param sites: Site records, or a normalized hostname to dbname mapping
+        :param fetched: Unix timestamp of when the data was retrieved
+        """
+        if isinstance(sites, Mapping):
+            sites = (Site(host, db, "", "") for host, db in sites.items())
+        self._sites: Tuple[Site, ...] = tuple(sites)
+        self._hosts: Dict[str, str] = {site.host: site.dbname for site in self._sites}
+        self._index: Optional[_Index] = None
+        self.fetched = time.time() if fetched is None else fetched
+
+    @classmethod
+    def from_api(cls, data: Any, fetched: Optional[float] = None) -> SiteMatrix:
+        """
+        Build an index from an ``action=sitematrix`` API response.
+
+        :param data: Decoded JSON response
+        :param fetched: Unix timestamp of when the data was retrieved
+        :return: New index
+        """
+        sites = []
+        matrix = data["sitematrix"]
+        for key, value in matrix.items():
+            if key.isdigit():
+                lang = value["code"]
+                entries = value["site"]
+            elif key == "specials":
+                lang = None
+                entries = value
+            else:
+                continue
+            for site in entries:
+                sites.append(
+                    Site(
+                        normalize_host(site["url"]),
+                        site["dbname"],
+                        sys.intern(site["code"]),
+                        sys.intern(lang or site.get("lang", site["code"])),
+                        "closed" in site,
+                        "private" in site,
+                        "fishbowl" in site,
+                    ),
+                )
+        return cls(sites, fetched)
+
+    @classmethod
+    def load(cls, path: str) -> SiteMatrix:
+        """
+        Read an index previously written by :meth:`save`.
+
+        :param path: Cache file
+        :return: Index
+        :raise: :class:`OSError`: When the file cannot be read
+        :raise: :class:`ValueError`: When the file is not a valid cache
+        """
+        with open(path, encoding="utf-8") as f:
+            data = json.load(f)
+        if not isinstance(data, dict) or data.get("version") != _CACHE_VERSION:
+            raise ValueError(f"{path} is not a site matrix cache")
+        return cls(map(_site_from_fields, data["sites"]), data["fetched"])
+
+    def save(self, path: str) -> None:
+        """
+        Atomically write the index to disk.
+
+        The data is written to a temporary file in the same directory which
+        is then renamed over **path**, so concurrent readers never observe a
+        partially written cache.
+
+        :param path: Cache file
+        """
+        data = {
+            "version": _CACHE_VERSION,
+            "fetched": self.fetched,
+            "sites": [_site_fields(site) for site in self._sites],
+        }
+        toolforge._atomic_write(
+            path,
+            json.dumps(data, separators=(",", ":")).encode("utf-8"),
+            prefix=".sitematrix-",
+        )
+
+    @classmethod
+    def load_snapshot(cls, path: str) -> SiteMatrix:
+        """
+        Read a snapshot written by :meth:`save_snapshot`.
+
+        Snapshots written by older versions, which only contain hostnames
+        and database names, can still be read.
+
+        :param path: Snapshot file
+        :return: Index
+        :raise: :class:`OSError`: When the file cannot be read
+        :raise: :class:`ValueError`: When the file is not a valid snapshot
+        """
+        with gzip.open(path, "rt", encoding="utf-8") as f:
+            header = f.readline().split()
+            if (
+                len(header) != 3
+                or header[0] != _SNAPSHOT_MAGIC
+                or header[1] not in ("1", "2")
+            ):
+                raise ValueError(f"{path} is not a site matrix snapshot")
+            if header[1] == "1":
+                fields = (
+                    line.rstrip("\n").split("\t", 1) + ["", "", "0"] for line in f
+                )
+            else:
+                fields = (line.rstrip("\n").split("\t") for line in f)
+            sites = map(_site_from_fields, fields)
+            return cls(sites, float(header[2]))
+
+    def save_snapshot(self, path: str) -> None:
+        """
+        Atomically write a compact, non-expiring snapshot of the index.
+
+        Snapshots are gzip compressed text files with one tab separated
+        record per line.
+
+        :param path: Snapshot file
+        """
+        lines = [f"{_SNAPSHOT_MAGIC} 2 {self.fetched!r}\n"]
+        lines.extend(
+            "\t".join(map(str, _site_fields(site))) + "\n"
+            for site in sorted(self._sites)
+        )
+        data = "".join(lines).encode("utf-8")
+        # gzip.compress() only accepts mtime since Python 3.8.
+        compressed = io.BytesIO()
+        with gzip.GzipFile(fileobj=compressed, mode="wb", mtime=0) as f:
+            f.write(data)
+        toolforge._atomic_write(
+            path,
+            compressed.getvalue(),
+            prefix=".sitematrix-",
+        )
+
+    def expired(self, ttl: float = CACHE_TTL) -> bool:
+        """Check if the data is older than **ttl** seconds."""
+        return time.time() - self.fetched > ttl
+
+    def dbname(self, domain: str) -> str:
+        """
+        Convert a domain/URL into its database name.
+
+        :param domain: DNS domain or URL to wiki
+        :return: Wikimedia database name (like *enwiki*)
+        :raises: :class:`toolforge.UnknownDatabaseError`: When dbname mapping for domain is unknown
+        """
+        host = normalize_host(domain)
+        try:
+            return self._hosts[host]
+        except KeyError:
+            raise UnknownDatabaseError(
+                f"Unable to find database name for https://{host}",
+            ) from None
+
+    def _indexes(self) -> _Index:
+        """Build the dbname, project and language indexes on first use."""
+        index = self._index
+        if index is None:
+            by_dbname: Dict[str, Site] = {}
+            by_code: Dict[str, List[Site]] = {}
+            by_lang: Dict[str, List[Site]] = {}
+            for site in self._sites:
+                by_dbname[site.dbname] = site
+                by_code.setdefault(site.code, []).append(site)
+                by_lang.setdefault(site.lang, []).append(site)
+            index = self._index = (by_dbname, by_code, by_lang)
+        return index
+
+    def site(self, dbname: str) -> Site:
+        """
+        Look up a wiki by its database name.
+
+        :param dbname: Database name, with or without the ``_p`` suffix
+        :return: Site record
+        :raises: :class:`toolforge.UnknownDatabaseError`: When **dbname** is unknown
+        """
+        if dbname.endswith("_p"):
+            dbname = dbname[:-2]
+        try:
+            return self._indexes()[0][dbname]
+        except KeyError:
+            raise UnknownDatabaseError(f"Unknown database name {dbname}") from None
+
+    def url(self, dbname: str) -> str:
+        """
+        Canonical URL of a wiki.
+
+        :param dbname: Database name
+        :return: URL, like *https://en.wikipedia.org*
+        :raises: :class:`toolforge.UnknownDatabaseError`: When **dbname** is unknown
+        """
+        return self.site(dbname).url
+
+    def sites(
+        self,
+        *,
+        family: Optional[str] = None,
+        lang: Optional[str] = None,
+        closed: Optional[bool] = None,
+        private: Optional[bool] = None,
+        fishbowl: Optional[bool] = None,
+    ) -> List[Site]:
+        """
+        List wikis matching all of the given filters.
+
+        .. code-block:: python
+
+            open_wikipedias = matrix.sites(family="wikipedia", closed=False)
+
+        :param family: Project code, like *wiki* (or *wikipedia*),
+            *wiktionary* or *commons*
+        :param lang: Language code
+        :param closed: Only closed (``True``) or open (``False``) wikis
+        :param private: Only private or public wikis
+        :param fishbowl: Only fishbowl or other wikis
+        :return: Matching sites, in site matrix order
+        """
+        _, by_code, by_lang = self._indexes()
+        candidates: Sequence[Site] = self._sites
+        if family is not None:
+            candidates = by_code.get(_FAMILIES.get(family, family), [])
+        if lang is not None:
+            if family is None:
+                candidates = by_lang.get(lang, [])
+            else:
+                candidates = [site for site in candidates if site.lang == lang]
+        return [
+            site
+            for site in candidates
+            if (closed is None or site.closed == closed)
+            and (private is None or site.private == private)
+            and (fishbowl is None or site.fishbowl == fishbowl)
+        ]
+
+    def by_section(
+        self,
+        cluster: str = "web",
+        **filters: Any,
+    ) -> Dict[str, List[Site]]:
+        """
+        Group wikis by the replica section host serving them.
+
+        Sections are resolved through DNS as in
+        :func:`toolforge.fanout.section_host`, so this needs to run inside
+        Cloud VPS.
+
+        :param cluster: Database cluster (*analytics* or *web*)
+        :param `**filters`: For :meth:`sites`
+        :return: Section hostname to sites mapping
+        """
+        from .fanout import section_host
+
+        sections: Dict[str, List[Site]] = {}
+        for site in self.sites(**filters):
+            sections.setdefault(section_host(site.dbname, cluster), []).append(site)
+        return sections
+
+    def __contains__(self, domain: object) -> bool:
+        return isinstance(domain, str) and normalize_host(domain) in self._hosts
+
+    def __len__(self) -> int:
+        return len(self._sites)
+
+    def __iter__(self) -> Iterator[Site]:
+        return iter(self._sites)
+
+
+def snapshot_path() -> Optional[str]:
+    """
+    Location of the offline site matrix snapshot, if there is one.
+
+    The ``TOOLFORGE_SITEMATRIX_SNAPSHOT`` environment variable names a
+    snapshot created with ``python3 -m toolforge.sitematrix snapshot``.
+    Otherwise a ``sitematrix.snapshot`` file distributed with the package is
+    used if present.
+
+    :return: Absolute path to the snapshot file or ``None``
+    """
+    return os.environ.get("TOOLFORGE_SITEMATRIX_SNAPSHOT") or _bundled_snapshot()
+
+
+@functools.lru_cache(maxsize=None)
+def _bundled_snapshot() -> Optional[str]:
+    bundled = os.path.join(os.path.dirname(__file__), "sitematrix.snapshot")
+    if os.path.exists(bundled):
+        return bundled
+    return None
+
+
+def _snapshot() -> Optional[SiteMatrix]:
+    """Load the offline snapshot once per path."""
+    global _snapshot_data
+    path = snapshot_path()
+    if path is None:
+        return None
+    if _snapshot_data is None or _snapshot_data[0] != path:
+        try:
+            matrix: Optional[SiteMatrix] = SiteMatrix.load_snapshot(path)
+        except (OSError, ValueError, EOFError):
+            matrix = None
+        _snapshot_data = (path, matrix)
+    return _snapshot_data[1]
+
+
+def dbname(domain: str) -> str:
+    """
+    Convert a domain/URL into its database name.
+
+    The offline snapshot (see :func:`snapshot_path`) is consulted first, so
+    known hosts are resolved without any network access. Other hosts are
+    looked up in :func:`get_sitematrix`.
+
+    :param domain: DNS domain or URL to wiki
+    :return: Wikimedia database name (like *enwiki*)
+    :raises: :class:`toolforge.UnknownDatabaseError`: When dbname mapping for domain is unknown
+    """
+    snapshot = _snapshot()
+    if snapshot is not None and domain in snapshot:
+        return snapshot.dbname(domain)
+    return get_sitematrix().dbname(domain)
+
+
+def dbnames(domains: Iterable[str], *, strict: bool = True) -> Dict[str, str]:
+    """
+    Convert many domains/URLs into database names at once.
+
+    Each distinct input is normalized once and resolved with a dictionary
+    lookup, first against the offline snapshot and then against
+    :func:`get_sitematrix` (which is only consulted if the snapshot misses).
+
+    :param domains: DNS domains or URLs to wikis
+    :param strict: Raise for unknown domains instead of leaving them out
+    :return: Mapping of each distinct input to its database name
+    :raises: :class:`toolforge.UnknownDatabaseError`: When **strict** is set
+        and any domain is unknown; the message lists all of them
+    """
+    pending = {domain: normalize_host(domain) for domain in dict.fromkeys(domains)}
+    result: Dict[str, str] = {}
+    for source in (_snapshot, get_sitematrix):
+        if not pending:
+            break
+        matrix = source()
+        if matrix is None:
+            continue
+        for domain, host in list(pending.items()):
+            db = matrix._hosts.get(host)
+            if db is not None:
+                result[domain] = db
+                del pending[domain]
+
+    if pending and strict:
+        unknown = ", ".join(sorted(set(pending.values())))
+        raise UnknownDatabaseError(f"Unable to find database names for {unknown}")
+    return result
+
+
+def site(dbname: str) -> Site:
+    """
+    Look up a wiki by its database name in the current index.
+
+    :param dbname: Database name, with or without the ``_p`` suffix
+    :return: Site record
+    :raises: :class:`toolforge.UnknownDatabaseError`: When **dbname** is unknown
+    """
+    return get_sitematrix().site(dbname)
+
+
+def sites(**filters: Any) -> List[Site]:
+    """
+    List wikis in the current index, see :meth:`SiteMatrix.sites`.
+
+    :param `**filters`: For :meth:`SiteMatrix.sites`
+    :return: Matching sites
+    """
+    return get_sitematrix().sites(**filters)
+
+
+def _fetch_sitematrix() -> Any:
+    r = http.get_session().get(
+        "https://meta.wikimedia.org/w/api.php",
+        params={"action": "sitematrix", "format": "json"},
+        timeout=FETCH_TIMEOUT,
+    )
+    r.raise_for_status()
+    return r.json()
+
+
+def get_sitematrix(ttl: float = CACHE_TTL) -> SiteMatrix:
+    """
+    Get the current site matrix index.
+
+    The index is kept in memory and persisted to :func:`cache_path`. It is
+    only fetched from meta.wikimedia.org when neither copy is younger than
+    **ttl** seconds. If that fetch fails or takes longer than
+    :data:`FETCH_TIMEOUT` seconds, a stale on-disk copy is used rather than
+    raising, and no new fetch is tried for :data:`RETRY_AFTER` seconds.
+
+    :param ttl: Maximum age in seconds of cached data
+    :return: Site matrix index
+    """
+    current = _usable(ttl)
+    if current is not None:
+        return current
+    with _lock:
+        current = _usable(ttl)
+        if current is not None:
+            return current
+        fresh, stale = _cached(ttl)
+        if fresh is not None:
+            return fresh
+        try:
+            data = _fetch_sitematrix()
+        except requests.RequestException:
+            if stale is None:
+                raise
+            return _fall_back(stale)
+        return _store(SiteMatrix.from_api(data))
+
+
+def _usable(ttl: float) -> Optional[SiteMatrix]:
+    """The in-memory index, if it is fresh or fetching is being held off."""
+    current = _current
+    if current is not None and (
+        not current.expired(ttl) or time.monotonic() < _retry_after
+    ):
+        return current
+    return None
+
+
+def _fall_back(stale: SiteMatrix) -> SiteMatrix:
+    """
+    Serve **stale** after a failed fetch and hold off fetching for
+    :data:`RETRY_AFTER` seconds. Must be called with ``_lock`` held.
+    """
+    global _retry_after
+    _retry_after = time.monotonic() + RETRY_AFTER
+    return _store(stale, save=False)
+
+
+def _cached(ttl: float) -> Tuple[Optional[SiteMatrix], Optional[SiteMatrix]]:
+    """
+    Find the in-memory or on-disk index. Must be called with ``_lock`` held.
+
+    :return: Index younger than **ttl** (or ``None``) and the newest expired
+        index (or ``None``)
+    """
+    global _current
+    if _current is not None and not _current.expired(ttl):
+        return _current, None
+
+    stale = _current
+    try:
+        cached = SiteMatrix.load(cache_path())
+    except (OSError, ValueError, KeyError, TypeError):
+        pass
+    else:
+        if not cached.expired(ttl):
+            _current = cached
+            return cached, None
+        if stale is None or cached.fetched > stale.fetched:
+            stale = cached
+    return None, stale
+
+
+def _store(matrix: SiteMatrix, save: bool = True) -> SiteMatrix:
+    """Make **matrix** current and save it. Must be called with ``_lock`` held."""
+    global _current
+    if save:
+        try:
+            matrix.save(cache_path())
+        except OSError:
+            pass
+    _current = matrix
+    return matrix
+
+
+def clear_cache() -> None:
+    """Forget the in-memory index and snapshot so the next lookup reloads them."""
+    global _current, _retry_after, _snapshot_data
+    with _lock:
+        _current = None
+        _retry_after = 0.0
+        _snapshot_data = None
+
+
+def preload(*, freeze: bool = True) -> SiteMatrix:
+    """
+    Load the site matrix before forking worker processes.
+
+    Call this in the parent process of a pre-forking server (for example in
+    gunicorn's ``on_starting`` hook, or at import time with
+    ``preload_app = True``) so that all workers share one copy of the index
+    instead of each loading their own. With **freeze**, :func:`gc.freeze`
+    moves everything loaded so far out of the garbage collector's reach, so
+    that collections in the workers do not copy the shared memory pages.
+
+    :param freeze: Call :func:`gc.freeze` afterwards
+    :return: Site matrix index
+    """
+    _snapshot()
+    matrix = get_sitematrix()
+    if freeze:
+        gc.freeze()
+    return matrix
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    """Command line interface for generating site matrix snapshots."""
+    parser = argparse.ArgumentParser(
+        prog="python3 -m toolforge.sitematrix",
+        description="Manage the offline Wikimedia site matrix snapshot.",
+    )
+    sub = parser.add_subparsers(dest="command", required=True)
+    snap = sub.add_parser("snapshot", help="download the site matrix and save it")
+    snap.add_argument(
+        "-o",
+        "--output",
+        default=snapshot_path() or "sitematrix.snapshot",
+        help="snapshot file to write (default: %(default)s)",
+    )
+    args = parser.parse_args(argv)
+
+    matrix = SiteMatrix.from_api(_fetch_sitematrix())
+    matrix.save_snapshot(args.output)
+    print(f"Wrote {len(matrix)} hosts to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
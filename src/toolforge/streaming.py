@@ -0,0 +1,86 @@
+# This file is part of Toolforge python helper library
+# Copyright (C) 2026 Kunal Mehta <legoktm@debian.org> and contributors
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+"""
+Iterate over large result sets without buffering them
+"""
+from __future__ import annotations  # PEP 563
+
+from typing import Any
+from typing import Iterator
+from typing import List
+from typing import Tuple
+
+import pymysql
+
+_Row = Tuple[Any, ...]
+
+
+def iter_batches(
+    conn: pymysql.connections.Connection[Any],
+    query: str,
+    args: Any = None,
+    *,
+    batch_size: int = 1000,
+) -> Iterator[List[_Row]]:
+    """
+    Run **query** and yield its rows in lists of up to **batch_size**.
+
+    An unbuffered :class:`pymysql.cursors.SSCursor` is used regardless of
+    the connection's default cursor class, so at most one batch is held in
+    client memory at a time.
+
+    No other query can be run on **conn** until the iterator is exhausted or
+    closed. Closing it early still reads (and discards) the remaining rows
+    from the server; close the connection instead to abandon a large query.
+
+    :param conn: Database connection
+    :param query: SQL query
+    :param args: Query parameters, as for :meth:`pymysql.cursors.Cursor.execute`
+    :param batch_size: Maximum number of rows per batch
+    :return: Iterator of row lists
+    """
+    if batch_size < 1:
+        raise ValueError("batch_size must be at least 1")
+    with conn.cursor(pymysql.cursors.SSCursor) as cur:
+        cur.execute(query, args)
+        while True:
+            batch = cur.fetchmany(batch_size)
+            if not batch:
+                return
+            yield list(batch)
+
+
+def iter_rows(
+    conn: pymysql.connections.Connection[Any],
+    query: str,
+    args: Any = None,
+    *,
+    batch_size: int = 1000,
+) -> Iterator[_Row]:
+    """
+    Run **query** and yield its rows one by one.
+
+    Rows are fetched from the server in batches as described in
+    :func:`iter_batches`.
+
+    :param conn: Database connection
+    :param query: SQL query
+    :param args: Query parameters, as for :meth:`pymysql.cursors.Cursor.execute`
+    :param batch_size: Number of rows fetched per round-trip
+    :return: Iterator of rows
+    """
+    for batch in iter_batches(conn, query, args, batch_size=batch_size):
+        yield from batch
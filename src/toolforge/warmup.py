@@ -0,0 +1,252 @@
+# This file is part of Toolforge python helper library
+# Copyright (C) 2026 Kunal Mehta <legoktm@debian.org> and contributors
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+"""
+Open connections and load the site matrix before the first request
+"""
+from __future__ import annotations  # PEP 563
+
+import concurrent.futures
+import contextlib
+import functools
+import logging
+import threading
+import time
+from typing import Any
+from typing import Callable
+from typing import ContextManager
+from typing import Dict
+from typing import Iterable
+from typing import List
+from typing import NamedTuple
+from typing import Optional
+from typing import Tuple
+from typing import Union
+
+from .pool import ConnectionPool
+
+logger = logging.getLogger(__name__)
+
+
+class Check(NamedTuple):
+    """Outcome of warming up one resource."""
+
+    #: ``"sitematrix"``, ``"replica:<dbname>/<cluster>"`` or
+    #: ``"toolsdb:<dbname>"``
+    name: str
+    #: ``None`` while the check has not finished
+    ok: Optional[bool] = None
+    #: Seconds the check took
+    duration: float = 0.0
+    error: Optional[str] = None
+
+
+class Readiness(NamedTuple):
+    """Whether everything was warmed up, for a health endpoint."""
+
+    ready: bool
+    checks: Tuple[Check, ...]
+
+    def as_dict(self) -> Dict[str, Any]:
+        """JSON serializable form."""
+        return {
+            "ready": self.ready,
+            "checks": {
+                check.name: {
+                    "ok": check.ok,
+                    "duration": round(check.duration, 3),
+                    "error": check.error,
+                }
+                for check in self.checks
+            },
+        }
+
+
+class Warmup:
+    """
+    Pre-open pooled connections and load the site matrix in parallel.
+
+    Each replica and ToolsDB database gets **connections** connections
+    opened in the pool, each checked with ``SELECT 1``, and the site matrix
+    index is loaded unless **sitematrix** is false. Request handlers then
+    use :attr:`pool` instead of opening their own connections.
+
+    .. code-block:: python
+
+        warmup = Warmup(replicas=["enwiki"], toolsdb=["s12345__mytool"])
+        warmup.start()
+
+
+        @app.route("/healthz")
+        def healthz():
+            readiness = warmup.readiness()
+            return readiness.as_dict(), 200 if readiness.ready else 503
+
+
+        @app.route("/")
+        def index():
+            with warmup.pool.connect("enwiki") as conn:
+                ...
+
+    Connections are only kept for the pool's ``idle_timeout``, so create
+    the pool with a longer one if requests may not arrive for a while.
+    """
+
+    def __init__(
+        self,
+        *,
+        replicas: Iterable[Union[str, Tuple[str, str]]] = (),
+        toolsdb: Iterable[str] = (),
+        sitematrix: bool = True,
+        pool: Optional[ConnectionPool] = None,
+        connections: int = 1,
+        max_workers: int = 8,
+    ) -> None:
+        """
+        :param replicas: Wiki Replica database names, or ``(dbname, cluster)``
+            tuples for clusters other than *web*
+        :param toolsdb: ToolsDB database names
+        :param sitematrix: Load the site matrix index
+        :param pool: Pool to open the connections in, defaults to a new one
+        :param connections: Connections to open per database
+        :param max_workers: Resources warmed up at once
+        :raise: :class:`ValueError`: When the pool cannot hold **connections**
+        """
+        self.pool = pool if pool is not None else ConnectionPool()
+        if connections > self.pool.max_size:
+            raise ValueError(
+                f"Cannot open {connections} connections in a pool of"
+                f" {self.pool.max_size}",
+            )
+        self.connections = connections
+        self.max_workers = max_workers
+        self._tasks: Dict[str, Callable[[], None]] = {}
+        if sitematrix:
+            self._tasks["sitematrix"] = self._load_sitematrix
+        for replica in replicas:
+            dbname, cluster = (replica, "web") if isinstance(replica, str) else replica
+            self._tasks[f"replica:{dbname}/{cluster}"] = functools.partial(
+                self._open,
+                functools.partial(self.pool.connect, dbname, cluster),
+            )
+        for dbname in toolsdb:
+            self._tasks[f"toolsdb:{dbname}"] = functools.partial(
+                self._open,
+                functools.partial(self.pool.toolsdb, dbname),
+            )
+        self._lock = threading.Lock()
+        self._checks = {name: Check(name) for name in self._tasks}
+        self._thread: Optional[threading.Thread] = None
+        self._done = threading.Event()
+
+    @staticmethod
+    def _load_sitematrix() -> None:
+        from . import sitematrix
+
+        sitematrix.get_sitematrix()
+
+    def _open(self, checkout: Callable[[], ContextManager[Any]]) -> None:
+        """Check out the pool's connections at once, so they are all opened."""
+        with contextlib.ExitStack() as stack:
+            for _ in range(self.connections):
+                conn = stack.enter_context(checkout())
+                with conn.cursor() as cur:
+                    cur.execute("SELECT 1")
+                    cur.fetchall()
+
+    def _check(self, name: str, task: Callable[[], None]) -> None:
+        start = time.monotonic()
+        try:
+            task()
+        except Exception as e:
+            logger.warning("Warming up %s failed: %s", name, e)
+            check = Check(name, False, time.monotonic() - start, str(e))
+        else:
+            check = Check(name, True, time.monotonic() - start)
+        with self._lock:
+            self._checks[name] = check
+
+    def run(self) -> Readiness:
+        """
+        Warm everything up and wait until done.
+
+        :return: Final readiness
+        """
+        with concurrent.futures.ThreadPoolExecutor(self.max_workers) as executor:
+            for name, task in self._tasks.items():
+                executor.submit(self._check, name, task)
+        self._done.set()
+        return self.readiness()
+
+    def start(self) -> None:
+        """Warm everything up in a background thread."""
+        if self._thread is not None:
+            return
+        self._thread = threading.Thread(
+            target=self.run,
+            name="toolforge-warmup",
+            daemon=True,
+        )
+        self._thread.start()
+
+    def wait(self, timeout: Optional[float] = None) -> Readiness:
+        """
+        Wait for a warm-up started with :meth:`start` to finish.
+
+        :param timeout: Seconds to wait at most, or ``None`` to wait forever
+        :return: Readiness at the time of return
+        """
+        self._done.wait(timeout)
+        return self.readiness()
+
+    def readiness(self) -> Readiness:
+        """
+        Current state of the warm-up, without waiting.
+
+        :return: Ready once every check succeeded
+        """
+        with self._lock:
+            checks: List[Check] = list(self._checks.values())
+        return Readiness(all(check.ok for check in checks), tuple(checks))
+
+
+def warmup(
+    *,
+    replicas: Iterable[Union[str, Tuple[str, str]]] = (),
+    toolsdb: Iterable[str] = (),
+    sitematrix: bool = True,
+    pool: Optional[ConnectionPool] = None,
+    connections: int = 1,
+) -> Warmup:
+    """
+    Start warming up in the background.
+
+    :param replicas: Wiki Replica database names, or ``(dbname, cluster)``
+        tuples for clusters other than *web*
+    :param toolsdb: ToolsDB database names
+    :param sitematrix: Load the site matrix index
+    :param pool: Pool to open the connections in, defaults to a new one
+    :param connections: Connections to open per database
+    :return: Running warm-up, whose :meth:`Warmup.readiness` reports progress
+    """
+    w = Warmup(
+        replicas=replicas,
+        toolsdb=toolsdb,
+        sitematrix=sitematrix,
+        pool=pool,
+        connections=connections,
+    )
+    w.start()
+    return w
@@ -0,0 +1,201 @@
+import gc
+import threading
+import time
+
+import pymysql
+import pytest
+
+import toolforge
+from toolforge import admission
+from toolforge import instrumentation
+from toolforge.admission import AdmissionController
+from toolforge.pool import ConnectionPool
+
+
+@pytest.fixture
+def controller(monkeypatch):
+    monkeypatch.setattr(admission, "_controller", None)
+    return admission.enable(2, limits={"toolsdb": 1}, timeout=0.1)
+
+
+def _wait_for(predicate):
+    deadline = time.monotonic() + 5
+    while not predicate():
+        assert time.monotonic() < deadline
+        time.sleep(0.001)
+
+
+@pytest.mark.parametrize(
+    ("host", "expected"),
+    [
+        ("enwiki.web.db.svc.wikimedia.cloud", "replicas"),
+        ("s1.analytics.db.svc.wikimedia.cloud", "replicas"),
+        ("tools.db.svc.wikimedia.cloud", "toolsdb"),
+        ("localhost", "localhost"),
+    ],
+)
+def test_quota(host, expected):
+    assert admission.quota(host) == expected
+
+
+class TestAdmissionController:
+    def test_acquire_and_release(self):
+        controller = AdmissionController(2)
+        first = controller.acquire("replicas")
+        second = controller.acquire("replicas")
+        assert controller.stats()["replicas"][:4] == (2, 2, 0, 2)
+        first.release()
+        first.release()
+        assert controller.stats()["replicas"].in_use == 1
+        second.release()
+        assert controller.stats()["replicas"].in_use == 0
+
+    def test_timeout(self):
+        controller = AdmissionController(1, timeout=0.05)
+        slot = controller.acquire("replicas")
+        with pytest.raises(toolforge.AdmissionTimeoutError):
+            controller.acquire("replicas")
+        stats = controller.stats()["replicas"]
+        assert stats.timeouts == 1
+        assert stats.waiting == 0
+        slot.release()
+        controller.acquire("replicas").release()
+        assert controller.stats()["replicas"].admitted == 2
+
+    def test_quotas_are_separate(self):
+        controller = AdmissionController(1, timeout=0)
+        controller.acquire("replicas")
+        controller.acquire("toolsdb")
+        assert set(controller.stats()) == {"replicas", "toolsdb"}
+
+    def test_first_come_first_served(self):
+        controller = AdmissionController(1, timeout=None)
+        slot = controller.acquire("replicas")
+        order = []
+
+        def worker(i):
+            s = controller.acquire("replicas")
+            order.append(i)
+            s.release()
+
+        threads = []
+        for i in range(5):
+            threads.append(threading.Thread(target=worker, args=(i,)))
+            threads[-1].start()
+            _wait_for(lambda n=i + 1: controller.stats()["replicas"].waiting == n)
+        slot.release()
+        for thread in threads:
+            thread.join()
+        assert order == [0, 1, 2, 3, 4]
+        stats = controller.stats()["replicas"]
+        assert stats.admitted == 6
+        assert 0 < stats.max_wait_seconds <= stats.wait_seconds
+
+    def test_lock_dir_is_shared(self, tmp_path):
+        # Lock files conflict between controllers like between processes.
+        first = AdmissionController(1, lock_dir=str(tmp_path / "slots"))
+        second = AdmissionController(1, timeout=0.1, lock_dir=str(tmp_path / "slots"))
+        slot = first.acquire("toolsdb")
+        with pytest.raises(toolforge.AdmissionTimeoutError):
+            second.acquire("toolsdb")
+        threading.Timer(0.02, slot.release).start()
+        second.acquire("toolsdb").release()
+        assert sorted(p.name for p in (tmp_path / "slots").iterdir()) == [
+            "toolsdb.0.lock",
+        ]
+
+    def test_invalid_limit(self):
+        with pytest.raises(ValueError, match="at least 1"):
+            AdmissionController(0)
+        with pytest.raises(ValueError, match="at least 1"):
+            AdmissionController(limits={"toolsdb": 0})
+
+
+@pytest.mark.usefixtures("replica")
+class TestEnable:
+    def test_connect(self, controller):
+        conn = toolforge.connect("enwiki")
+        with toolforge.connect("dewiki", "analytics"):
+            assert controller.stats()["replicas"].in_use == 2
+            with pytest.raises(toolforge.AdmissionTimeoutError):
+                toolforge.connect("frwiki")
+        assert controller.stats()["replicas"].in_use == 1
+        conn.close()
+        assert controller.stats()["replicas"].in_use == 0
+        assert controller.stats()["replicas"].timeouts == 1
+
+    def test_failed_connect_releases_slot(self, controller):
+        for dbname in ("metawiki", "nonexistentwiki"):
+            with pytest.raises(pymysql.err.OperationalError, match="Unknown database"):
+                toolforge.connect(dbname)
+        assert controller.stats()["replicas"].in_use == 0
+
+    def test_garbage_collected_connection_releases_slot(self, controller):
+        conn = toolforge.toolsdb("enwiki_p")
+        assert controller.stats()["toolsdb"].in_use == 1
+        del conn
+        gc.collect()
+        assert controller.stats()["toolsdb"].in_use == 0
+
+    def test_dropped_connection_releases_slot(self, controller):
+        def connect():
+            toolforge.toolsdb("enwiki_p")
+
+        gc.disable()
+        try:
+            connect()
+            assert controller.stats()["toolsdb"].in_use == 0
+            connect()
+        finally:
+            gc.enable()
+
+    def test_pool(self, controller):
+        pool = ConnectionPool(max_size=5, timeout=None)
+        with pool.connect("enwiki"), pool.connect("enwiki"):
+            with pytest.raises(toolforge.AdmissionTimeoutError):
+                with pool.connect("enwiki"):
+                    pass
+        pool.close()
+        assert controller.stats()["replicas"].in_use == 0
+
+    def test_pool_closes_idle_connections(self, controller):
+        pool = ConnectionPool(timeout=None)
+        with pool.toolsdb("enwiki_p"):
+            pass
+        for dbname in ("enwiki", "dewiki"):
+            with pool.connect(dbname):
+                pass
+        assert controller.stats()["replicas"].in_use == 2
+        with pool.connect("frwiki") as conn:
+            assert conn.db == b"frwiki_p"
+            assert controller.stats()["replicas"].in_use == 2
+        # The least recently used replica connection made room.
+        assert [key[0] for key, b in pool._buckets.items() if b.idle] == [
+            "tools.db.svc.wikimedia.cloud",
+            toolforge._connect_args("dewiki")["host"],
+            toolforge._connect_args("frwiki")["host"],
+        ]
+        assert controller.stats()["replicas"].timeouts == 0
+        pool.close()
+
+    @pytest.mark.usefixtures("controller")
+    def test_metrics(self):
+        registry = instrumentation.MetricsRegistry()
+        instrumentation.add_sink(registry)
+        try:
+            with toolforge.toolsdb("enwiki_p"):
+                with pytest.raises(toolforge.AdmissionTimeoutError):
+                    toolforge.toolsdb("enwiki_p")
+        finally:
+            instrumentation.remove_sink(registry)
+        assert registry.get("toolforge_db_admission_seconds") >= 0.1
+        assert registry.get("toolforge_db_errors_total", kind="admission") == 1
+        assert 'toolforge_db_admission_seconds_count{cluster="tools"' in (
+            registry.render()
+        )
+
+    def test_disable(self, controller):
+        admission.disable()
+        with toolforge.connect("enwiki"):
+            pass
+        assert controller.stats() == {}
@@ -0,0 +1,152 @@
+import asyncio
+import os
+import threading
+
+import pytest
+
+from toolforge import sitematrix
+
+pytest.importorskip("aiomysql")
+aiohttp = pytest.importorskip("aiohttp")
+
+from toolforge import aio  # noqa: E402
+
+from .sitematrix_test import SITEMATRIX  # noqa: E402
+
+
+async def _echo(**kwargs):
+    return kwargs
+
+
+@pytest.fixture(autouse=True)
+def _env(monkeypatch, tmp_path):
+    monkeypatch.delenv("TOOL_REPLICA_USER", raising=False)
+    monkeypatch.delenv("TOOL_REPLICA_PASSWORD", raising=False)
+    monkeypatch.delenv("TOOL_TOOLSDB_USER", raising=False)
+    monkeypatch.delenv("TOOL_TOOLSDB_PASSWORD", raising=False)
+    monkeypatch.setenv("TOOLFORGE_SITEMATRIX_CACHE", str(tmp_path / "sm.json"))
+    monkeypatch.delenv("TOOLFORGE_SITEMATRIX_SNAPSHOT", raising=False)
+    sitematrix.clear_cache()
+    yield
+    sitematrix.clear_cache()
+
+
+class TestAio:
+    def test_connect(self, mocker):
+        mocker.patch("aiomysql.connect", side_effect=_echo)
+        kw = asyncio.run(aio.connect("meta_p", "analytics"))
+        assert kw == {
+            "charset": "utf8mb4",
+            "db": "meta_p",
+            "host": "s7.analytics.db.svc.wikimedia.cloud",
+            "read_default_file": os.path.expanduser("~/replica.my.cnf"),
+        }
+
+    def test_connect_streaming(self, mocker, monkeypatch):
+        monkeypatch.setenv("TOOL_REPLICA_USER", "user name")
+        monkeypatch.setenv("TOOL_REPLICA_PASSWORD", "password")
+        mocker.patch("aiomysql.connect", side_effect=_echo)
+        kw = asyncio.run(
+            aio.connect("wikidatawiki", extension="termstore", streaming=True),
+        )
+        assert kw["host"] == "termstore.wikidatawiki.web.db.svc.wikimedia.cloud"
+        assert kw["user"] == "user name"
+        assert kw["password"] == "password"
+        assert kw["cursorclass"] is aio.aiomysql.SSCursor
+
+    def test_toolsdb(self, mocker):
+        mocker.patch("aiomysql.connect", side_effect=_echo)
+        kw = asyncio.run(aio.toolsdb("s12345__foo"))
+        assert kw["db"] == "s12345__foo"
+        assert kw["host"] == "tools.db.svc.wikimedia.cloud"
+
+    def test_create_pool(self, mocker):
+        mocker.patch("aiomysql.create_pool", side_effect=_echo)
+        kw = asyncio.run(aio.create_pool("enwiki", maxsize=3))
+        assert kw["db"] == "enwiki_p"
+        assert kw["host"] == "enwiki.web.db.svc.wikimedia.cloud"
+        assert kw["minsize"] == 1
+        assert kw["maxsize"] == 3
+        assert kw["pool_recycle"] == 60
+
+    def test_create_toolsdb_pool(self, mocker):
+        mocker.patch("aiomysql.create_pool", side_effect=_echo)
+        kw = asyncio.run(aio.create_toolsdb_pool("s12345__foo", minsize=0))
+        assert kw["db"] == "s12345__foo"
+        assert kw["minsize"] == 0
+
+    def test_dbname(self, mocker):
+        async def fetch():
+            return SITEMATRIX
+
+        mm = mocker.patch("toolforge.aio._fetch_sitematrix", side_effect=fetch)
+
+        async def lookup():
+            return await asyncio.gather(
+                aio.dbname("https://en.wikipedia.org/wiki/X"),
+                aio.dbname("commons.wikimedia.org"),
+            )
+
+        assert asyncio.run(lookup()) == ["enwiki", "commonswiki"]
+        mm.assert_called_once_with()
+        # The sync API shares the cache
+        assert sitematrix.get_sitematrix().dbname("www.wikidata.org") == "wikidatawiki"
+
+    def test_dbname_stale(self, mocker, tmp_path):
+        sitematrix.SiteMatrix({"en.wikipedia.org": "enwiki"}, fetched=0).save(
+            str(tmp_path / "sm.json"),
+        )
+        mm = mocker.patch(
+            "toolforge.aio._fetch_sitematrix",
+            side_effect=aiohttp.ClientError,
+        )
+        assert asyncio.run(aio.dbname("en.wikipedia.org")) == "enwiki"
+        assert asyncio.run(aio.dbname("en.wikipedia.org")) == "enwiki"
+        mm.assert_called_once_with()
+
+    def test_dbname_stale_after_timeout(self, mocker, tmp_path):
+        sitematrix.SiteMatrix({"en.wikipedia.org": "enwiki"}, fetched=0).save(
+            str(tmp_path / "sm.json"),
+        )
+        mocker.patch(
+            "toolforge.aio._fetch_sitematrix",
+            side_effect=asyncio.TimeoutError,
+        )
+        assert asyncio.run(aio.dbname("en.wikipedia.org")) == "enwiki"
+
+    def test_dbname_reads_cache_off_the_loop(self, mocker, monkeypatch, tmp_path):
+        sitematrix.SiteMatrix({"en.wikipedia.org": "enwiki"}).save(
+            str(tmp_path / "sm.json"),
+        )
+        threads = []
+        load = sitematrix.SiteMatrix.load
+
+        def record(*args):
+            threads.append(threading.current_thread())
+            return load(*args)
+
+        mocker.patch.object(sitematrix.SiteMatrix, "load", side_effect=record)
+        mocker.patch.object(sitematrix.SiteMatrix, "load_snapshot", side_effect=record)
+        monkeypatch.setenv("TOOLFORGE_SITEMATRIX_SNAPSHOT", str(tmp_path / "snap"))
+
+        async def lookup():
+            return threading.current_thread(), await aio.dbname("en.wikipedia.org")
+
+        loop_thread, dbname = asyncio.run(lookup())
+        assert dbname == "enwiki"
+        assert len(threads) == 2
+        assert loop_thread not in threads
+
+    def test_dbname_uses_loaded_snapshot_on_the_loop(self, mocker, monkeypatch):
+        snapshot = mocker.patch("toolforge.sitematrix._snapshot")
+        monkeypatch.setattr(
+            sitematrix,
+            "_snapshot_data",
+            ("snap", sitematrix.SiteMatrix({"en.wikipedia.org": "enwiki"})),
+        )
+        monkeypatch.setenv("TOOLFORGE_SITEMATRIX_SNAPSHOT", "snap")
+        assert asyncio.run(aio.dbname("en.wikipedia.org")) == "enwiki"
+        monkeypatch.delenv("TOOLFORGE_SITEMATRIX_SNAPSHOT")
+        mocker.patch("toolforge.aio._fetch_sitematrix", return_value=SITEMATRIX)
+        assert asyncio.run(aio.dbname("en.wikipedia.org")) == "enwiki"
+        snapshot.assert_not_called()
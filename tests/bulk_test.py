@@ -0,0 +1,160 @@
+import datetime
+
+import pymysql
+import pytest
+
+from toolforge import bulk
+
+
+class FakeConnection:
+    def __init__(self, max_allowed_packet=1 << 20):
+        self.max_allowed_packet = max_allowed_packet
+        self.queries = []
+        self.files = []
+        self.commits = 0
+        self.rollbacks = 0
+
+    def cursor(self):
+        return FakeCursor(self)
+
+    def escape(self, obj):
+        return pymysql.converters.escape_item(obj, "utf8mb4")
+
+    def commit(self):
+        self.commits += 1
+
+    def rollback(self):
+        self.rollbacks += 1
+
+
+class FakeCursor:
+    def __init__(self, conn):
+        self.conn = conn
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):  # noqa: U100
+        pass
+
+    def execute(self, query, args=None):
+        self.conn.queries.append((query, args))
+        if args is not None:
+            with open(args[0], "rb") as f:
+                self.conn.files.append(f.read())
+
+    def fetchone(self):
+        return (self.conn.max_allowed_packet,)
+
+
+@pytest.fixture
+def conn():
+    return FakeConnection()
+
+
+class TestBulkWriter:
+    def test_insert(self, conn):
+        with bulk.BulkWriter(conn, "db.pages", ["id", "title"]) as writer:
+            writer.add_many([(1, "Foo"), (2, "O'Brien"), (3, None)])
+        assert conn.queries[0] == ("SELECT @@max_allowed_packet", None)
+        assert conn.queries[1] == (
+            b"INSERT INTO `db`.`pages` (`id`, `title`) VALUES "
+            b"(1,'Foo'),(2,'O\\'Brien'),(3,NULL)",
+            None,
+        )
+        assert conn.commits == 1
+        stats = writer.stats
+        assert (stats.rows, stats.statements, stats.commits) == (3, 1, 1)
+
+    def test_insert_modifier(self, conn):
+        with bulk.BulkWriter(conn, "t", ["a"], on_duplicate="ignore") as writer:
+            writer.add([b"\x00\xff"])
+        assert conn.queries[1][0] == b"INSERT IGNORE INTO `t` (`a`) VALUES " + (
+            b"(_binary X'00ff')"
+        )
+
+    def test_packet_limit(self, conn):
+        prefix = len("INSERT INTO `t` (`a`) VALUES ")
+        writer = bulk.BulkWriter(
+            conn,
+            "t",
+            ["a"],
+            max_packet=bulk.PACKET_HEADROOM + prefix + 11,
+        )
+        writer.add_many([(1,), (2,), (3,), (4,), (5,)])
+        writer.close()
+        statements = [q for q, _ in conn.queries]
+        assert statements == [
+            b"INSERT INTO `t` (`a`) VALUES (1),(2),(3)",
+            b"INSERT INTO `t` (`a`) VALUES (4),(5)",
+        ]
+
+    def test_commit_every(self, conn):
+        writer = bulk.BulkWriter(conn, "t", ["a"], max_packet=2000, commit_every=2)
+        for i in range(5):
+            writer.add((i,))
+            writer.flush()
+        assert conn.commits == 2
+        writer.close()
+        assert conn.commits == 3
+        writer.close()
+        assert conn.commits == 3
+
+    def test_load_data(self, conn):
+        rows = [
+            (1, "tab\there", None),
+            (2, "back\\slash\nnewline", datetime.datetime(2026, 1, 2, 3, 4, 5)),
+            (3, b"\x00raw", True),
+        ]
+        with bulk.BulkWriter(
+            conn,
+            "t",
+            ["a", "b", "c"],
+            on_duplicate="replace",
+            load_data=True,
+        ) as writer:
+            writer.add_many(rows)
+        ((query, (path,)),) = conn.queries
+        assert query == (
+            "LOAD DATA LOCAL INFILE %s REPLACE INTO TABLE `t`"
+            " CHARACTER SET utf8mb4 (`a`, `b`, `c`)"
+        )
+        assert conn.files == [
+            b"1\ttab\\there\t\\N\n"
+            b"2\tback\\\\slash\\nnewline\t2026-01-02 03:04:05\n"
+            b"3\t\\0raw\t1\n",
+        ]
+        assert conn.commits == 1
+
+    def test_load_data_batches(self, conn, tmp_path, monkeypatch):
+        monkeypatch.setattr("tempfile.tempdir", str(tmp_path))
+        writer = bulk.BulkWriter(conn, "t", ["a"], load_data=True, load_data_bytes=4)
+        writer.add_many([(1,), (2,), (3,)])
+        writer.close()
+        assert conn.files == [b"1\n2\n", b"3\n"]
+        assert list(tmp_path.iterdir()) == []
+
+    def test_rollback(self, conn):
+        with pytest.raises(RuntimeError):
+            self._fail(bulk.BulkWriter(conn, "t", ["a"], max_packet=2000))
+        assert conn.rollbacks == 1
+        assert conn.queries == []
+
+    @staticmethod
+    def _fail(writer):
+        with writer:
+            writer.add((1,))
+            raise RuntimeError
+
+    def test_wrong_row_length(self, conn):
+        writer = bulk.BulkWriter(conn, "t", ["a", "b"], max_packet=2000)
+        with pytest.raises(ValueError, match="Expected 2 values"):
+            writer.add((1,))
+
+    def test_unknown_on_duplicate(self, conn):
+        with pytest.raises(ValueError, match="on_duplicate"):
+            bulk.BulkWriter(conn, "t", ["a"], on_duplicate="update")
+
+    def test_rows_per_second(self):
+        assert bulk.BulkStats(100, 1, 1, 2.0).rows_per_second == 50
+        assert bulk.BulkStats(0, 0, 0, 0).rows_per_second == 0
@@ -0,0 +1,192 @@
+import datetime
+import decimal
+import os
+
+import pytest
+
+from toolforge import cache
+
+
+class FakeConnection:
+    host = "enwiki.web.db.svc.wikimedia.cloud"
+    db = b"enwiki_p"
+    encoding = "utf8"
+
+    def __init__(self, mocker, rows):
+        self.cursor = mocker.MagicMock()
+        cur = self.cursor.return_value.__enter__.return_value
+        cur.fetchall.return_value = rows
+        self.execute = cur.execute
+
+
+class FakeRedis:
+    def __init__(self):
+        self.data = {}
+        self.expiry = {}
+
+    def get(self, key):
+        return self.data.get(key)
+
+    def set(self, key, value, px):
+        self.data[key] = value
+        self.expiry[key] = px
+
+    def delete(self, key):
+        self.data.pop(key, None)
+
+    def scan_iter(self, match):
+        return [k for k in list(self.data) if k.startswith(match[:-1])]
+
+
+ROWS = [
+    (1, b"Main_Page", datetime.datetime(2026, 1, 2, 3, 4, 5), decimal.Decimal("1.5")),
+    (2, None, datetime.date(2026, 1, 2), datetime.timedelta(hours=1)),
+    (3, "x", datetime.time(12, 30), {"a", "b"}),
+]
+
+
+@pytest.fixture
+def conn(mocker):
+    return FakeConnection(mocker, ROWS)
+
+
+class TestQueryCache:
+    @pytest.mark.parametrize(
+        ("query", "expected"),
+        [
+            ("SELECT  1;", "SELECT 1"),
+            ("\n SELECT *\n\tFROM page ", "SELECT * FROM page"),
+            ('SELECT \'a  b\',  "c\\"  d"', 'SELECT \'a  b\', "c\\"  d"'),
+            ("SELECT `odd  name`  FROM t", "SELECT `odd  name` FROM t"),
+        ],
+    )
+    def test_normalize_query(self, query, expected):
+        assert cache.normalize_query(query) == expected
+
+    def test_query(self, conn):
+        qc = cache.QueryCache()
+        assert qc.query(conn, "SELECT 1", (1,)) == ROWS
+        assert qc.query(conn, " SELECT  1 ", [1]) == ROWS
+        conn.execute.assert_called_once_with("SELECT 1", (1,))
+        assert (qc.hits, qc.misses) == (1, 1)
+
+    def test_key(self, conn):
+        qc = cache.QueryCache()
+        key = qc.key(conn, "SELECT 1", (1,))
+        assert key == qc.key(conn, "SELECT 1;", (1,))
+        assert key != qc.key(conn, "SELECT 1", (2,))
+        conn.db = b"dewiki_p"
+        assert key != qc.key(conn, "SELECT 1", (1,))
+
+    def test_bypass(self, conn):
+        qc = cache.QueryCache()
+        qc.query(conn, "SELECT 1", ttl=0)
+        qc.query(conn, "SELECT 1", ttl=0)
+        assert conn.execute.call_count == 2
+        assert len(qc.backend) == 0
+
+    def test_invalidate(self, conn):
+        qc = cache.QueryCache()
+        qc.query(conn, "SELECT 1")
+        qc.invalidate(conn, "SELECT 1")
+        qc.query(conn, "SELECT 1")
+        assert conn.execute.call_count == 2
+        qc.clear()
+        assert len(qc.backend) == 0
+
+    def test_unsupported_type(self, conn):
+        conn.cursor.return_value.__enter__.return_value.fetchall.return_value = [
+            (object(),),
+        ]
+        with pytest.raises(TypeError, match="Cannot cache"):
+            cache.QueryCache().query(conn, "SELECT 1")
+
+    def test_backend_is_abstract(self):
+        with pytest.raises(TypeError, match="abstract"):
+            cache.Backend()
+
+
+class TestMemoryBackend:
+    def test_expiry(self, mocker):
+        clock = mocker.patch("toolforge.cache.time.monotonic", return_value=100.0)
+        backend = cache.MemoryBackend()
+        backend.set("a", b"1", 10)
+        assert backend.get("a") == b"1"
+        clock.return_value = 110.0
+        assert backend.get("a") is None
+        assert len(backend) == 0
+
+    def test_lru_entries(self):
+        backend = cache.MemoryBackend(max_entries=2)
+        backend.set("a", b"1", 60)
+        backend.set("b", b"2", 60)
+        backend.get("a")
+        backend.set("c", b"3", 60)
+        assert backend.get("b") is None
+        assert backend.get("a") == b"1"
+        assert backend.get("c") == b"3"
+
+    def test_lru_bytes(self):
+        backend = cache.MemoryBackend(max_bytes=10)
+        backend.set("a", b"12345", 60)
+        backend.set("b", b"12345", 60)
+        backend.set("a", b"123", 60)
+        backend.set("c", b"1234", 60)
+        assert backend.get("b") is None
+        assert backend._size == 7
+        backend.set("d", b"x" * 11, 60)
+        assert backend.get("d") is None
+
+
+class TestFileBackend:
+    def test_shared(self, tmp_path, conn):
+        qc = cache.QueryCache(cache.FileBackend(str(tmp_path / "q")))
+        qc.query(conn, "SELECT 1")
+        other = cache.QueryCache(cache.FileBackend(str(tmp_path / "q")))
+        assert other.query(conn, "SELECT 1") == ROWS
+        assert other.hits == 1
+        (path,) = (tmp_path / "q").iterdir()
+        assert path.stat().st_mode & 0o777 == 0o600
+
+    def test_expiry(self, tmp_path, mocker):
+        clock = mocker.patch("toolforge.cache.time.time", return_value=100.0)
+        backend = cache.FileBackend(str(tmp_path))
+        backend.set("a", b"1", 10)
+        assert backend.get("a") == b"1"
+        clock.return_value = 110.0
+        assert backend.get("a") is None
+        assert list(tmp_path.iterdir()) == []
+
+    def test_corrupt_file(self, tmp_path):
+        backend = cache.FileBackend(str(tmp_path))
+        (tmp_path / "a").write_bytes(b"garbage")
+        assert backend.get("a") is None
+        assert list(tmp_path.iterdir()) == []
+
+    def test_eviction(self, tmp_path):
+        backend = cache.FileBackend(str(tmp_path), max_bytes=200)
+        for i, key in enumerate("abc"):
+            backend.set(key, b"x" * 40, 60)
+            os.utime(tmp_path / key, (i, i))
+        backend.set("d", b"x" * 40, 60)
+        assert sorted(p.name for p in tmp_path.iterdir()) == ["b", "c", "d"]
+        backend.clear()
+        assert list(tmp_path.iterdir()) == []
+
+    def test_default_directory(self, monkeypatch):
+        monkeypatch.setenv("XDG_CACHE_HOME", "/cache")
+        assert cache.default_directory() == "/cache/toolforge/queries"
+
+
+class TestRedisBackend:
+    def test_shared(self, conn):
+        client = FakeRedis()
+        qc = cache.QueryCache(cache.RedisBackend(client, prefix="t:"), ttl=1.5)
+        qc.query(conn, "SELECT 1")
+        assert qc.query(conn, "SELECT 1") == ROWS
+        (key,) = client.data
+        assert key.startswith("t:")
+        assert client.expiry[key] == 1500
+        client.data["other"] = b""
+        qc.clear()
+        assert list(client.data) == ["other"]
@@ -0,0 +1,113 @@
+import os
+
+import pytest
+
+import toolforge
+from toolforge import config
+
+
+@pytest.fixture
+def write(tmp_path):
+    def write(name, text, mode=0o600):
+        path = tmp_path / name
+        path.write_text(text)
+        path.chmod(mode)
+        return path
+
+    return write
+
+
+class TestConfigLoader:
+    @pytest.mark.parametrize(
+        ("name", "text"),
+        [
+            ("config.yaml", "name: mytool\nlimit: 5\n"),
+            ("config.yml", "name: mytool\nlimit: 5\n"),
+            ("config.json", '{"name": "mytool", "limit": 5}'),
+            ("config.toml", 'name = "mytool"\nlimit = 5\n'),
+        ],
+    )
+    def test_formats(self, write, name, text):
+        path = write(name, text)
+        assert config.ConfigLoader().load(str(path)) == {"name": "mytool", "limit": 5}
+
+    def test_explicit_format(self, write):
+        path = write("config", '{"name": "mytool"}')
+        assert config.ConfigLoader().load(str(path), format="json") == {
+            "name": "mytool",
+        }
+
+    def test_unknown_format(self, write):
+        path = write("config.ini", "[main]\n")
+        with pytest.raises(ValueError, match="Unknown configuration format"):
+            config.ConfigLoader().load(str(path))
+
+    def test_world_readable(self, write):
+        path = write("config.yaml", "secret: hunter2\n", mode=0o644)
+        with pytest.raises(toolforge.PrivateFileWorldReadableError):
+            config.ConfigLoader().load(str(path))
+
+    def test_world_readable_after_caching(self, write):
+        path = write("config.yaml", "secret: hunter2\n")
+        loader = config.ConfigLoader(check_interval=0)
+        assert loader.load(str(path)) == {"secret": "hunter2"}
+        path.chmod(0o644)
+        for _ in range(2):
+            with pytest.raises(toolforge.PrivateFileWorldReadableError):
+                loader.load(str(path))
+
+    def test_missing(self, tmp_path):
+        with pytest.raises(FileNotFoundError):
+            config.ConfigLoader().load(str(tmp_path / "config.yaml"))
+
+    def test_cached_until_changed(self, write, mocker):
+        path = write("config.json", '{"limit": 5}')
+        loader = config.ConfigLoader(check_interval=0)
+        json_load = mocker.patch.dict(
+            config.FORMATS,
+            {".json": mocker.Mock(wraps=config.FORMATS[".json"])},
+        )[".json"]
+        first = loader.load(str(path))
+        assert loader.load(str(path)) is first
+        assert json_load.call_count == 1
+        path.write_text('{"limit": 10}')
+        os.utime(path, ns=(0, 0))
+        assert loader.load(str(path)) == {"limit": 10}
+        assert json_load.call_count == 2
+
+    def test_check_interval(self, write, mocker):
+        path = write("config.json", '{"limit": 5}')
+        loader = config.ConfigLoader(check_interval=60)
+        assert loader.load(str(path)) == {"limit": 5}
+        stat = mocker.patch("os.stat")
+        path.write_text('{"limit": 10}')
+        assert loader.load(str(path)) == {"limit": 5}
+        stat.assert_not_called()
+        loader.clear(str(path))
+        mocker.stopall()
+        assert loader.load(str(path)) == {"limit": 10}
+
+    def test_replaced(self, write, tmp_path):
+        path = write("config.yaml", "limit: 5\n")
+        loader = config.ConfigLoader(check_interval=0)
+        assert loader.load(str(path)) == {"limit": 5}
+        new = write("new.yaml", "limit: 6\n")
+        os.replace(new, path)
+        assert loader.load(str(path)) == {"limit": 6}
+        loader.clear()
+        assert loader.load(str(tmp_path / "config.yaml")) == {"limit": 6}
+
+    def test_libyaml_loader(self, write, mocker):
+        yaml = pytest.importorskip("yaml")
+        load = mocker.spy(yaml, "load")
+        path = write("config.yaml", "limit: 5\n")
+        config.ConfigLoader().load(str(path))
+        expected = getattr(yaml, "CSafeLoader", yaml.SafeLoader)
+        assert load.call_args.kwargs["Loader"] is expected
+
+
+def test_load(write, mocker):
+    mocker.patch.object(config, "_default", None)
+    path = write("config.yaml", "limit: 5\n")
+    assert config.load(str(path)) == {"limit": 5}
+    assert config.default_loader() is config.default_loader()
@@ -0,0 +1,109 @@
+"""Fixtures shared by the test suite for running without network access."""
+
+import http.server
+import json
+import os
+import pathlib
+import shutil
+import tempfile
+import threading
+
+import pytest
+
+from toolforge import credentials
+from toolforge import fanout
+from toolforge import sitematrix
+
+from .replica import Replica
+
+FIXTURES = pathlib.Path(__file__).parent / "fixtures"
+
+_home = None
+
+
+def pytest_configure():
+    """
+    Run with an empty home directory, so that the ``~/replica.my.cnf`` and
+    caches of the account running the tests are never used.
+    """
+    global _home
+    _home = (os.environ.get("HOME"), tempfile.mkdtemp(prefix="toolforge-home-"))
+    os.environ["HOME"] = _home[1]
+
+
+def pytest_unconfigure():
+    if _home is None:
+        return
+    if _home[0] is None:
+        del os.environ["HOME"]
+    else:
+        os.environ["HOME"] = _home[0]
+    shutil.rmtree(_home[1], ignore_errors=True)
+
+
+@pytest.fixture(autouse=True)
+def credentials_provider(monkeypatch):
+    """Fresh shared credential provider, reading the empty home directory."""
+    provider = credentials.CredentialProvider()
+    monkeypatch.setattr(credentials, "_default", provider)
+    return provider
+
+
+@pytest.fixture(scope="session")
+def sitematrix_response():
+    """Recorded ``action=sitematrix`` API response."""
+    return json.loads((FIXTURES / "sitematrix.json").read_text(encoding="utf-8"))
+
+
+@pytest.fixture
+def recorded_sitematrix(sitematrix_response, tmp_path, mocker, monkeypatch):
+    """Serve the site matrix from the recorded response instead of the API."""
+    monkeypatch.setenv("TOOLFORGE_SITEMATRIX_CACHE", str(tmp_path / "sitematrix.json"))
+    monkeypatch.delenv("TOOLFORGE_SITEMATRIX_SNAPSHOT", raising=False)
+    sitematrix.clear_cache()
+    yield mocker.patch(
+        "toolforge.sitematrix._fetch_sitematrix",
+        return_value=sitematrix_response,
+    )
+    sitematrix.clear_cache()
+
+
+@pytest.fixture
+def replica(tmp_path, mocker, monkeypatch):
+    """
+    Route ``pymysql.connect`` to a small SQLite backed :class:`Replica`, and
+    resolve replica hostnames to their section hosts.
+    """
+    for prefix in ("TOOL_REPLICA", "TOOL_TOOLSDB"):
+        monkeypatch.setenv(f"{prefix}_USER", "s12345")
+        monkeypatch.setenv(f"{prefix}_PASSWORD", "secret")
+    db = Replica(tmp_path, pages=200)
+    mocker.patch("pymysql.connect", side_effect=db.connect)
+    mocker.patch("socket.gethostbyname_ex", side_effect=db.gethostbyname_ex)
+    fanout._canonical_host.cache_clear()
+    yield db
+    fanout._canonical_host.cache_clear()
+
+
+class _EchoHandler(http.server.BaseHTTPRequestHandler):
+    def do_GET(self):  # noqa: N802
+        body = json.dumps({"user-agent": self.headers["User-Agent"]}).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):  # noqa: U100
+        pass
+
+
+@pytest.fixture
+def user_agent_echo():
+    """URL of a local server answering like ``https://httpbin.io/user-agent``."""
+    server = http.server.ThreadingHTTPServer(("127.0.0.1", 0), _EchoHandler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield f"http://127.0.0.1:{server.server_port}/user-agent"
+    server.shutdown()
+    server.server_close()
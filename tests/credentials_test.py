@@ -0,0 +1,127 @@
+import os
+
+import pytest
+
+import toolforge
+from toolforge import credentials
+
+CNF = """[client]
+user = 's12345'
+password = 'secret'
+"""
+
+
+@pytest.fixture
+def cnf(tmp_path):
+    path = tmp_path / "replica.my.cnf"
+    path.write_text(CNF)
+    path.chmod(0o600)
+    return path
+
+
+@pytest.fixture
+def _env(monkeypatch):
+    for name in ("USER", "PASSWORD"):
+        monkeypatch.delenv(f"TOOL_REPLICA_{name}", raising=False)
+        monkeypatch.delenv(f"TOOL_TOOLSDB_{name}", raising=False)
+
+
+@pytest.mark.usefixtures("_env")
+class TestCredentialProvider:
+    def test_from_file(self, cnf):
+        provider = credentials.CredentialProvider(str(cnf))
+        assert provider.resolve("TOOL_REPLICA") == ("s12345", "secret")
+
+    def test_env_takes_precedence(self, cnf, monkeypatch):
+        monkeypatch.setenv("TOOL_TOOLSDB_USER", "env user")
+        monkeypatch.setenv("TOOL_TOOLSDB_PASSWORD", "env password")
+        provider = credentials.CredentialProvider(str(cnf))
+        assert provider.resolve("TOOL_TOOLSDB") == ("env user", "env password")
+        assert provider.resolve("TOOL_REPLICA") == ("s12345", "secret")
+
+    def test_use_file(self, cnf):
+        provider = credentials.CredentialProvider(str(cnf))
+        assert provider.resolve("TOOL_REPLICA", use_file=False) is None
+
+    def test_missing_file(self, tmp_path):
+        provider = credentials.CredentialProvider(str(tmp_path / "missing.cnf"))
+        assert provider.resolve("TOOL_REPLICA") is None
+
+    def test_missing_keys(self, cnf):
+        cnf.write_text("[client]\nuser = s12345\nskip-ssl\n")
+        assert credentials.CredentialProvider(str(cnf)).from_file() is None
+
+    def test_world_readable(self, cnf):
+        cnf.chmod(0o644)
+        provider = credentials.CredentialProvider(str(cnf))
+        with pytest.raises(toolforge.PrivateFileWorldReadableError):
+            provider.from_file()
+
+    def test_world_readable_after_caching(self, cnf):
+        provider = credentials.CredentialProvider(str(cnf), check_interval=0)
+        assert provider.from_file() is not None
+        cnf.chmod(0o644)
+        for _ in range(2):
+            with pytest.raises(toolforge.PrivateFileWorldReadableError):
+                provider.from_file()
+        cnf.chmod(0o600)
+        assert provider.from_file() == ("s12345", "secret")
+
+    def test_cached_until_changed(self, cnf, mocker):
+        clock = mocker.patch(
+            "toolforge.credentials.time.monotonic",
+            return_value=100.0,
+        )
+        read = mocker.spy(credentials.CredentialProvider, "_read")
+        provider = credentials.CredentialProvider(str(cnf), check_interval=5)
+        provider.from_file()
+        cnf.write_text(CNF.replace("secret", "rotated"))
+        os.utime(cnf, ns=(0, 10**9))
+        assert provider.from_file().password == "secret"
+        assert read.call_count == 1
+        clock.return_value = 106.0
+        assert provider.from_file().password == "rotated"
+        assert read.call_count == 2
+        clock.return_value = 112.0
+        provider.from_file()
+        assert read.call_count == 2
+        provider.clear()
+        provider.from_file()
+        assert read.call_count == 3
+
+    def test_connect_uses_default_provider(self, cnf, mocker):
+        mocker.patch(
+            "toolforge.credentials._default",
+            credentials.CredentialProvider(str(cnf)),
+        )
+        assert toolforge._connect_args("enwiki")["user"] == "s12345"
+        kw = toolforge._toolsdb_args("s12345__db", read_default_file="other.cnf")
+        assert kw["read_default_file"] == "other.cnf"
+        assert "user" not in kw
+
+    def test_explicit_credentials_skip_file(self, cnf, mocker):
+        cnf.chmod(0o644)
+        mocker.patch(
+            "toolforge.credentials._default",
+            credentials.CredentialProvider(str(cnf)),
+        )
+        kw = toolforge._connect_args("enwiki", user="x", password="y")
+        assert (kw["user"], kw["password"]) == ("x", "y")
+        assert "read_default_file" not in kw
+        with pytest.raises(toolforge.PrivateFileWorldReadableError):
+            toolforge._connect_args("enwiki")
+
+    def test_partial_credentials_use_file(self, cnf, mocker):
+        mocker.patch(
+            "toolforge.credentials._default",
+            credentials.CredentialProvider(str(cnf)),
+        )
+        kw = toolforge._toolsdb_args("s12345__db", user="x")
+        assert (kw["user"], kw["password"]) == ("x", "secret")
+        kw = toolforge._connect_args("enwiki", password="y")
+        assert (kw["user"], kw["password"]) == ("s12345", "y")
+
+    def test_default_provider(self):
+        provider = credentials.default_provider()
+        assert provider is credentials.default_provider()
+        assert provider.path == os.path.expanduser("~/replica.my.cnf")
@@ -0,0 +1,148 @@
+import datetime
+import decimal
+
+import pymysql
+from pymysql.constants import FIELD_TYPE
+import pytest
+
+from toolforge import export
+
+DESCRIPTION = (
+    ("page_id", FIELD_TYPE.LONG, None, 8, 8, 0, False),
+    ("page_title", FIELD_TYPE.VAR_STRING, None, 255, 255, 0, False),
+    ("page_len", FIELD_TYPE.LONGLONG, None, 20, 20, 0, True),
+    ("page_touched", FIELD_TYPE.DATETIME, None, 19, 19, 0, False),
+    ("score", FIELD_TYPE.NEWDECIMAL, None, 12, 12, 2, True),
+)
+ROWS = [
+    (1, b"Main_Page", 100, datetime.datetime(2026, 1, 1), decimal.Decimal("1.50")),
+    (2, b"Caf\xc3\xa9", None, datetime.datetime(2026, 1, 2), None),
+    (3, b"Zebra", 7, datetime.datetime(2026, 1, 3), decimal.Decimal("-2.25")),
+]
+
+
+@pytest.fixture
+def conn(mocker):
+    conn = mocker.MagicMock()
+    cur = conn.cursor.return_value.__enter__.return_value
+    cur.description = DESCRIPTION
+
+    def fetchmany(size):
+        batch = cur.rows[:size]
+        del cur.rows[:size]
+        return batch
+
+    cur.rows = list(ROWS)
+    cur.fetchmany.side_effect = fetchmany
+    return conn
+
+
+def _cursor(conn):
+    return conn.cursor.return_value.__enter__.return_value
+
+
+class TestArrow:
+    @pytest.fixture(autouse=True)
+    def _pyarrow(self):
+        pytest.importorskip("pyarrow")
+
+    def test_record_batches(self, conn):
+        import pyarrow as pa
+
+        batches = list(
+            export.record_batches(conn, "SELECT ...", (5,), batch_size=2),
+        )
+        assert [b.num_rows for b in batches] == [2, 1]
+        conn.cursor.assert_called_once_with(pymysql.cursors.SSCursor)
+        _cursor(conn).execute.assert_called_once_with("SELECT ...", (5,))
+        schema = batches[0].schema
+        assert schema == batches[1].schema
+        assert schema.types == [
+            pa.int64(),
+            pa.binary(),
+            pa.int64(),
+            pa.timestamp("us"),
+            pa.decimal128(38, 2),
+        ]
+        assert batches[0].column("page_len").to_pylist() == [100, None]
+        assert batches[1].column("page_title").to_pylist() == [b"Zebra"]
+
+    def test_to_table(self, conn):
+        table = export.to_table(conn, "SELECT ...", binary_as_string=True)
+        assert table.num_rows == 3
+        assert table.column("page_title").to_pylist() == [
+            "Main_Page",
+            "Café",
+            "Zebra",
+        ]
+        assert table.column("score").to_pylist() == [
+            decimal.Decimal("1.50"),
+            None,
+            decimal.Decimal("-2.25"),
+        ]
+
+    def test_empty(self, conn):
+        import pyarrow as pa
+
+        _cursor(conn).rows = []
+        table = export.to_table(conn, "SELECT ...")
+        assert table.num_rows == 0
+        assert table.schema.names == [c[0] for c in DESCRIPTION]
+        assert table.schema.field("page_title").type == pa.binary()
+
+    def test_to_parquet(self, conn, tmp_path):
+        pq = pytest.importorskip("pyarrow.parquet")
+        path = str(tmp_path / "pages.parquet")
+        assert export.to_parquet(conn, "SELECT ...", path, batch_size=1) == 3
+        table = pq.read_table(path)
+        assert table.column("page_id").to_pylist() == [1, 2, 3]
+        assert table.column("page_title").to_pylist()[1] == "Café".encode()
+
+    def test_arrow_schema_str(self):
+        import pyarrow as pa
+
+        schema = export.arrow_schema(
+            DESCRIPTION[:2],
+            [(1, None), (2, "Main Page")],
+        )
+        assert schema.field("page_title").type == pa.string()
+
+
+class TestNumPy:
+    @pytest.fixture(autouse=True)
+    def _numpy(self):
+        pytest.importorskip("numpy")
+
+    def test_to_numpy(self, conn):
+        import numpy as np
+
+        columns = export.to_numpy(conn, "SELECT ...", batch_size=2)
+        assert list(columns) == [c[0] for c in DESCRIPTION]
+        assert columns["page_id"].dtype == np.int64
+        assert columns["page_id"].tolist() == [1, 2, 3]
+        # The first batch has a NULL, so the column is promoted to float64.
+        assert columns["page_len"].dtype == np.float64
+        assert np.isnan(columns["page_len"][1])
+        assert columns["page_touched"].dtype == np.dtype("datetime64[us]")
+        assert columns["page_title"].dtype == object
+        assert columns["page_title"].tolist() == [
+            b"Main_Page",
+            b"Caf\xc3\xa9",
+            b"Zebra",
+        ]
+
+    def test_binary_as_string(self, conn):
+        columns = export.to_numpy(conn, "SELECT ...", binary_as_string=True)
+        assert columns["page_title"].tolist() == ["Main_Page", "Café", "Zebra"]
+
+    def test_empty(self, conn):
+        import numpy as np
+
+        _cursor(conn).rows = []
+        columns = export.to_numpy(conn, "SELECT ...")
+        assert columns["page_id"].dtype == np.int64
+        assert len(columns["page_title"]) == 0
+
+    def test_batch_size(self, conn):
+        with pytest.raises(ValueError, match="batch_size"):
+            export.to_numpy(conn, "SELECT ...", batch_size=0)
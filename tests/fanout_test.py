@@ -0,0 +1,148 @@
+import socket
+
+import pymysql
+import pytest
+
+from toolforge import fanout
+
+SECTIONS = {
+    "enwiki.web.db.svc.wikimedia.cloud": "s1.web.db.svc.wikimedia.cloud",
+    "dewiki.web.db.svc.wikimedia.cloud": "s5.web.db.svc.wikimedia.cloud",
+    "frwiki.web.db.svc.wikimedia.cloud": "s6.web.db.svc.wikimedia.cloud",
+    "jawiki.web.db.svc.wikimedia.cloud": "s6.web.db.svc.wikimedia.cloud",
+    "ruwiki.web.db.svc.wikimedia.cloud": "s6.web.db.svc.wikimedia.cloud",
+}
+
+
+class FakeConnection:
+    def __init__(self, **kwargs):
+        self.kwargs = kwargs
+        self.databases = []
+        self.closed = False
+        self.drained = 0
+
+    def select_db(self, db):
+        self.databases.append(db)
+
+    def cursor(self):
+        return FakeCursor(self)
+
+    def close(self):
+        self.closed = True
+
+
+class FakeCursor:
+    def __init__(self, conn):
+        self.connection = conn
+        self.rows = iter(())
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):  # noqa: U100
+        self.close()
+
+    def close(self):
+        if self.connection is None:
+            return
+        # Like SSCursor, read the rest of the result set from the server.
+        assert not self.connection.closed
+        self.connection.drained += sum(1 for _ in self.rows)
+        self.connection = None
+
+    def execute(self, query, args=None):
+        if query == "fail":
+            raise pymysql.err.OperationalError(1317, "killed")
+        db = self.connection.databases[-1]
+        self.rows = iter([(db, query, args, i) for i in range(3)])
+
+    def __iter__(self):
+        return self.rows
+
+
+@pytest.fixture(autouse=True)
+def dns(mocker):
+    fanout._canonical_host.cache_clear()
+
+    def gethostbyname_ex(host):
+        if host not in SECTIONS:
+            raise socket.gaierror
+        return (SECTIONS[host], [host], ["172.16.0.1"])
+
+    yield mocker.patch("socket.gethostbyname_ex", side_effect=gethostbyname_ex)
+    fanout._canonical_host.cache_clear()
+
+
+@pytest.fixture
+def connections(mocker):
+    conns = []
+
+    def connect(**kwargs):
+        conn = FakeConnection(**kwargs)
+        conns.append(conn)
+        return conn
+
+    mocker.patch("toolforge._connect", side_effect=connect)
+    return conns
+
+
+class TestFanout:
+    def test_section_host(self):
+        assert fanout.section_host("enwiki_p") == "s1.web.db.svc.wikimedia.cloud"
+        assert fanout.section_host("xxwiki") == "xxwiki.web.db.svc.wikimedia.cloud"
+
+    def test_group_by_section(self):
+        assert fanout.group_by_section(["frwiki", "enwiki", "jawiki"]) == {
+            "s6.web.db.svc.wikimedia.cloud": ["frwiki", "jawiki"],
+            "s1.web.db.svc.wikimedia.cloud": ["enwiki"],
+        }
+
+    def test_fanout(self, connections):
+        dbnames = ["enwiki", "frwiki", "dewiki", "jawiki", "ruwiki"]
+        rows = list(fanout.fanout(dbnames, "SELECT 1", (1,), max_workers=2))
+        assert len(rows) == 15
+        for dbname, row in rows:
+            assert row[:3] == (dbname + "_p", "SELECT 1", (1,))
+        assert sorted(c.kwargs["host"] for c in connections) == [
+            "s1.web.db.svc.wikimedia.cloud",
+            "s5.web.db.svc.wikimedia.cloud",
+            "s6.web.db.svc.wikimedia.cloud",
+        ]
+        s6 = next(c for c in connections if c.kwargs["host"].startswith("s6."))
+        assert s6.databases == ["frwiki_p", "jawiki_p", "ruwiki_p"]
+        assert all(c.closed for c in connections)
+        assert all(
+            c.kwargs["cursorclass"] is pymysql.cursors.SSCursor for c in connections
+        )
+
+    def test_fanout_cursorclass(self, connections):
+        list(fanout.fanout(["enwiki_p"], "q", cursorclass=pymysql.cursors.DictCursor))
+        assert connections[0].kwargs["cursorclass"] is pymysql.cursors.DictCursor
+        assert connections[0].databases == ["enwiki_p"]
+
+    def test_fanout_preserves_row_order_per_wiki(self, connections):
+        rows = list(fanout.fanout(["frwiki", "jawiki"], "q"))
+        assert [r[1][3] for r in rows if r[0] == "jawiki"] == [0, 1, 2]
+        assert len(connections) == 1
+
+    def test_fanout_empty(self, connections):
+        assert list(fanout.fanout([], "q")) == []
+        assert connections == []
+
+    def test_fanout_raises_worker_errors(self, connections):
+        with pytest.raises(pymysql.err.OperationalError):
+            list(fanout.fanout(["enwiki", "frwiki"], "fail"))
+        assert all(c.closed for c in connections)
+
+    def test_fanout_stops_early(self, connections):
+        dbnames = ["enwiki", "frwiki", "jawiki", "ruwiki"]
+        results = fanout.fanout(dbnames, "q", buffer_size=1)
+        next(results)
+        results.close()
+        assert all(c.closed for c in connections)
+
+    def test_fanout_break_does_not_drain(self, connections):
+        for _ in fanout.fanout(["enwiki", "dewiki"], "q", buffer_size=1):
+            break
+        assert all(c.closed for c in connections)
+        assert [c.drained for c in connections] == [0, 0]
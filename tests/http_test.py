@@ -0,0 +1,61 @@
+import weakref
+
+import pytest
+import requests
+
+import toolforge
+from toolforge import http
+
+
+@pytest.fixture(autouse=True)
+def _reset(monkeypatch):
+    monkeypatch.setattr(http, "_user_agent", None)
+    monkeypatch.setattr(http, "_session", None)
+    monkeypatch.setattr(http, "_sessions", weakref.WeakSet())
+    monkeypatch.setattr(
+        requests.utils,
+        "default_user_agent",
+        requests.utils.default_user_agent,
+    )
+
+
+class TestHttp:
+    def test_make_session(self):
+        session = http.make_session(pool_maxsize=4, retries=2, backoff_factor=1)
+        assert session.headers["User-Agent"] == (
+            f"python-toolforge python-requests/{requests.__version__}"
+        )
+        assert "gzip" in session.headers["Accept-Encoding"]
+        adapter = session.get_adapter("https://meta.wikimedia.org/w/api.php")
+        assert adapter._pool_maxsize == 4
+        assert adapter.max_retries.total == 2
+        assert adapter.max_retries.backoff_factor == 1
+        assert set(adapter.max_retries.status_forcelist) == {429, 503}
+
+    def test_get_session_is_shared(self):
+        assert http.get_session() is http.get_session()
+
+    def test_set_user_agent_updates_sessions(self):
+        shared = http.get_session()
+        ua = toolforge.set_user_agent("mycooltool")
+        assert shared.headers["User-Agent"] == ua
+        assert http.make_session().headers["User-Agent"] == ua
+        assert http.user_agent() == ua
+
+    def test_set_user_agent_updates_earlier_sessions(self):
+        session = http.make_session()
+        custom = http.make_session()
+        custom.headers["User-Agent"] = "custom"
+        ua = toolforge.set_user_agent("mycooltool")
+        assert session.headers["User-Agent"] == ua
+        assert custom.headers["User-Agent"] == "custom"
+
+    def test_fetch_sitematrix_uses_shared_session(self, mocker):
+        get = mocker.patch.object(http.get_session(), "get")
+        get.return_value.json.return_value = {"sitematrix": {}}
+        assert toolforge.sitematrix._fetch_sitematrix() == {"sitematrix": {}}
+        get.assert_called_once_with(
+            "https://meta.wikimedia.org/w/api.php",
+            params={"action": "sitematrix", "format": "json"},
+            timeout=toolforge.sitematrix.FETCH_TIMEOUT,
+        )
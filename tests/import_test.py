@@ -0,0 +1,53 @@
+import os
+import subprocess
+import sys
+
+import pytest
+
+import toolforge
+
+HEAVY = ("pymysql", "requests", "urllib3", "decorator", "yaml")
+
+
+def _importtime(code):
+    """Run **code** in a fresh interpreter and return the modules it imported."""
+    env = dict(os.environ)
+    env["PYTHONPATH"] = os.path.dirname(os.path.dirname(toolforge.__file__))
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", code],
+        capture_output=True,
+        check=True,
+        env=env,
+        text=True,
+    )
+    modules = set()
+    for line in result.stderr.splitlines():
+        if line.startswith("import time:") and not line.endswith("| package"):
+            modules.add(line.rsplit("|", 1)[1].strip())
+    return modules
+
+
+class TestImport:
+    def test_import_is_lazy(self):
+        modules = _importtime("import toolforge")
+        assert "toolforge" in modules
+        assert sorted(m for m in modules if m.split(".")[0] in HEAVY) == []
+
+    def test_set_user_agent_skips_pymysql(self):
+        modules = _importtime("import toolforge; toolforge.set_user_agent('test')")
+        assert "requests" in modules
+        assert "pymysql" not in modules
+
+    def test_submodule_attributes(self):
+        assert toolforge.sitematrix.__name__ == "toolforge.sitematrix"
+        assert toolforge.http.__name__ == "toolforge.http"
+
+    def test_unknown_attribute(self):
+        with pytest.raises(AttributeError):
+            toolforge.does_not_exist
+
+    def test_load_private_yaml(self):
+        pytest.importorskip("yaml")
+        assert "load_private_yaml" in dir(toolforge)
+        assert toolforge.load_private_yaml.__name__ == "load_private_yaml"
+        assert toolforge.load_private_yaml.__module__ == "toolforge"
@@ -0,0 +1,188 @@
+import logging
+
+import pymysql
+import pytest
+
+from toolforge import instrumentation
+
+HOST = "enwiki.analytics.db.svc.wikimedia.cloud"
+
+
+class FakeConnection:
+    host = HOST
+    db = b"enwiki_p"
+    encoding = "utf8"
+
+
+class FakeCursor:
+    def __init__(self, rowcount=3):
+        self.connection = FakeConnection()
+        self.rowcount = rowcount
+
+    def execute(self, query, args=None):  # noqa: U100
+        if query == "fail":
+            raise pymysql.err.OperationalError(1317, "killed")
+        return self.rowcount
+
+
+class FakeSSCursor(FakeCursor, pymysql.cursors.SSCursor):
+    def __del__(self):
+        pass
+
+
+@pytest.fixture
+def events():
+    events = []
+    instrumentation.add_sink(events.append)
+    yield events
+    instrumentation.remove_sink(events.append)
+
+
+def _event(**kwargs):
+    base = {
+        "kind": "query",
+        "cluster": "web",
+        "host": "enwiki.web.db.svc.wikimedia.cloud",
+        "dbname": "enwiki_p",
+        "duration": 0.5,
+    }
+    base.update(kwargs)
+    return instrumentation.Event(**base)
+
+
+class TestInstrumentation:
+    @pytest.mark.parametrize(
+        ("host", "expected"),
+        [
+            ("enwiki.web.db.svc.wikimedia.cloud", "web"),
+            ("s1.analytics.db.svc.wikimedia.cloud", "analytics"),
+            ("tools.db.svc.wikimedia.cloud", "tools"),
+            ("localhost", None),
+        ],
+    )
+    def test_cluster(self, host, expected):
+        assert instrumentation._cluster(host) == expected
+
+    def test_connect(self, mocker, events):
+        factory = mocker.Mock(return_value="conn")
+        assert (
+            instrumentation.connect(factory, host=HOST, database="enwiki_p") == "conn"
+        )
+        cursorclass = factory.call_args.kwargs["cursorclass"]
+        assert issubclass(cursorclass, pymysql.cursors.Cursor)
+        assert cursorclass.__name__ == "InstrumentedCursor"
+        (event,) = events
+        assert event.kind == "connect"
+        assert event.cluster == "analytics"
+        assert event.dbname == "enwiki_p"
+        assert event.error is None
+
+    def test_connect_error(self, mocker, events):
+        error = pymysql.err.OperationalError(2003, "Can't connect")
+        factory = mocker.Mock(side_effect=error)
+        with pytest.raises(pymysql.err.OperationalError):
+            instrumentation.connect(factory, host=HOST)
+        assert events[0].error is error
+
+    def test_instrumented_is_cached(self):
+        assert instrumentation.instrumented(FakeCursor) is (
+            instrumentation.instrumented(FakeCursor)
+        )
+
+    def test_execute(self, events):
+        cur = instrumentation.instrumented(FakeCursor)()
+        assert cur.execute("SELECT 1") == 3
+        (event,) = events
+        assert event.kind == "query"
+        assert event.host == HOST
+        assert event.dbname == "enwiki_p"
+        assert event.rows == 3
+        assert event.query == "SELECT 1"
+
+    def test_execute_error(self, events):
+        cur = instrumentation.instrumented(FakeCursor)()
+        with pytest.raises(pymysql.err.OperationalError):
+            cur.execute("fail")
+        assert events[0].rows is None
+        assert isinstance(events[0].error, pymysql.err.OperationalError)
+
+    def test_execute_streaming(self, events):
+        instrumentation.instrumented(FakeSSCursor)().execute("SELECT 1")
+        assert events[0].rows is None
+
+    def test_execute_without_sinks(self, mocker):
+        emit = mocker.patch("toolforge.instrumentation._emit")
+        instrumentation.instrumented(FakeCursor)().execute("SELECT 1")
+        emit.assert_not_called()
+
+    def test_failing_sink(self, events, caplog):
+        def broken(event):  # noqa: U100
+            raise ValueError
+
+        instrumentation.add_sink(broken)
+        try:
+            instrumentation._emit(_event())
+        finally:
+            instrumentation.remove_sink(broken)
+        assert len(events) == 1
+        assert "Instrumentation sink" in caplog.text
+
+
+class TestLoggingSink:
+    @pytest.mark.parametrize(
+        ("event", "level"),
+        [
+            (_event(duration=0.1), logging.DEBUG),
+            (_event(duration=2), logging.WARNING),
+            (_event(kind="connect", duration=2), logging.DEBUG),
+            (_event(error=ValueError()), logging.ERROR),
+        ],
+    )
+    def test_levels(self, caplog, event, level):
+        caplog.set_level(logging.DEBUG)
+        instrumentation.LoggingSink()(event)
+        assert [r.levelno for r in caplog.records] == [level]
+
+    def test_no_threshold(self, caplog):
+        caplog.set_level(logging.DEBUG)
+        instrumentation.LoggingSink(slow_query_threshold=None)(_event(duration=60))
+        assert caplog.records[0].levelno == logging.DEBUG
+
+    def test_message(self, caplog):
+        instrumentation.LoggingSink()(_event(rows=5, query="SELECT 1", duration=2))
+        assert caplog.records[0].getMessage() == (
+            "query enwiki.web.db.svc.wikimedia.cloud/enwiki_p took 2.000s"
+            " (5 rows): SELECT 1"
+        )
+
+
+class TestMetricsRegistry:
+    def test_metrics(self):
+        registry = instrumentation.MetricsRegistry()
+        registry(_event(kind="connect", duration=0.25))
+        registry(_event(rows=10))
+        registry(_event(rows=5, dbname="dewiki_p"))
+        registry(_event(error=ValueError()))
+        assert registry.get("toolforge_db_query_rows_total") == 15
+        assert registry.get("toolforge_db_query_rows_total", dbname="enwiki_p") == 10
+        assert registry.get("toolforge_db_query_seconds") == 1.5
+        assert registry.get("toolforge_db_errors_total", kind="query") == 1
+        text = registry.render()
+        assert "# TYPE toolforge_db_query_seconds summary\n" in text
+        assert (
+            'toolforge_db_connect_seconds_count{cluster="web",'
+            'host="enwiki.web.db.svc.wikimedia.cloud",dbname="enwiki_p"} 1\n'
+        ) in text
+        assert (
+            'toolforge_db_errors_total{cluster="web",'
+            'host="enwiki.web.db.svc.wikimedia.cloud",dbname="enwiki_p",'
+            'kind="query"} 1\n'
+        ) in text
+
+    def test_metrics_render_large_counts(self):
+        registry = instrumentation.MetricsRegistry()
+        registry(_event(rows=3703701))
+        assert 'dbname="enwiki_p"} 3703701\n' in registry.render()
+
+    def test_escape(self):
+        assert instrumentation._escape('a"b\\c\n') == 'a\\"b\\\\c\\n'
@@ -0,0 +1,101 @@
+import pymysql
+import pytest
+
+from toolforge import lookup
+
+
+@pytest.fixture
+def conn(mocker):
+    conn = mocker.MagicMock()
+    conn.escape.side_effect = lambda v: pymysql.converters.escape_item(v, "utf8mb4")
+    return conn
+
+
+def _cursor(conn):
+    return conn.cursor.return_value.__enter__.return_value
+
+
+class TestChunks:
+    def test_chunk_size(self, conn):
+        chunks = list(lookup.chunks(conn, [1, 2, 3, 2, 4, 5], chunk_size=2))
+        assert chunks == [[1, 2], [3, 4], [5]]
+
+    def test_max_bytes(self, conn):
+        keys = ["a" * 10, "b" * 10, "c"]
+        # Every key is escaped with quotes and followed by a comma.
+        chunks = list(lookup.chunks(conn, keys, max_bytes=26))
+        assert chunks == [["a" * 10, "b" * 10], ["c"]]
+
+    def test_oversized_key(self, conn):
+        assert list(lookup.chunks(conn, ["long key"], max_bytes=1)) == [["long key"]]
+
+    def test_invalid_chunk_size(self, conn):
+        with pytest.raises(ValueError, match="chunk_size"):
+            list(lookup.chunks(conn, [1], chunk_size=0))
+
+
+class TestLookup:
+    def test_lookup(self, conn):
+        _cursor(conn).fetchall.side_effect = [
+            [(1, b"Main_Page"), (2, b"About")],
+            [(4, b"Help")],
+        ]
+        rows = lookup.lookup(
+            conn,
+            "page",
+            "page_id",
+            [1, 2, 3, 4],
+            columns="page_title",
+            chunk_size=3,
+        )
+        assert rows == {1: (b"Main_Page",), 2: (b"About",), 4: (b"Help",)}
+        query = "SELECT `page_id`, page_title FROM `page` WHERE `page_id` IN %s"
+        assert [c.args for c in _cursor(conn).execute.call_args_list] == [
+            (query, ((1, 2, 3),)),
+            (query, ((4,),)),
+        ]
+
+    def test_lookup_all(self, conn):
+        _cursor(conn).fetchall.return_value = [
+            (b"Main_Page", 10),
+            (b"Main_Page", 11),
+            (b"Caf\xc3\xa9", 12),
+        ]
+        rows = lookup.lookup_all(
+            conn,
+            "enwiki_p.revision_userindex",
+            "rev_page_title",
+            ["Main_Page", "Café", "Missing"],
+            columns="rev_id",
+            where="rev_timestamp > %s",
+            args=("20260101000000",),
+        )
+        assert rows == {"Main_Page": [(10,), (11,)], "Café": [(12,)]}
+        _cursor(conn).execute.assert_called_once_with(
+            "SELECT `rev_page_title`, rev_id FROM `enwiki_p`.`revision_userindex`"
+            " WHERE `rev_page_title` IN %s AND (rev_timestamp > %s)",
+            (("Main_Page", "Café", "Missing"), "20260101000000"),
+        )
+
+    def test_composite_key(self, conn):
+        _cursor(conn).fetchall.return_value = [(4, b"About", 42)]
+        rows = lookup.lookup(
+            conn,
+            "page",
+            ("page_namespace", "page_title"),
+            [(0, "Main_Page"), (4, "About")],
+            columns="page_id",
+        )
+        assert rows == {(4, "About"): (42,)}
+        query, params = _cursor(conn).execute.call_args.args
+        assert query == (
+            "SELECT `page_namespace`, `page_title`, page_id FROM `page`"
+            " WHERE (`page_namespace`, `page_title`) IN %s"
+        )
+        assert pymysql.converters.escape_item(params[0], "utf8mb4") == (
+            "((0,'Main_Page'),(4,'About'))"
+        )
+
+    def test_no_keys(self, conn):
+        assert lookup.lookup(conn, "page", "page_id", []) == {}
+        conn.cursor.assert_not_called()
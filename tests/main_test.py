@@ -3,6 +3,7 @@ import io
 import json
 import os
 
+import pymysql
 import pytest
 import requests
 
@@ -25,9 +26,11 @@ class TestMain:
             ("https://wikimania2018.wikimedia.org", "wikimania2018wiki"),
         ],
     )
+    @pytest.mark.usefixtures("recorded_sitematrix")
     def test_dbname(self, domain, dbname):
         assert toolforge.dbname(domain) == dbname
 
+    @pytest.mark.usefixtures("recorded_sitematrix")
     def test_dbname_throws_for_unknown(self):
         with pytest.raises(toolforge.UnknownDatabaseError):
             toolforge.dbname("toolforge.org")
@@ -44,14 +47,14 @@ class TestMain:
             ("test", "test", "test", "test (test; test)"),
         ],
     )
-    def test_set_user_agent(self, tool, url, email, expect):
+    def test_set_user_agent(self, tool, url, email, expect, user_agent_echo):
         expected = f"{expect} python-requests/{requests.__version__}"
         ua = toolforge.set_user_agent(tool, url, email)
         assert ua == expected
         # Allow calling set_user_agent twice (see #14)
         ua2 = toolforge.set_user_agent(tool, url, email)
         assert ua2 == expected
-        assert requests.get("https://httpbin.io/user-agent").json() == {
+        assert requests.get(user_agent_echo).json() == {
             "user-agent": expected,
         }
 
@@ -103,6 +106,16 @@ class TestMain:
                     "read_default_file": os.path.expanduser("~/replica.my.cnf"),
                 },
             ),
+            (
+                ["enwiki"],
+                {"streaming": True},
+                {
+                    "database": "enwiki_p",
+                    "host": "enwiki.web.db.svc.wikimedia.cloud",
+                    "read_default_file": os.path.expanduser("~/replica.my.cnf"),
+                    "cursorclass": pymysql.cursors.SSCursor,
+                },
+            ),
         ],
     )
     def test_connect(self, mocker, args, kwargs, expects):
@@ -220,6 +233,22 @@ class TestMain:
         kwargs = {}
         self._assert_connect(mocker, toolforge.toolsdb, args, kwargs, expects)
 
+    def test_toolsdb_streaming(self, mocker):
+        expects = {
+            "database": "s12345__foo",
+            "host": "tools.db.svc.wikimedia.cloud",
+            "read_default_file": os.path.expanduser("~/replica.my.cnf"),
+            "cursorclass": pymysql.cursors.SSCursor,
+        }
+        kwargs = {"streaming": True}
+        self._assert_connect(
+            mocker,
+            toolforge.toolsdb,
+            ["s12345__foo"],
+            kwargs,
+            expects,
+        )
+
     @pytest.mark.parametrize(
         ("env", "expects"),
         [
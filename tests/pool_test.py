@@ -0,0 +1,171 @@
+import os
+import threading
+
+import pymysql
+import pytest
+
+import toolforge
+from toolforge.pool import ConnectionPool
+
+
+@pytest.fixture
+def connect(mocker, monkeypatch):
+    monkeypatch.delenv("TOOL_REPLICA_USER", raising=False)
+    monkeypatch.delenv("TOOL_REPLICA_PASSWORD", raising=False)
+    return mocker.patch(
+        "toolforge._connect",
+        side_effect=lambda **kwargs: mocker.Mock(name=kwargs["host"]),
+    )
+
+
+def _fail(pool, exc):
+    with pool.connect("enwiki") as conn:
+        exc.conn = conn
+        raise exc
+
+
+@pytest.mark.usefixtures("connect")
+class TestConnectionPool:
+    def test_connect_reuses_connection(self, connect):
+        pool = ConnectionPool()
+        with pool.connect("enwiki") as conn1:
+            pass
+        with pool.connect("enwiki_p") as conn2:
+            pass
+        assert conn1 is conn2
+        connect.assert_called_once_with(
+            database="enwiki_p",
+            host="enwiki.web.db.svc.wikimedia.cloud",
+            read_default_file=os.path.expanduser("~/replica.my.cnf"),
+        )
+        conn2.ping.assert_called_once_with(reconnect=False)
+        assert conn2.rollback.call_count == 2
+
+    def test_connect_keys(self, connect):
+        pool = ConnectionPool()
+        with pool.connect("enwiki") as conn1:
+            with pool.connect("enwiki", "analytics") as conn2:
+                with pool.toolsdb("s12345__foo") as conn3:
+                    pass
+        assert len({id(conn1), id(conn2), id(conn3)}) == 3
+        assert connect.call_count == 3
+
+    def test_concurrent_checkouts_get_separate_connections(self, connect):
+        pool = ConnectionPool()
+        with pool.connect("enwiki") as conn1:
+            with pool.connect("enwiki") as conn2:
+                assert conn1 is not conn2
+        assert connect.call_count == 2
+
+    def test_dead_connection_is_replaced(self):
+        pool = ConnectionPool()
+        with pool.connect("enwiki") as conn1:
+            conn1.ping.side_effect = pymysql.err.OperationalError(2006, "gone")
+        with pool.connect("enwiki") as conn2:
+            pass
+        assert conn1 is not conn2
+        conn1.close.assert_called_once_with()
+
+    def test_idle_timeout(self, mocker):
+        clock = mocker.patch("toolforge.pool.time.monotonic", return_value=100.0)
+        pool = ConnectionPool(idle_timeout=10)
+        with pool.connect("enwiki") as conn1:
+            pass
+        clock.return_value = 111.0
+        with pool.connect("enwiki") as conn2:
+            pass
+        assert conn1 is not conn2
+        conn1.close.assert_called_once_with()
+
+    def test_idle_timeout_expires_other_keys(self, mocker):
+        clock = mocker.patch("toolforge.pool.time.monotonic", return_value=100.0)
+        pool = ConnectionPool(idle_timeout=10)
+        with pool.connect("enwiki") as conn1:
+            pass
+        clock.return_value = 111.0
+        with pool.toolsdb("tool__data") as conn2:
+            pass
+        conn1.close.assert_called_once_with()
+        with pool.connect("dewiki"):
+            clock.return_value = 122.0
+        conn2.close.assert_called_once_with()
+        assert [b.size for b in pool._buckets.values()] == [0, 0, 1]
+
+    def test_closes_outside_lock(self):
+        pool = ConnectionPool()
+        with pool.connect("enwiki") as conn:
+            pass
+        acquired = []
+
+        def try_lock():
+            acquired.append(pool._cond.acquire(timeout=1))
+            if acquired[-1]:
+                pool._cond.release()
+
+        def close():
+            thread = threading.Thread(target=try_lock)
+            thread.start()
+            thread.join()
+
+        conn.close.side_effect = close
+        pool.close()
+        assert acquired == [True]
+
+    def test_operational_error_discards_connection(self):
+        pool = ConnectionPool(max_size=1)
+        exc = pymysql.err.OperationalError(2013, "lost")
+        with pytest.raises(pymysql.err.OperationalError):
+            _fail(pool, exc)
+        conn1 = exc.conn
+        conn1.close.assert_called_once_with()
+        with pool.connect("enwiki") as conn2:
+            assert conn2 is not conn1
+
+    def test_other_errors_return_connection(self):
+        pool = ConnectionPool()
+        exc = KeyError()
+        with pytest.raises(KeyError):
+            _fail(pool, exc)
+        with pool.connect("enwiki") as conn:
+            assert conn is exc.conn
+
+    def test_failed_connect_frees_slot(self, connect):
+        pool = ConnectionPool(max_size=1, timeout=0)
+        connect.side_effect = pymysql.err.OperationalError(1045, "denied")
+        with pytest.raises(pymysql.err.OperationalError):
+            pool.connect("enwiki").__enter__()
+        connect.side_effect = None
+        with pool.connect("enwiki"):
+            pass
+
+    def test_exhausted(self):
+        pool = ConnectionPool(max_size=1, timeout=0.01)
+        with pool.connect("enwiki"):
+            with pytest.raises(toolforge.PoolExhaustedError):
+                pool.connect("enwiki").__enter__()
+
+    def test_waits_for_release(self):
+        pool = ConnectionPool(max_size=1, timeout=5)
+        seen = []
+        release = threading.Event()
+
+        def worker():
+            with pool.connect("enwiki") as conn:
+                seen.append(conn)
+
+        with pool.connect("enwiki") as conn1:
+            thread = threading.Thread(target=worker)
+            thread.start()
+            release.wait(0.05)
+        thread.join()
+        assert seen == [conn1]
+
+    def test_close(self):
+        with ConnectionPool() as pool:
+            with pool.connect("enwiki") as conn:
+                pass
+        conn.close.assert_called_once_with()
+
+    def test_rejects_empty_pool(self):
+        with pytest.raises(ValueError, match="max_size"):
+            ConnectionPool(max_size=0)
@@ -0,0 +1,385 @@
+"""SQLite backed stand-in for the Wiki Replicas and ToolsDB.
+
+:class:`Replica` creates one SQLite file per database, with a synthetic
+subset of the ``_p`` views filled with deterministic data, and hands out
+connections that behave like PyMySQL's closely enough for the helpers in
+this package. Pass :meth:`Replica.connect` in place of ``pymysql.connect``
+to exercise connecting, pooling, streaming and fan-out without a server.
+"""
+
+import datetime
+import random
+import sqlite3
+import threading
+import time
+
+import pymysql
+from pymysql.constants import FIELD_TYPE
+
+#: Section serving each wiki, as on the production replicas.
+SECTIONS = {
+    "enwiki": "s1",
+    "commonswiki": "s4",
+    "dewiki": "s5",
+    "frwiki": "s6",
+    "jawiki": "s6",
+    "metawiki": "s7",
+    "wikidatawiki": "s8",
+}
+
+SCHEMA = """
+CREATE TABLE page (
+    page_id INTEGER PRIMARY KEY,
+    page_namespace INTEGER NOT NULL,
+    page_title BLOB NOT NULL,
+    page_is_redirect INTEGER NOT NULL,
+    page_len INTEGER NOT NULL,
+    page_touched BLOB NOT NULL
+);
+CREATE UNIQUE INDEX page_name_title ON page (page_namespace, page_title);
+CREATE TABLE actor (
+    actor_id INTEGER PRIMARY KEY,
+    actor_name BLOB NOT NULL
+);
+CREATE TABLE revision (
+    rev_id INTEGER PRIMARY KEY,
+    rev_page INTEGER NOT NULL,
+    rev_actor INTEGER NOT NULL,
+    rev_timestamp BLOB NOT NULL,
+    rev_len INTEGER NOT NULL
+);
+CREATE INDEX rev_page_timestamp ON revision (rev_page, rev_timestamp);
+"""
+
+_EPOCH = datetime.datetime(2001, 1, 15)
+
+
+def _literal(value):
+    """SQLite literal for a query parameter."""
+    if value is None:
+        return "NULL"
+    if isinstance(value, bool):
+        return "1" if value else "0"
+    if isinstance(value, (int, float)):
+        return repr(value)
+    if isinstance(value, (bytes, bytearray)):
+        return f"X'{bytes(value).hex()}'"
+    if isinstance(value, (tuple, list, set, frozenset)):
+        return "(" + ",".join(_literal(v) for v in value) + ")"
+    if isinstance(value, (datetime.date, datetime.datetime)):
+        value = value.strftime("%Y%m%d%H%M%S")
+    # Text columns are binary, as on the replicas, so strings are sent as
+    # UTF-8 bytes to compare equal to them.
+    return f"X'{str(value).encode().hex()}'"
+
+
+def _type_code(value):
+    if value is None:
+        return FIELD_TYPE.NULL
+    if isinstance(value, int):
+        return FIELD_TYPE.LONGLONG
+    if isinstance(value, float):
+        return FIELD_TYPE.DOUBLE
+    return FIELD_TYPE.VAR_STRING
+
+
+class Replica:
+    """Wiki Replica databases backed by SQLite files in **directory**."""
+
+    def __init__(
+        self,
+        directory,
+        *,
+        wikis=("enwiki", "dewiki", "frwiki", "jawiki"),
+        pages=1000,
+        revisions_per_page=3,
+        actors=50,
+        latency=0.0,
+        seed=0,
+    ):
+        """
+        :param directory: Directory for the database files
+        :param wikis: Database names, without ``_p``
+        :param pages: Pages per wiki
+        :param revisions_per_page: Revisions per page
+        :param actors: Distinct editors per wiki
+        :param latency: Seconds every query waits, to model a network
+            round-trip
+        :param seed: Seed of the generated data
+        """
+        self.directory = directory
+        self.wikis = tuple(wikis)
+        self.pages = pages
+        self.latency = latency
+        self.lock = threading.Lock()
+        #: Connections opened so far
+        self.connections = 0
+        #: Queries run so far
+        self.queries = 0
+        self.paths = {}
+        for dbname in self.wikis:
+            self._create(
+                f"{dbname}_p",
+                SCHEMA,
+                self._rows(dbname, pages, revisions_per_page, actors, seed),
+            )
+        self._create(
+            "heartbeat_p",
+            "CREATE TABLE heartbeat (shard BLOB PRIMARY KEY, lag REAL NOT NULL);",
+            {"heartbeat": [(f"s{i}".encode(), 0.0) for i in range(1, 9)]},
+        )
+
+    def _create(self, database, schema, tables):
+        path = str(self.directory / f"{database}.sqlite3")
+        db = sqlite3.connect(path)
+        try:
+            db.executescript(schema)
+            for table, rows in tables.items():
+                rows = iter(rows)
+                first = next(rows, None)
+                if first is None:
+                    continue
+                marks = ",".join("?" * len(first))
+                db.execute(f"INSERT INTO {table} VALUES ({marks})", first)
+                db.executemany(f"INSERT INTO {table} VALUES ({marks})", rows)
+            db.commit()
+        finally:
+            db.close()
+        self.paths[database] = path
+
+    @staticmethod
+    def _rows(dbname, pages, revisions_per_page, actors, seed):
+        rng = random.Random(f"{seed}-{dbname}")
+
+        def timestamp(seconds):
+            return (
+                (_EPOCH + datetime.timedelta(seconds=seconds))
+                .strftime(
+                    "%Y%m%d%H%M%S",
+                )
+                .encode()
+            )
+
+        def page_rows():
+            for page_id in range(1, pages + 1):
+                yield (
+                    page_id,
+                    rng.choice((0, 0, 0, 1, 2, 4, 14)),
+                    f"Page_{page_id}".encode(),
+                    int(rng.random() < 0.1),
+                    rng.randrange(100, 100_000),
+                    timestamp(page_id * 3600),
+                )
+
+        def revision_rows():
+            rev_id = 0
+            for page_id in range(1, pages + 1):
+                for i in range(revisions_per_page):
+                    rev_id += 1
+                    yield (
+                        rev_id,
+                        page_id,
+                        rng.randrange(1, actors + 1),
+                        timestamp(page_id * 3600 + i * 60),
+                        rng.randrange(100, 100_000),
+                    )
+
+        return {
+            "page": page_rows(),
+            "actor": ((i, f"User {i}".encode()) for i in range(1, actors + 1)),
+            "revision": revision_rows(),
+        }
+
+    def section(self, dbname):
+        """Section serving **dbname**."""
+        return SECTIONS.get(dbname, "s3")
+
+    def gethostbyname_ex(self, host):
+        """Resolve replica hostnames to their section host, for :mod:`socket`."""
+        name, _, domain = host.partition(".")
+        if domain not in (
+            "web.db.svc.wikimedia.cloud",
+            "analytics.db.svc.wikimedia.cloud",
+        ):
+            raise OSError(f"Unknown host {host}")
+        section = (
+            name if name.startswith("s") and name[1:].isdigit() else self.section(name)
+        )
+        return (f"{section}.{domain}", [host], ["172.16.0.1"])
+
+    def connect(self, *args, **kwargs):  # noqa: U100
+        """Open a connection, accepting the arguments of ``pymysql.connect``."""
+        return Connection(self, **kwargs)
+
+
+class _Field:
+    def __init__(self, name, type_code):
+        self.name = name
+        self.table_name = ""
+        self.type_code = type_code
+
+    @property
+    def description(self):
+        return (self.name, self.type_code, None, None, None, None, True)
+
+
+class _Result:
+    """What PyMySQL's cursors read from ``Connection._result``."""
+
+    warning_count = 0
+    has_next = False
+
+    def __init__(self, cursor, unbuffered):
+        self._cursor = cursor
+        self.insert_id = cursor.lastrowid
+        self.affected_rows = cursor.rowcount
+        self.rows = None
+        self.description = None
+        self.fields = ()
+        if cursor.description is None:
+            return
+        self._first = cursor.fetchone()
+        self.fields = tuple(
+            _Field(
+                column[0],
+                _type_code(None if self._first is None else self._first[i]),
+            )
+            for i, column in enumerate(cursor.description)
+        )
+        self.description = tuple(f.description for f in self.fields)
+        if not unbuffered:
+            rows = [] if self._first is None else [self._first]
+            rows.extend(cursor.fetchall())
+            self.rows = tuple(rows)
+            self.affected_rows = len(rows)
+
+    def _read_rowdata_packet_unbuffered(self):
+        if self._first is not None:
+            row, self._first = self._first, None
+            return row
+        return self._cursor.fetchone()
+
+    def _finish_unbuffered_query(self):
+        try:
+            self._cursor.close()
+        except sqlite3.ProgrammingError:
+            # The connection was closed already.
+            pass
+
+
+class Connection:
+    """
+    PyMySQL compatible connection to a :class:`Replica`.
+
+    Queries go through PyMySQL's own cursor classes, so custom cursor classes
+    such as ``DictCursor`` and instrumented cursors behave as with a server.
+    """
+
+    encoding = "utf8"
+
+    def __init__(
+        self,
+        replica,
+        *,
+        database=None,
+        host=None,
+        cursorclass=pymysql.cursors.Cursor,
+        **kwargs,  # noqa: U100
+    ):
+        self.replica = replica
+        self.host = host
+        self.cursorclass = cursorclass
+        self.db = None
+        self._result = None
+        self._sqlite = None
+        self._killed = False
+        with replica.lock:
+            replica.connections += 1
+        database = database or "heartbeat_p"
+        self._open(database)
+        self.db = database.encode()
+
+    def select_db(self, db):
+        # Like PyMySQL, this leaves self.db at the database connected to.
+        self._open(db)
+
+    def _open(self, db):
+        try:
+            path = self.replica.paths[db]
+        except KeyError:
+            raise pymysql.err.OperationalError(
+                1049,
+                f"Unknown database '{db}'",
+            ) from None
+        if self._sqlite is not None:
+            self._result = None
+            self._sqlite.close()
+        self._sqlite = sqlite3.connect(path, check_same_thread=False)
+        for name, other in self.replica.paths.items():
+            self._sqlite.execute("ATTACH DATABASE ? AS ?", (other, name))
+
+    @property
+    def open(self):
+        return self._sqlite is not None
+
+    def kill(self):
+        """Make the next query fail as if the server went away."""
+        self._killed = True
+
+    def _check(self):
+        if self._sqlite is None:
+            raise pymysql.err.InterfaceError(0, "")
+        if self._killed:
+            self.close()
+            raise pymysql.err.OperationalError(2006, "MySQL server has gone away")
+
+    def ping(self, reconnect=True):  # noqa: U100
+        self._check()
+
+    def cursor(self, cursor=None):
+        return (cursor or self.cursorclass)(self)
+
+    def escape(self, obj, mapping=None):  # noqa: U100
+        return _literal(obj)
+
+    def literal(self, obj):
+        return _literal(obj)
+
+    def query(self, sql, unbuffered=False):
+        self._check()
+        if isinstance(sql, bytes):
+            sql = sql.decode()
+        replica = self.replica
+        with replica.lock:
+            replica.queries += 1
+        if replica.latency:
+            time.sleep(replica.latency)
+        if self._result is not None:
+            self._result._finish_unbuffered_query()
+        try:
+            self._result = _Result(self._sqlite.execute(sql), unbuffered)
+        except sqlite3.Error as e:
+            raise pymysql.err.ProgrammingError(1064, str(e)) from e
+        return self._result.affected_rows
+
+    def commit(self):
+        self._check()
+        self._sqlite.commit()
+
+    def rollback(self):
+        self._check()
+        self._sqlite.rollback()
+
+    def close(self):
+        if self._sqlite is None:
+            raise pymysql.err.Error("Already closed")
+        self._result = None
+        self._sqlite.close()
+        self._sqlite = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):  # noqa: U100
+        if self._sqlite is not None:
+            self.close()
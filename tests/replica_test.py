@@ -0,0 +1,161 @@
+"""Exercise the connection helpers end to end against the SQLite stand-in."""
+
+import pymysql
+import pytest
+
+import toolforge
+from toolforge import fanout
+from toolforge import instrumentation
+from toolforge import lookup
+from toolforge import retry
+from toolforge import scan
+from toolforge import streaming
+from toolforge.pool import ConnectionPool
+
+
+@pytest.mark.usefixtures("replica")
+class TestReplica:
+    def test_connect(self):
+        conn = toolforge.connect("enwiki")
+        with conn.cursor() as cur:
+            cur.execute("SELECT COUNT(*) FROM page")
+            assert cur.fetchone() == (200,)
+            cur.execute(
+                "SELECT page_title FROM page WHERE page_id = %s",
+                (1,),
+            )
+            assert cur.fetchall() == ((b"Page_1",),)
+        conn.close()
+
+    def test_connect_passes_charset(self):
+        conn = toolforge.connect("dewiki", "analytics")
+        kwargs = pymysql.connect.call_args.kwargs
+        assert kwargs["charset"] == "utf8mb4"
+        assert kwargs["host"] == "dewiki.analytics.db.svc.wikimedia.cloud"
+        assert kwargs["user"] == "s12345"
+        assert conn.db == b"dewiki_p"
+
+    def test_dict_cursor(self):
+        conn = toolforge.connect("jawiki", cursorclass=pymysql.cursors.DictCursor)
+        with conn.cursor() as cur:
+            cur.execute(
+                "SELECT actor_id, actor_name FROM actor WHERE actor_id = %s",
+                (3,),
+            )
+            assert cur.fetchall() == [{"actor_id": 3, "actor_name": b"User 3"}]
+
+    def test_unknown_database(self):
+        with pytest.raises(pymysql.err.OperationalError):
+            toolforge.connect("nonexistentwiki")
+
+    def test_instrumented(self):
+        events = []
+        instrumentation.add_sink(events.append)
+        try:
+            conn = toolforge.connect("enwiki")
+            with conn.cursor() as cur:
+                cur.execute("SELECT page_id FROM page LIMIT 5")
+                cur.fetchall()
+        finally:
+            instrumentation.remove_sink(events.append)
+        assert [e.kind for e in events] == ["connect", "query"]
+        assert events[1].dbname == "enwiki_p"
+        assert events[1].rows == 5
+
+    def test_pool(self, replica):
+        pool = ConnectionPool()
+        for _ in range(10):
+            with pool.connect("enwiki") as conn:
+                with conn.cursor() as cur:
+                    cur.execute("SELECT 1")
+        pool.close()
+        assert replica.connections == 1
+
+    def test_streaming(self):
+        conn = toolforge.connect("enwiki", streaming=True)
+        batches = list(
+            streaming.iter_batches(conn, "SELECT rev_id FROM revision", batch_size=250),
+        )
+        assert [len(b) for b in batches] == [250, 250, 100]
+        assert batches[-1][-1] == (600,)
+
+    def test_fanout(self, replica):
+        events = []
+        instrumentation.add_sink(events.append)
+        try:
+            rows = list(
+                fanout.fanout(
+                    ["enwiki", "dewiki", "frwiki", "jawiki"],
+                    "SELECT COUNT(*) FROM page WHERE page_namespace = %s",
+                    (0,),
+                ),
+            )
+        finally:
+            instrumentation.remove_sink(events.append)
+        assert sorted(dbname for dbname, _ in rows) == [
+            "dewiki",
+            "enwiki",
+            "frwiki",
+            "jawiki",
+        ]
+        # frwiki and jawiki share s6, so they share a connection.
+        assert replica.connections == 3
+        assert sorted(e.dbname for e in events if e.kind == "query") == [
+            "dewiki_p",
+            "enwiki_p",
+            "frwiki_p",
+            "jawiki_p",
+        ]
+
+    def test_scan(self):
+        rows = list(
+            scan.scan("enwiki", "revision", "rev_id", columns="rev_id", chunk_size=64),
+        )
+        assert rows == [(i,) for i in range(1, 601)]
+
+    def test_lookup(self, replica):
+        conn = toolforge.connect("enwiki")
+        rows = lookup.lookup(
+            conn,
+            "page",
+            "page_title",
+            [f"Page_{i}" for i in range(1, 151)] + ["Missing"],
+            columns="page_id",
+            chunk_size=100,
+        )
+        assert len(rows) == 150
+        assert rows["Page_42"] == (42,)
+        assert replica.queries == 2
+
+    def test_export(self):
+        pytest.importorskip("pyarrow")
+        from toolforge import export
+
+        conn = toolforge.connect("frwiki", streaming=True)
+        table = export.to_table(
+            conn,
+            "SELECT page_id, page_title FROM page",
+            batch_size=64,
+            binary_as_string=True,
+        )
+        assert table.num_rows == 200
+        assert table.column("page_title")[0].as_py() == "Page_1"
+
+    def test_retry(self, mocker):
+        on_retry = mocker.Mock()
+        mocker.patch("time.sleep")
+        conn = retry.connect("enwiki", on_retry=on_retry)
+        assert conn.execute("SELECT COUNT(*) FROM actor") == [(50,)]
+        conn.connection.kill()
+        assert conn.execute("SELECT COUNT(*) FROM actor") == [(50,)]
+        assert on_retry.call_count == 1
+        conn.close()
+
+    def test_routing(self):
+        from toolforge.routing import BATCH
+        from toolforge.routing import Router
+
+        route = Router().route("enwiki", BATCH)
+        assert route.cluster == "analytics"
+        assert route.host == "s1.analytics.db.svc.wikimedia.cloud"
+        assert route.measurement.lag == 0.0
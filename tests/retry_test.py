@@ -0,0 +1,125 @@
+import pymysql
+import pytest
+
+from toolforge import retry
+
+GONE_AWAY = pymysql.err.OperationalError(2006, "MySQL server has gone away")
+
+
+@pytest.fixture
+def connect(mocker, monkeypatch):
+    monkeypatch.delenv("TOOL_REPLICA_USER", raising=False)
+    monkeypatch.delenv("TOOL_REPLICA_PASSWORD", raising=False)
+    return mocker.patch(
+        "toolforge._connect",
+        side_effect=lambda **kwargs: mocker.MagicMock(name=kwargs["host"]),
+    )
+
+
+@pytest.fixture
+def sleep(mocker):
+    mocker.patch("random.uniform", side_effect=lambda *args: args[1])
+    return mocker.patch("time.sleep")
+
+
+def _cursor(conn):
+    return conn.cursor.return_value.__enter__.return_value
+
+
+class TestRetryable:
+    @pytest.mark.parametrize(
+        ("error", "expected"),
+        [
+            (GONE_AWAY, True),
+            (pymysql.err.OperationalError(2013, "Lost connection"), True),
+            (
+                pymysql.err.OperationalError(1317, "Query execution was interrupted"),
+                True,
+            ),
+            (pymysql.err.InterfaceError(0, ""), True),
+            (pymysql.err.OperationalError(1045, "Access denied"), False),
+            (pymysql.err.ProgrammingError(1064, "Syntax error"), False),
+            (ValueError("nope"), False),
+        ],
+    )
+    def test_retryable(self, error, expected):
+        assert retry.retryable(error) is expected
+
+
+@pytest.mark.usefixtures("sleep")
+class TestResilientConnection:
+    def test_execute(self, connect):
+        conn = retry.connect("enwiki", "analytics")
+        connect.assert_not_called()
+        connect.side_effect = None
+        _cursor(connect.return_value).fetchall.return_value = [(1,), (2,)]
+        assert conn.execute("SELECT page_id FROM page") == [(1,), (2,)]
+        assert conn.execute("SELECT 1") == [(1,), (2,)]
+        connect.assert_called_once_with(
+            database="enwiki_p",
+            host="enwiki.analytics.db.svc.wikimedia.cloud",
+            read_default_file=connect.call_args.kwargs["read_default_file"],
+        )
+        assert conn.retry_count == 0
+
+    def test_reconnects(self, connect, sleep, mocker):
+        on_retry = mocker.Mock()
+        conn = retry.connect("enwiki", on_retry=on_retry, backoff=2, max_backoff=5)
+        calls = []
+
+        def work(c):
+            calls.append(c)
+            if len(calls) < 4:
+                raise GONE_AWAY
+            return "done"
+
+        assert conn.run(work) == "done"
+        assert len({id(c) for c in calls}) == 4
+        for c in calls[:3]:
+            c.close.assert_called_once_with()
+        assert [c.args for c in sleep.call_args_list] == [(2,), (4,), (5,)]
+        assert on_retry.call_args_list == [
+            mocker.call(retry.Retry(1, GONE_AWAY, 2)),
+            mocker.call(retry.Retry(2, GONE_AWAY, 4)),
+            mocker.call(retry.Retry(3, GONE_AWAY, 5)),
+        ]
+        assert conn.retry_count == 3
+        assert connect.call_args_list[0] == connect.call_args_list[-1]
+
+    def test_gives_up(self, connect, mocker):
+        conn = retry.connect("enwiki", retries=2)
+        work = mocker.Mock(side_effect=GONE_AWAY)
+        with pytest.raises(pymysql.err.OperationalError):
+            conn.run(work)
+        assert work.call_count == 3
+        assert connect.call_count == 3
+        assert conn.retry_count == 2
+
+    def test_does_not_retry_query_errors(self, connect, sleep):
+        conn = retry.toolsdb("s12345__mytool")
+        _cursor(conn.connection).execute.side_effect = pymysql.err.ProgrammingError(
+            1064,
+            "Syntax error",
+        )
+        with pytest.raises(pymysql.err.ProgrammingError):
+            conn.execute("SELEC 1")
+        connect.assert_called_once()
+        assert connect.call_args.kwargs["host"] == "tools.db.svc.wikimedia.cloud"
+        sleep.assert_not_called()
+
+    def test_retries_connecting(self, connect, mocker):
+        good = mocker.Mock()
+        connect.side_effect = [
+            pymysql.err.OperationalError(2003, "Can't connect"),
+            good,
+        ]
+        conn = retry.connect("enwiki")
+        assert conn.connection is good
+        assert conn.retry_count == 1
+
+    def test_close(self, connect):
+        with retry.connect("enwiki") as conn:
+            inner = conn.connection
+        inner.close.assert_called_once_with()
+        assert conn.connection is not inner
+        assert connect.call_count == 2
@@ -0,0 +1,155 @@
+import math
+import socket
+
+import pymysql
+import pytest
+
+from toolforge import fanout
+from toolforge import routing
+
+WEB = "s1.web.db.svc.wikimedia.cloud"
+ANALYTICS = "s1.analytics.db.svc.wikimedia.cloud"
+
+
+class FakeConnection:
+    def __init__(self, lag, host):
+        self.lag = lag
+        self.host = host
+        self.queries = []
+        self.closed = False
+
+    def cursor(self):
+        return self
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):  # noqa: U100
+        pass
+
+    def execute(self, query, args=None):
+        self.queries.append((query, args))
+
+    def fetchone(self):
+        return (self.lag,)
+
+    def close(self):
+        self.closed = True
+
+
+@pytest.fixture(autouse=True)
+def dns(mocker):
+    fanout._canonical_host.cache_clear()
+
+    def gethostbyname_ex(host):
+        if not host.startswith("enwiki."):
+            raise socket.gaierror
+        return (host.replace("enwiki.", "s1."), [host], ["172.16.0.1"])
+
+    yield mocker.patch("socket.gethostbyname_ex", side_effect=gethostbyname_ex)
+    fanout._canonical_host.cache_clear()
+
+
+@pytest.fixture
+def lag(mocker):
+    lag = {WEB: 0.0, ANALYTICS: 0.0}
+    conns = []
+
+    def connect(**kwargs):
+        value = lag[kwargs["host"]]
+        if isinstance(value, Exception):
+            raise value
+        conn = FakeConnection(value, kwargs["host"])
+        conns.append(conn)
+        return conn
+
+    mocker.patch("toolforge._connect", side_effect=connect)
+    lag["conns"] = conns
+    return lag
+
+
+class TestRouter:
+    def test_measure(self, lag):
+        lag[WEB] = 2
+        router = routing.Router()
+        host, measurement = router.measure("enwiki", "web")
+        assert host == WEB
+        assert measurement.lag == 2.0
+        (conn,) = lag["conns"]
+        assert conn.queries == [
+            ("SELECT lag FROM heartbeat_p.heartbeat WHERE shard = %s", ("s1",)),
+        ]
+        assert conn.closed
+
+    def test_measure_is_cached(self, lag, mocker):
+        clock = mocker.patch("toolforge.routing.time.monotonic", return_value=100.0)
+        router = routing.Router(ttl=10)
+        router.measure("enwiki", "web")
+        router.measure("enwiki_p", "web")
+        assert len(lag["conns"]) == 1
+        clock.return_value = 120.0
+        router.measure("enwiki", "web")
+        assert len(lag["conns"]) == 2
+        router.forget(WEB)
+        router.measure("enwiki", "web")
+        assert len(lag["conns"]) == 3
+
+    def test_measure_unknown_section(self, lag):
+        lag["xxwiki.web.db.svc.wikimedia.cloud"] = 1
+        routing.Router().measure("xxwiki", "web")
+        assert lag["conns"][0].queries == [
+            ("SELECT MAX(lag) FROM heartbeat_p.heartbeat", None),
+        ]
+
+    def test_measure_unreachable(self, lag):
+        lag[WEB] = pymysql.err.OperationalError(2003, "Can't connect")
+        assert routing.Router().measure("enwiki", "web")[1].lag == math.inf
+
+    @pytest.mark.parametrize(
+        ("workload", "web", "analytics", "expected"),
+        [
+            (routing.INTERACTIVE, 0, 0, "web"),
+            (routing.INTERACTIVE, 600, 0, "analytics"),
+            (routing.INTERACTIVE, 600, 900, "web"),
+            (routing.INTERACTIVE, None, 0, "analytics"),
+            (routing.INTERACTIVE, "down", "down", "web"),
+            (routing.BATCH, 0, 0, "analytics"),
+            (routing.BATCH, 0, 600, "analytics"),
+            (routing.BATCH, 0, "down", "web"),
+        ],
+    )
+    def test_route(self, lag, workload, web, analytics, expected):
+        down = pymysql.err.OperationalError(2003, "Can't connect")
+        lag[WEB] = down if web == "down" else web
+        lag[ANALYTICS] = down if analytics == "down" else analytics
+        route = routing.Router().route("enwiki", workload)
+        assert route.cluster == expected
+        assert route.host == (WEB if expected == "web" else ANALYTICS)
+        assert route.workload == workload
+
+    def test_route_slow(self, lag, mocker):
+        router = routing.Router(max_response_time=1)
+        slow = routing.Measurement(lag=0, response_time=5, measured=0)
+        fast = routing.Measurement(lag=0, response_time=0.1, measured=0)
+        mocker.patch.object(
+            router,
+            "measure",
+            side_effect=lambda dbname, cluster: (  # noqa: U100
+                cluster,
+                slow if cluster == "web" else fast,
+            ),
+        )
+        assert router.route("enwiki").cluster == "analytics"
+        assert lag["conns"] == []
+
+    def test_route_unknown_workload(self):
+        with pytest.raises(ValueError, match="workload"):
+            routing.Router().route("enwiki", "realtime")
+
+    @pytest.mark.usefixtures("lag")
+    def test_connect(self, mocker):
+        connect = mocker.patch("toolforge.connect", return_value="conn")
+        conn, route = routing.Router().connect("enwiki", routing.BATCH, user="u")
+        assert conn == "conn"
+        assert route.cluster == "analytics"
+        connect.assert_called_once_with("enwiki", "analytics", user="u")
@@ -0,0 +1,141 @@
+import json
+
+import pymysql
+import pytest
+
+from toolforge import scan
+
+IDS = [1, 2, 3, 5, 8, 13, 21, 34]
+
+
+class FakeConnection:
+    def __init__(self, calls, fail=None):
+        self.calls = calls
+        self.fail = fail
+
+    def cursor(self):
+        return self
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):  # noqa: U100
+        pass
+
+    def execute(self, query, args=None):
+        self.calls.append((query, args))
+        if query.startswith("SELECT MIN"):
+            self.rows = [(min(IDS), max(IDS))] if IDS else [(None, None)]
+            return
+        start, stop = args[:2]
+        if self.fail == start:
+            raise pymysql.err.OperationalError(1317, "killed")
+        self.rows = [(i, f"row {i}") for i in IDS if start <= i < stop]
+
+    def fetchone(self):
+        return self.rows[0]
+
+    def fetchall(self):
+        return self.rows
+
+    def ping(self, reconnect=False):  # noqa: U100
+        pass
+
+    def rollback(self):
+        pass
+
+    def close(self):
+        pass
+
+
+@pytest.fixture
+def calls(mocker):
+    calls = []
+    mocker.patch(
+        "toolforge._connect",
+        side_effect=lambda **kwargs: FakeConnection(calls),  # noqa: U100
+    )
+    return calls
+
+
+class TestScan:
+    def test_chunks(self):
+        assert list(scan.chunks(1, 10, 4)) == [(1, 5), (5, 9), (9, 11)]
+        assert list(scan.chunks(7, 7, 4)) == [(7, 8)]
+        with pytest.raises(ValueError, match="chunk_size"):
+            list(scan.chunks(1, 10, 0))
+
+    def test_scan(self, calls):
+        rows = list(scan.scan("enwiki", "page", "page_id", chunk_size=4))
+        assert [r[0] for r in rows] == IDS
+        assert calls[0] == ("SELECT MIN(`page_id`), MAX(`page_id`) FROM `page`", None)
+        assert calls[1] == (
+            "SELECT * FROM `page` WHERE `page_id` >= %s AND `page_id` < %s"
+            " ORDER BY `page_id`",
+            (1, 5),
+        )
+        assert len(calls) == 1 + 9
+
+    def test_where(self, calls):
+        list(
+            scan.scan(
+                "enwiki",
+                "page",
+                "page_id",
+                columns="page_id",
+                where="page_namespace = %s",
+                args=(0,),
+                chunk_size=100,
+            ),
+        )
+        assert calls[1] == (
+            "SELECT page_id FROM `page` WHERE `page_id` >= %s AND `page_id` < %s"
+            " AND (page_namespace = %s) ORDER BY `page_id`",
+            (1, 35, 0),
+        )
+
+    def test_empty_table(self, calls, monkeypatch, tmp_path):
+        monkeypatch.setitem(globals(), "IDS", [])
+        path = tmp_path / "checkpoint"
+        path.write_text("{}")
+        assert list(scan.scan("enwiki", "page", "page_id", checkpoint=str(path))) == []
+        assert len(calls) == 1
+        assert not path.exists()
+
+    def test_checkpoint(self, calls, tmp_path):
+        path = str(tmp_path / "page.checkpoint")
+        rows = scan.scan("enwiki", "page", "page_id", chunk_size=4, checkpoint=path)
+        assert [next(rows)[0] for _ in range(4)] == [1, 2, 3, 5]
+        # The first chunk is only done once the next row is requested
+        with open(path) as f:
+            assert json.load(f)["next"] == 5
+        assert next(rows)[0] == 8
+        rows.close()
+        with open(path) as f:
+            assert json.load(f)["next"] == 5
+
+        calls.clear()
+        resumed = scan.scan("enwiki", "page", "page_id", chunk_size=4, checkpoint=path)
+        assert [r[0] for r in resumed] == [5, 8, 13, 21, 34]
+        assert calls[1][1] == (5, 9)
+        assert not (tmp_path / "page.checkpoint").exists()
+
+    @pytest.mark.usefixtures("calls")
+    def test_checkpoint_of_other_scan(self, tmp_path):
+        path = str(tmp_path / "checkpoint")
+        scan.Checkpoint(path, {"table": "revision"}).save(10)
+        with pytest.raises(ValueError, match="different scan"):
+            list(scan.scan("enwiki", "page", "page_id", checkpoint=path))
+
+    def test_error(self, mocker, tmp_path):
+        calls = []
+        mocker.patch(
+            "toolforge._connect",
+            side_effect=lambda **kwargs: FakeConnection(calls, fail=9),  # noqa: U100
+        )
+        path = str(tmp_path / "checkpoint")
+        rows = scan.scan("enwiki", "page", "page_id", chunk_size=4, checkpoint=path)
+        with pytest.raises(pymysql.err.OperationalError):
+            list(rows)
+        with open(path) as f:
+            assert json.load(f)["next"] == 9
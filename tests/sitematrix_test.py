@@ -0,0 +1,344 @@
+import gzip
+import json
+import os
+import time
+
+import pytest
+import requests
+
+import toolforge
+from toolforge import sitematrix
+
+SITEMATRIX = {
+    "sitematrix": {
+        "count": 4,
+        "0": {
+            "code": "en",
+            "name": "English",
+            "site": [
+                {
+                    "url": "https://en.wikipedia.org",
+                    "dbname": "enwiki",
+                    "code": "wiki",
+                    "sitename": "Wikipedia",
+                },
+                {
+                    "url": "https://en.wikisource.org",
+                    "dbname": "enwikisource",
+                    "code": "wikisource",
+                    "sitename": "Wikisource",
+                },
+            ],
+            "dir": "ltr",
+            "localname": "English",
+        },
+        "specials": [
+            {
+                "url": "https://commons.wikimedia.org",
+                "dbname": "commonswiki",
+                "code": "commons",
+                "lang": "commons",
+                "sitename": "Wikimedia Commons",
+            },
+            {
+                "url": "https://www.wikidata.org",
+                "dbname": "wikidatawiki",
+                "code": "wikidata",
+                "lang": "wikidata",
+                "sitename": "Wikidata",
+            },
+        ],
+    },
+}
+
+
+@pytest.fixture(autouse=True)
+def cache_file(tmp_path, monkeypatch):
+    path = tmp_path / "sitematrix.json"
+    monkeypatch.setenv("TOOLFORGE_SITEMATRIX_CACHE", str(path))
+    monkeypatch.delenv("TOOLFORGE_SITEMATRIX_SNAPSHOT", raising=False)
+    sitematrix.clear_cache()
+    yield path
+    sitematrix.clear_cache()
+
+
+@pytest.fixture
+def fetch(mocker):
+    return mocker.patch(
+        "toolforge.sitematrix._fetch_sitematrix",
+        return_value=SITEMATRIX,
+    )
+
+
+class TestSiteMatrix:
+    @pytest.mark.parametrize(
+        ("domain", "expect"),
+        [
+            ("en.wikipedia.org", "en.wikipedia.org"),
+            ("https://EN.wikipedia.org", "en.wikipedia.org"),
+            ("http://commons.wikimedia.org/wiki/Main_Page", "commons.wikimedia.org"),
+        ],
+    )
+    def test_normalize_host(self, domain, expect):
+        assert sitematrix.normalize_host(domain) == expect
+
+    def test_from_api(self):
+        matrix = sitematrix.SiteMatrix.from_api(SITEMATRIX)
+        assert len(matrix) == 4
+        assert matrix.dbname("https://en.wikisource.org/wiki/X") == "enwikisource"
+        assert matrix.dbname("www.wikidata.org") == "wikidatawiki"
+        assert "commons.wikimedia.org" in matrix
+        with pytest.raises(toolforge.UnknownDatabaseError):
+            matrix.dbname("toolforge.org")
+
+    def test_save_load(self, tmp_path):
+        path = str(tmp_path / "sub" / "cache.json")
+        matrix = sitematrix.SiteMatrix.from_api(SITEMATRIX, fetched=123.0)
+        matrix.save(path)
+        loaded = sitematrix.SiteMatrix.load(path)
+        assert loaded.fetched == 123.0
+        assert loaded.dbname("en.wikipedia.org") == "enwiki"
+        assert [p.name for p in (tmp_path / "sub").iterdir()] == ["cache.json"]
+
+    def test_load_rejects_other_data(self, tmp_path):
+        path = tmp_path / "cache.json"
+        path.write_text(json.dumps({"version": 0}))
+        with pytest.raises(ValueError, match="not a site matrix cache"):
+            sitematrix.SiteMatrix.load(str(path))
+
+    def test_get_sitematrix_fetches_once(self, fetch, cache_file):
+        assert toolforge.dbname("en.wikipedia.org") == "enwiki"
+        assert toolforge.dbname("commons.wikimedia.org") == "commonswiki"
+        fetch.assert_called_once_with()
+        assert cache_file.exists()
+
+    def test_get_sitematrix_uses_disk_cache(self, fetch, cache_file):
+        sitematrix.SiteMatrix({"en.wikipedia.org": "enwiki"}).save(str(cache_file))
+        assert toolforge.dbname("en.wikipedia.org") == "enwiki"
+        fetch.assert_not_called()
+
+    def test_get_sitematrix_refreshes_expired(self, fetch, cache_file):
+        old = time.time() - sitematrix.CACHE_TTL - 1
+        sitematrix.SiteMatrix({}, fetched=old).save(str(cache_file))
+        assert toolforge.dbname("en.wikipedia.org") == "enwiki"
+        fetch.assert_called_once_with()
+        assert sitematrix.SiteMatrix.load(str(cache_file)).fetched > old
+
+    def test_get_sitematrix_falls_back_to_stale(self, fetch, cache_file):
+        fetch.side_effect = requests.ConnectionError
+        old = time.time() - sitematrix.CACHE_TTL - 1
+        sitematrix.SiteMatrix({"en.wikipedia.org": "enwiki"}, fetched=old).save(
+            str(cache_file),
+        )
+        assert toolforge.dbname("en.wikipedia.org") == "enwiki"
+
+    def test_fetch_times_out(self, mocker, cache_file):
+        get = mocker.patch("toolforge.http.get_session").return_value.get
+        get.side_effect = requests.Timeout
+        sitematrix.SiteMatrix({"en.wikipedia.org": "enwiki"}, fetched=0).save(
+            str(cache_file),
+        )
+        assert toolforge.dbname("en.wikipedia.org") == "enwiki"
+        assert get.call_args[1]["timeout"] == sitematrix.FETCH_TIMEOUT
+
+    def test_get_sitematrix_holds_off_after_failure(
+        self,
+        fetch,
+        cache_file,
+        monkeypatch,
+    ):
+        fetch.side_effect = requests.ConnectionError
+        old = time.time() - sitematrix.CACHE_TTL - 1
+        sitematrix.SiteMatrix({"en.wikipedia.org": "enwiki"}, fetched=old).save(
+            str(cache_file),
+        )
+        for _ in range(5):
+            assert toolforge.dbname("en.wikipedia.org") == "enwiki"
+        fetch.assert_called_once_with()
+        monkeypatch.setattr(sitematrix, "_retry_after", 0.0)
+        fetch.side_effect = None
+        assert toolforge.dbname("en.wikipedia.org") == "enwiki"
+        assert fetch.call_count == 2
+        assert not sitematrix.get_sitematrix().expired(sitematrix.CACHE_TTL)
+
+    def test_get_sitematrix_raises_without_stale(self, fetch):
+        fetch.side_effect = requests.ConnectionError
+        with pytest.raises(requests.ConnectionError):
+            toolforge.dbname("en.wikipedia.org")
+
+    def test_get_sitematrix_ignores_unwritable_cache(self, fetch, monkeypatch):
+        monkeypatch.setenv("TOOLFORGE_SITEMATRIX_CACHE", "/proc/nonexistent/x.json")
+        assert toolforge.dbname("en.wikipedia.org") == "enwiki"
+        fetch.assert_called_once_with()
+
+    def test_snapshot_round_trip(self, tmp_path):
+        path = str(tmp_path / "sitematrix.snapshot")
+        sitematrix.SiteMatrix.from_api(SITEMATRIX, fetched=5.0).save_snapshot(path)
+        loaded = sitematrix.SiteMatrix.load_snapshot(path)
+        assert loaded.fetched == 5.0
+        assert len(loaded) == 4
+        assert loaded.dbname("en.wikisource.org") == "enwikisource"
+        # Snapshots are reproducible: no timestamp in the gzip header
+        with open(path, "rb") as f:
+            assert f.read()[4:8] == b"\0\0\0\0"
+
+    def test_load_snapshot_rejects_other_data(self, tmp_path):
+        path = tmp_path / "cache.json"
+        sitematrix.SiteMatrix({}).save(str(path))
+        with pytest.raises(OSError):  # noqa: PT011
+            sitematrix.SiteMatrix.load_snapshot(str(path))
+
+    def test_dbname_prefers_snapshot(self, fetch, tmp_path, monkeypatch):
+        path = str(tmp_path / "sitematrix.snapshot")
+        sitematrix.SiteMatrix({"en.wikipedia.org": "enwiki"}).save_snapshot(path)
+        monkeypatch.setenv("TOOLFORGE_SITEMATRIX_SNAPSHOT", path)
+        assert toolforge.dbname("https://en.wikipedia.org/") == "enwiki"
+        fetch.assert_not_called()
+        assert toolforge.dbname("www.wikidata.org") == "wikidatawiki"
+        fetch.assert_called_once_with()
+
+    def test_dbname_ignores_broken_snapshot(self, fetch, tmp_path, monkeypatch):
+        path = tmp_path / "sitematrix.snapshot"
+        path.write_text("garbage")
+        monkeypatch.setenv("TOOLFORGE_SITEMATRIX_SNAPSHOT", str(path))
+        assert toolforge.dbname("en.wikipedia.org") == "enwiki"
+        fetch.assert_called_once_with()
+
+    def test_main_snapshot(self, fetch, tmp_path, capsys):
+        path = str(tmp_path / "out.snapshot")
+        sitematrix.main(["snapshot", "-o", path])
+        fetch.assert_called_once_with()
+        assert capsys.readouterr().out == f"Wrote 4 hosts to {path}\n"
+        assert sitematrix.SiteMatrix.load_snapshot(path).dbname("en.wikipedia.org")
+
+    def test_dbnames(self, fetch):
+        domains = [
+            "en.wikipedia.org",
+            "https://en.wikipedia.org/wiki/X",
+            "en.wikipedia.org",
+            "http://www.wikidata.org",
+        ]
+        assert toolforge.dbnames(domains) == {
+            "en.wikipedia.org": "enwiki",
+            "https://en.wikipedia.org/wiki/X": "enwiki",
+            "http://www.wikidata.org": "wikidatawiki",
+        }
+        fetch.assert_called_once_with()
+
+    def test_dbnames_reports_all_unknown(self, fetch):
+        domains = ["toolforge.org", "en.wikipedia.org", "https://example.org/x"]
+        with pytest.raises(
+            toolforge.UnknownDatabaseError,
+            match="example.org, toolforge.org$",
+        ):
+            toolforge.dbnames(domains)
+        fetch.assert_called_once_with()
+
+    def test_dbnames_not_strict(self, fetch):
+        domains = ["toolforge.org", "en.wikipedia.org"]
+        assert toolforge.dbnames(domains, strict=False) == {
+            "en.wikipedia.org": "enwiki",
+        }
+        fetch.assert_called_once_with()
+
+    def test_dbnames_snapshot_only(self, fetch, tmp_path, monkeypatch):
+        path = str(tmp_path / "sitematrix.snapshot")
+        sitematrix.SiteMatrix.from_api(SITEMATRIX).save_snapshot(path)
+        monkeypatch.setenv("TOOLFORGE_SITEMATRIX_SNAPSHOT", path)
+        assert toolforge.dbnames(["commons.wikimedia.org"]) == {
+            "commons.wikimedia.org": "commonswiki",
+        }
+        fetch.assert_not_called()
+
+    @pytest.fixture
+    def recorded(self):
+        path = os.path.join(os.path.dirname(__file__), "fixtures", "sitematrix.json")
+        with open(path) as f:
+            return sitematrix.SiteMatrix.from_api(json.load(f))
+
+    def test_site_records(self, recorded):
+        sites = {site.dbname: site for site in recorded}
+        assert sites["enwiki"] == sitematrix.Site(
+            "en.wikipedia.org",
+            "enwiki",
+            "wiki",
+            "en",
+        )
+        assert sites["enwiki"].url == "https://en.wikipedia.org"
+        assert sites["aawiki"].closed
+        assert sites["arbcom_enwiki"].private
+        assert sites["arbcom_enwiki"].lang == "en"
+        assert sites["foundationwiki"].fishbowl
+        assert sites["commonswiki"].lang == "commons"
+        assert sites["dewiki"].code is sites["enwiki"].code
+
+    def test_cache_round_trip_keeps_records(self, recorded, tmp_path):
+        path = str(tmp_path / "cache.json")
+        recorded.save(path)
+        assert list(sitematrix.SiteMatrix.load(path)) == list(recorded)
+        path = str(tmp_path / "sitematrix.snapshot")
+        recorded.save_snapshot(path)
+        assert sorted(sitematrix.SiteMatrix.load_snapshot(path)) == sorted(recorded)
+
+    def test_load_version_1_snapshot(self, tmp_path):
+        path = str(tmp_path / "sitematrix.snapshot")
+        with gzip.open(path, "wt") as f:
+            f.write("toolforge-sitematrix-snapshot 1 5.0\nen.wikipedia.org\tenwiki\n")
+        loaded = sitematrix.SiteMatrix.load_snapshot(path)
+        assert loaded.dbname("en.wikipedia.org") == "enwiki"
+        assert list(loaded) == [sitematrix.Site("en.wikipedia.org", "enwiki", "", "")]
+
+    @pytest.mark.usefixtures("fetch")
+    def test_preload(self, mocker):
+        freeze = mocker.patch("gc.freeze")
+        matrix = sitematrix.preload()
+        assert matrix is sitematrix.get_sitematrix()
+        freeze.assert_called_once_with()
+        sitematrix.preload(freeze=False)
+        freeze.assert_called_once_with()
+
+    def test_site(self, recorded):
+        assert recorded.site("enwiki_p").host == "en.wikipedia.org"
+        assert recorded.url("commonswiki") == "https://commons.wikimedia.org"
+        with pytest.raises(toolforge.UnknownDatabaseError, match="xxwiki"):
+            recorded.site("xxwiki")
+
+    def test_sites(self, recorded):
+        assert len(recorded.sites()) == len(recorded)
+        wikipedia_sites = recorded.sites(family="wikipedia")
+        assert wikipedia_sites == recorded.sites(family="wiki")
+        assert {s.dbname for s in wikipedia_sites} >= {"enwiki", "dewiki", "aawiki"}
+        open_wikipedia_sites = recorded.sites(family="wikipedia", closed=False)
+        assert "aawiki" not in {s.dbname for s in open_wikipedia_sites}
+        assert "enwiki" in {s.dbname for s in open_wikipedia_sites}
+        assert {s.dbname for s in recorded.sites(lang="aa")} == {
+            "aawiki",
+            "aawiktionary",
+            "aawikibooks",
+        }
+        assert [s.dbname for s in recorded.sites(lang="en", private=True)] == [
+            "arbcom_enwiki",
+        ]
+        assert [s.dbname for s in recorded.sites(family="wiki", lang="ja")] == [
+            "jawiki",
+        ]
+        assert [s.dbname for s in recorded.sites(fishbowl=True)] == ["foundationwiki"]
+        assert recorded.sites(family="nonexistent") == []
+
+    def test_by_section(self, recorded, mocker):
+        section_host = mocker.patch(
+            "toolforge.fanout.section_host",
+            side_effect=lambda *args: "s1" if args[0] == "enwiki" else "s3",
+        )
+        sections = recorded.by_section("analytics", lang="en", family="wikipedia")
+        assert {k: [s.dbname for s in v] for k, v in sections.items()} == {
+            "s1": ["enwiki"],
+        }
+        section_host.assert_called_once_with("enwiki", "analytics")
+
+    def test_module_helpers(self, fetch):
+        assert sitematrix.site("enwiki").url == "https://en.wikipedia.org"
+        assert [s.dbname for s in sitematrix.sites(family="commons")] == [
+            "commonswiki",
+        ]
+        fetch.assert_called_once_with()
@@ -0,0 +1,37 @@
+import pymysql
+import pytest
+
+from toolforge import streaming
+
+
+@pytest.fixture
+def conn(mocker):
+    conn = mocker.MagicMock()
+    cur = conn.cursor.return_value.__enter__.return_value
+    rows = iter([(i,) for i in range(7)])
+    cur.fetchmany.side_effect = lambda size: [r for _, r in zip(range(size), rows)]
+    return conn
+
+
+class TestStreaming:
+    def test_iter_batches(self, conn):
+        batches = list(streaming.iter_batches(conn, "SELECT", (1,), batch_size=3))
+        assert batches == [[(0,), (1,), (2,)], [(3,), (4,), (5,)], [(6,)]]
+        conn.cursor.assert_called_once_with(pymysql.cursors.SSCursor)
+        cur = conn.cursor.return_value.__enter__.return_value
+        cur.execute.assert_called_once_with("SELECT", (1,))
+        conn.cursor.return_value.__exit__.assert_called_once()
+
+    def test_iter_rows(self, conn):
+        rows = list(streaming.iter_rows(conn, "SELECT", batch_size=2))
+        assert rows == [(i,) for i in range(7)]
+
+    def test_iter_batches_closes_cursor_early(self, conn):
+        batches = streaming.iter_batches(conn, "SELECT", batch_size=2)
+        next(batches)
+        batches.close()
+        conn.cursor.return_value.__exit__.assert_called_once()
+
+    def test_iter_batches_rejects_empty_batches(self, conn):
+        with pytest.raises(ValueError, match="batch_size"):
+            next(streaming.iter_batches(conn, "SELECT", batch_size=0))
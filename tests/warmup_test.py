@@ -0,0 +1,71 @@
+import pytest
+
+import toolforge
+from toolforge.pool import ConnectionPool
+from toolforge.warmup import Check
+from toolforge.warmup import Warmup
+from toolforge.warmup import warmup
+
+
+@pytest.mark.usefixtures("recorded_sitematrix")
+class TestWarmup:
+    def test_run(self, replica):
+        w = Warmup(replicas=["enwiki", ("dewiki", "analytics")], connections=2)
+        readiness = w.run()
+        assert readiness.ready
+        assert [c.name for c in readiness.checks] == [
+            "sitematrix",
+            "replica:enwiki/web",
+            "replica:dewiki/analytics",
+        ]
+        assert all(c.ok and c.error is None for c in readiness.checks)
+        assert replica.connections == 4
+        # Requests reuse the warmed up connections.
+        with w.pool.connect("enwiki"):
+            with w.pool.connect("enwiki"):
+                pass
+        assert replica.connections == 4
+        assert toolforge.dbname("en.wikipedia.org") == "enwiki"
+
+    def test_failure(self, recorded_sitematrix):
+        recorded_sitematrix.side_effect = OSError("offline")
+        w = Warmup(replicas=["nonexistentwiki"])
+        readiness = w.run()
+        assert not readiness.ready
+        assert [(c.name, c.ok) for c in readiness.checks] == [
+            ("sitematrix", False),
+            ("replica:nonexistentwiki/web", False),
+        ]
+        assert readiness.checks[0].error == "offline"
+        assert readiness.as_dict()["checks"]["sitematrix"]["ok"] is False
+
+    def test_pending(self):
+        w = Warmup(toolsdb=["s12345__mytool"], sitematrix=False)
+        assert w.readiness() == (False, (Check("toolsdb:s12345__mytool"),))
+        assert w.readiness().as_dict() == {
+            "ready": False,
+            "checks": {
+                "toolsdb:s12345__mytool": {
+                    "ok": None,
+                    "duration": 0.0,
+                    "error": None,
+                },
+            },
+        }
+
+    @pytest.mark.usefixtures("replica")
+    def test_background(self):
+        pool = ConnectionPool()
+        w = warmup(replicas=["frwiki", "jawiki"], pool=pool)
+        readiness = w.wait(timeout=10)
+        assert readiness.ready
+        assert w.pool is pool
+        w.start()
+        assert w.wait(timeout=0).ready
+
+    def test_too_many_connections(self):
+        with pytest.raises(ValueError, match="pool of 5"):
+            Warmup(replicas=["enwiki"], connections=6)
+
+    def test_nothing_to_do(self):
+        assert Warmup(sitematrix=False).run() == (True, ())